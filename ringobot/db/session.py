@@ -4,6 +4,7 @@ from ringobot.db.utils import execute_query
 from ringobot.serviceData.simulation import get_symbol_data
 from datetime import datetime
 from ringobot.serviceData.binance import BinanceAPI
+from ringobot.serviceData.marketSnapshot import LazyPrices
 from ringobot.serviceData.graphCreator import createGraphs
 import json
 import plotly
@@ -19,23 +20,55 @@ class Session:
         self.buy_timestamp = int(buy_timestamp)
         self.buy_time = datetime.fromtimestamp(self.buy_timestamp).strftime('%Y-%m-%d %H:%M')
         self.status = int(status)
-        if self.status == 1:
-            self.live_price = BinanceAPI().get_symbol_ticker(self.name)
-
-        self.sell_price = round(float(sell_price), 5) if sell_price else self.live_price
+        # Active sessions get their live price lazily, sessions from one get_sessions call share one bulk lookup
+        self._live_price = None
+        self._prices = None
+        self._sell_price = round(float(sell_price), 5) if sell_price else None
         self.sell_timestamp = int(sell_timestamp) if sell_timestamp else None
         self.sell_time = datetime.fromtimestamp(self.sell_timestamp).strftime('%Y-%m-%d %H:%M') if sell_timestamp else None
-        if self.status == 0:
-            self.profit = round((self.sell_price - self.buy_price) * self.quantity, 2)
-            self.profit_percent = round((self.profit / (self.buy_price * self.quantity)) * 100, 2)
-        else:
-            self.profit = round((self.live_price - self.buy_price) * self.quantity, 2)
-            self.profit_percent = round((self.profit / (self.buy_price * self.quantity)) * 100, 2)
-        if self.profit is not None:
-            self.is_profit = 1 if self.profit >= 0 else 0
         self.data = data
         self.graph = graph
 
+    @property
+    def live_price(self):
+        if self.status != 1:
+            return None
+        if self._live_price is None:
+            self._prices = self._prices or LazyPrices([self.name])
+            self._live_price = self._prices.get(self.name)
+        return self._live_price
+
+    @live_price.setter
+    def live_price(self, price):
+        self._live_price = price
+
+    @property
+    def sell_price(self):
+        return self._sell_price if self._sell_price is not None else self.live_price
+
+    @property
+    def profit(self):
+        return round((self.sell_price - self.buy_price) * self.quantity, 2)
+
+    @property
+    def profit_percent(self):
+        return round((self.profit / (self.buy_price * self.quantity)) * 100, 2)
+
+    @property
+    def is_profit(self):
+        return 1 if self.profit >= 0 else 0
+
+    def to_dict(self):
+        # Plain attributes plus the lazily computed price fields, for JSON responses
+        result = {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+        if self.status == 1:
+            result['live_price'] = self.live_price
+        result['sell_price'] = self.sell_price
+        result['profit'] = self.profit
+        result['profit_percent'] = self.profit_percent
+        result['is_profit'] = self.is_profit
+        return result
+
 
     @staticmethod
     def get_sessions(db_session, session_id=None, coin_id=None, status=None, symbol=None, last_n_hours=None):
@@ -56,6 +89,11 @@ class Session:
         sessions = []
         for i in df.to_dict(orient='records'):
             sessions.append(Session(**i))
+        # One bulk price lookup for every active session, made when the first live price is read
+        active = [session for session in sessions if session.status == 1]
+        prices = LazyPrices(session.name for session in active)
+        for session in active:
+            session._prices = prices
         return sessions
 
     @staticmethod
@@ -36,16 +36,16 @@ class Config(Base):
     max_trade = Column(Float)
 
 
-if __name__ == "__main__":
+def create_database(coin_names=symbols, config=None):
+    # Create the tables and seed coins and the config row where they are missing, e.g. on a fresh SQLite file
     Base.metadata.create_all(engine)
-    print("Tables created successfully")
     with session_scope() as db_session:
-        for symbol in symbols:
-            coin = Coins(name=symbol)
-            db_session.add(coin)
-        db_session.commit()
-        print("Coins added successfully")
-
-
+        if db_session.query(Coins).count() == 0:
+            db_session.add_all([Coins(name=name) for name in coin_names])
+        if config is not None and db_session.query(Config).count() == 0:
+            db_session.add(Config(**config))
 
 
+if __name__ == "__main__":
+    create_database()
+    print("Tables created and coins added successfully")
@@ -1,17 +1,15 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from ringobot.serviceData.klineDataset import read_klines
 
 pd.set_option('display.max_columns', None)
 
 # read the data
-df = pd.read_parquet('kline_data/ADAUSDT/ADAUSDT-5m.parquet')
+df = read_klines('ADAUSDT', '5m')
 
 # Convert timestamp to datetime
 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
 
-# Sort dataframe by timestamp
-df = df.sort_values(by='timestamp')
-
 # resample the data to 1 hour
 df = df.set_index('timestamp')
 df = df.resample('1H').agg({
@@ -24,8 +22,7 @@ df = df.resample('1H').agg({
     'quote_asset_volume': 'sum',
     'number_of_trades': 'sum',
     'taker_buy_base_asset_volume': 'sum',
-    'taker_buy_quote_asset_volume': 'sum',
-    'ignore': 'last'
+    'taker_buy_quote_asset_volume': 'sum'
 }).dropna()
 
 # get the 12 and 26 hour exponential moving averages
@@ -1,17 +1,15 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from ringobot.serviceData.klineDataset import read_klines
 
 pd.set_option('display.max_columns', None)
 
 # read the data
-df = pd.read_parquet('kline_data/BTCUSDT/BTCUSDT-5m.parquet')
+df = read_klines('BTCUSDT', '5m', columns=['timestamp', 'close'])
 
 # Convert timestamp to datetime
 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
 
-# Sort dataframe by timestamp
-df = df.sort_values(by='timestamp')
-
 # get the timestamps that where there has been at least 5 percent increase in price within 24 hours
 df['price_change'] = df['close'].pct_change(periods=288)
 
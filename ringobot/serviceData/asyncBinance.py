@@ -0,0 +1,176 @@
+import asyncio
+import contextvars
+import logging
+import time
+from ringobot.config import ringobot_api_key, ringobot_secret_key, dryRun, BINANCE_MAX_WORKERS, BINANCE_REQUEST_TIMEOUT, EXCHANGE_URL, with_api_url
+from ringobot.serviceData.binance import request_weight_limiter, exchange_info_cache
+from ringobot.serviceData.rateLimiter import endpoint_weight
+
+
+# Response of the call in flight, one per _call since client.response is shared by concurrent calls
+_response = contextvars.ContextVar("response")
+
+
+async def _keep_response(session, context, params):
+    # aiohttp trace hook, runs in the task of the call that made the request
+    holder = _response.get(None)
+    if holder is not None:
+        holder["response"] = params.response
+
+
+class AsyncBinanceAPI:
+    """
+    Asyncio counterpart of BinanceAPI with the same methods as coroutines. All calls share one
+    AsyncClient and with it one keep-alive HTTP session. At most max_concurrency calls are in
+    flight, each is cancelled after timeout seconds, and request weight is counted in the same
+    budget as the synchronous client.
+
+        async with AsyncBinanceAPI() as api:
+            prices, balances = await asyncio.gather(api.get_all_prices(), api.get_account_balance())
+
+    Args:
+        api_key (str, optional): Binance API key.
+        api_secret (str, optional): Binance API secret.
+        base_url (str, optional): Send requests to this server instead of Binance (default: EXCHANGE_URL).
+        max_concurrency (int, optional): Calls in flight at once (default: BINANCE_MAX_WORKERS).
+        timeout (float, optional): Seconds per call before it is cancelled (default: BINANCE_REQUEST_TIMEOUT).
+        dry_run (bool, optional): Log orders instead of placing them (default: dryRun).
+    """
+
+    def __init__(self, api_key=ringobot_api_key, api_secret=ringobot_secret_key, base_url=EXCHANGE_URL,
+                 max_concurrency=BINANCE_MAX_WORKERS, timeout=BINANCE_REQUEST_TIMEOUT, dry_run=dryRun):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.dry_run = dry_run
+        self.client = None
+        self._semaphore = None
+
+    async def start(self):
+        import aiohttp
+        from binance import AsyncClient
+        client_class = with_api_url(AsyncClient, self.base_url) if self.base_url else AsyncClient
+        # One pooled connection per concurrent call, kept alive between calls
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(_keep_response)
+        self.client = await asyncio.wait_for(client_class.create(
+            self.api_key, self.api_secret, session_params={"connector": connector, "trace_configs": [trace]}), self.timeout)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close_connection()
+            self.client = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _call(self, method, timeout=None, **params):
+        # Wait for the weight budget and a free slot, then run one client call with a timeout
+        from binance.exceptions import BinanceAPIException
+        weight, priority = endpoint_weight(method, params)
+        await request_weight_limiter.acquire_async(weight, priority, orders=1 if method.startswith("order_") else 0)
+        async with self._semaphore:
+            holder = {}
+            _response.set(holder)
+            try:
+                result = await asyncio.wait_for(getattr(self.client, method)(**params), timeout or self.timeout)
+            except BinanceAPIException as e:
+                request_weight_limiter.record_response(e.response)
+                raise
+            request_weight_limiter.record_response(holder.get("response"))
+            return result
+
+    async def get_account_balance(self):
+        # Get account balance for all assets
+        account_info = await self._call("get_account")
+        return {item['asset']: float(item['free']) for item in account_info['balances']}
+
+    async def place_market_buy_order(self, symbol, quantity):
+        # Place a market buy order
+        if self.dry_run:
+            logging.info(f"Dry run: Placing market buy order for {symbol} with quantity {quantity}")
+            return {'order_id': 'dry_run_order_id'}
+        return await self._call("order_market_buy", symbol=symbol, quantity=quantity)
+
+    async def place_market_sell_order(self, symbol, quantity):
+        # Place a market sell order
+        if self.dry_run:
+            logging.info(f"Dry run: Placing market sell order for {symbol} with quantity {quantity}")
+            return {'order_id': 'dry_run_order_id'}
+        return await self._call("order_market_sell", symbol=symbol, quantity=quantity)
+
+    async def get_symbol_ticker(self, symbol):
+        # Get latest price for a symbol
+        ticker = await self._call("get_symbol_ticker", symbol=symbol)
+        return float(ticker['price'])
+
+    async def get_all_prices(self):
+        # Get latest prices for all symbols with one request
+        tickers = await self._call("get_all_tickers")
+        return {ticker['symbol']: float(ticker['price']) for ticker in tickers}
+
+    async def get_order(self, symbol, order_id):
+        # Get the status and executed quantities of an order
+        return await self._call("get_order", symbol=symbol, orderId=order_id)
+
+    async def wait_for_order_completion(self, symbol, order_id, timeout=60):
+        # Wait for an order to be completed
+        start_time = time.time()
+        while True:
+            order_status = await self.get_order(symbol, order_id)
+            if order_status['status'] == 'FILLED':
+                return True
+            elif time.time() - start_time > timeout:
+                return False
+            await asyncio.sleep(1)
+
+    async def get_latest_kline_data(self, symbol, interval, limit=1000, start_time=None):
+        # Same arguments and result as BinanceAPI.get_latest_kline_data
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        return await self._call("get_klines", **params)
+
+    async def get_latest_kline_data_batch(self, symbols, interval, limit=1000):
+        # Fetch klines for many symbols concurrently
+        # Returns ({symbol: klines}, {symbol: exception}), a failing symbol does not abort the batch
+        responses = await asyncio.gather(*(self.get_latest_kline_data(symbol, interval, limit) for symbol in symbols),
+                                         return_exceptions=True)
+        results = {}
+        errors = {}
+        for symbol, response in zip(symbols, responses):
+            if isinstance(response, Exception):
+                errors[symbol] = response
+            else:
+                results[symbol] = response
+        return results, errors
+
+    async def _exchange_info(self, symbol=None):
+        # Shares the exchange info cache of the synchronous client
+        if exchange_info_cache.is_stale() or (symbol is not None and symbol not in exchange_info_cache.filters):
+            exchange_info_cache.load(await self._call("get_exchange_info"))
+        return exchange_info_cache.filters
+
+    async def get_all_symbols(self):
+        # Get all symbols from Binance
+        return list(await self._exchange_info())
+
+    async def get_symbol_filters(self, symbol):
+        # LOT_SIZE, MIN_NOTIONAL and PRICE_FILTER values from the cached exchange info
+        return (await self._exchange_info(symbol))[symbol]
+
+    async def get_symbol_minQty(self, symbol):
+        # Get the minimum order quantity for a symbol
+        return (await self.get_symbol_filters(symbol)).min_qty
+
+    async def get_symbol_stepSize(self, symbol):
+        # Get the lot size step for a symbol
+        return (await self.get_symbol_filters(symbol)).step_size
@@ -0,0 +1,244 @@
+import heapq
+import math
+import time
+import numpy as np
+import pandas as pd
+from ringobot.serviceData.featureEngineering import FEATURE_COLUMNS, feature_warmup
+from ringobot.serviceData.modelRegistry import registry
+from ringobot.serviceData.train.preprocess import sliding_window
+
+
+# Exit reasons, in the order the bot applies them within one hour
+SAFETY = "safety"
+EXPIRE = "expire"
+SIGNAL = "signal"
+OPEN = "open"  # Still held at the end of the data
+
+
+class MarketGrid:
+    """
+    Hourly closes and model signals of many symbols aligned on one time axis.
+
+    Args:
+        timestamps (pd.DatetimeIndex): Hourly time axis.
+        symbols (list): Symbol of every row.
+        close (np.ndarray): Close prices, shape (n_symbols, n_times), NaN where a symbol has no candle.
+        signals (np.ndarray): Model decisions (1 buy, -1 sell, 0 hold), same shape as close.
+    """
+
+    def __init__(self, timestamps, symbols, close, signals):
+        self.timestamps = timestamps
+        self.symbols = list(symbols)
+        self.close = close
+        self.signals = signals
+
+
+def model_signals(features, window_size=24, chunk=10_000):
+    """
+    Model decisions for every hour of one symbol, as detect_buy_sell_signal would have made them.
+
+    Args:
+        features (np.ndarray): Feature rows in FEATURE_COLUMNS order, one per hourly candle.
+        window_size (int, optional): Candles in each model window (default: 24).
+        chunk (int, optional): Windows predicted per model call, bounds the memory of the flattened input.
+
+    Returns:
+        np.ndarray: int8 decision per row, 0 where no complete window ends.
+    """
+    features = np.asarray(features, dtype=np.float32)
+    signals = np.zeros(len(features), dtype=np.int8)
+    windows = sliding_window(features, window_size)
+    predictor = registry.get_predictor()
+    for start in range(0, len(windows), chunk):
+        predictions = predictor.predict(windows[start:start + chunk])
+        # Window i ends at row i + window_size - 1, the last closed candle when the bot decides
+        signals[start + window_size - 1:start + window_size - 1 + len(predictions)] = np.ravel(predictions)
+    # Live windows never contain warm-up rows, do not trade on them here either
+    signals[:feature_warmup() + window_size - 1] = 0
+    return signals
+
+
+def load_grid(symbols, path="kline_data", window_size=24):
+    # Hourly features written by bulkDataImport.import_coin_data, predicted once per symbol
+    closes, signals = {}, {}
+    for symbol in symbols:
+        df = pd.read_parquet(f"{path}/{symbol}/{symbol}-1h.parquet", columns=FEATURE_COLUMNS).sort_index()
+        closes[symbol] = df["close"]
+        signals[symbol] = pd.Series(model_signals(df.to_numpy(dtype=np.float32), window_size), index=df.index)
+    return grid_from_series(closes, signals)
+
+
+def grid_from_series(closes, signals):
+    # Align per-symbol series on a common hourly axis
+    symbols = list(closes)
+    start = min(series.index[0] for series in closes.values())
+    end = max(series.index[-1] for series in closes.values())
+    timestamps = pd.date_range(start, end, freq="1h")
+    close = np.full((len(symbols), len(timestamps)), np.nan)
+    signal = np.zeros((len(symbols), len(timestamps)), dtype=np.int8)
+    for i, symbol in enumerate(symbols):
+        positions = timestamps.get_indexer(closes[symbol].index)
+        valid = positions >= 0
+        close[i, positions[valid]] = closes[symbol].to_numpy()[valid]
+        positions = timestamps.get_indexer(signals[symbol].index)
+        valid = positions >= 0
+        signal[i, positions[valid]] = signals[symbol].to_numpy()[valid]
+    return MarketGrid(timestamps, symbols, close, signal)
+
+
+def _forward_fill(values):
+    # Last known price along the time axis, NaN before a symbol's first candle
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = values[np.arange(values.shape[0])[:, None], index]
+    return filled
+
+
+def _next_index(mask):
+    # For every (symbol, t) the first t' >= t where mask is set, n_times if there is none
+    n_times = mask.shape[1]
+    index = np.where(mask, np.arange(n_times), n_times)
+    return np.minimum.accumulate(index[:, ::-1], axis=1)[:, ::-1]
+
+
+def run_backtest(grid, config, cash=10_000.0, fee=0.0, step_sizes=None):
+    """
+    Replay the runner's trading rules over a MarketGrid.
+
+    Every hour, in the order the scheduler applies them: open positions whose close fell below
+    buy_price * (1 - tolerance) are sold (safety_sell), positions held longer than hold_time are
+    sold (expire_sell), held symbols with a sell signal are sold when allow_sell (sell_crypto),
+    then symbols with a buy signal are bought when allow_buy (buy_crypto): nothing when max_trade
+    positions are open or the cash is below budget, owned symbols skipped, at most
+    max_trade - open positions new ones in symbol order, each for budget at the hourly close.
+    An order the remaining cash cannot pay for fails like an insufficient-balance order would.
+
+    The exit of a position only depends on its own symbol, so it is found with array searches
+    when the position opens. Python only loops over the hours with a buy signal, the equity
+    curve is built from the trades with cumulative sums.
+
+    Args:
+        grid (MarketGrid): Closes and signals.
+        config (Configurations): allow_buy, allow_sell, budget, tolerance, hold_time (seconds) and max_trade.
+        cash (float, optional): Starting USDT balance (default: 10000).
+        fee (float, optional): Fee fraction charged on every fill (default: 0).
+        step_sizes (dict, optional): LOT_SIZE step per symbol, quantities are not rounded without it.
+
+    Returns:
+        dict: trades (DataFrame), equity (Series) and summary statistics (dict).
+    """
+    started = time.perf_counter()
+    initial_cash = cash
+    n_symbols, n_times = grid.close.shape
+    price = _forward_fill(grid.close)
+    valid = ~np.isnan(grid.close)
+    sell_next = _next_index(grid.signals == -1) if config.allow_sell else np.full((n_symbols, n_times), n_times)
+    hold_steps = max(math.ceil(config.hold_time / 3600), 1)
+    steps = np.array([(step_sizes or {}).get(symbol, 0.0) for symbol in grid.symbols])
+    buy_mask = (grid.signals == 1) & valid
+
+    trades = []
+    open_exits = []  # heap of (exit_index, symbol_index, proceeds)
+    owned = np.zeros(n_symbols, dtype=bool)
+    buy_times = np.flatnonzero(buy_mask.any(axis=0)) if config.allow_buy else np.zeros(0, dtype=np.int64)
+    for t in buy_times:
+        while open_exits and open_exits[0][0] <= t:
+            _, s, proceeds = heapq.heappop(open_exits)
+            cash += proceeds
+            owned[s] = False
+        n_open = len(open_exits)
+        if n_open >= config.max_trade or cash < config.budget:
+            continue
+        candidates = np.flatnonzero(buy_mask[:, t] & ~owned)[:config.max_trade - n_open]
+        for s in candidates:
+            entry_price = price[s, t]
+            quantity = config.budget / entry_price
+            if steps[s]:
+                quantity = math.floor(quantity / steps[s]) * steps[s]
+            cost = quantity * entry_price * (1 + fee)
+            if quantity <= 0 or cost > cash:
+                continue
+            cash -= cost
+            exit_index, reason = _exit(grid.close[s], price[s], sell_next[s], t, entry_price, config.tolerance, hold_steps)
+            exit_price = price[s, exit_index]
+            proceeds = quantity * exit_price * (1 - fee)
+            owned[s] = True
+            heapq.heappush(open_exits, (exit_index if reason != OPEN else n_times, s, proceeds))
+            trades.append((s, t, exit_index, entry_price, exit_price, quantity, cost, proceeds, reason))
+
+    trades = pd.DataFrame(trades, columns=["symbol", "entry", "exit", "entry_price", "exit_price", "quantity",
+                                           "cost", "proceeds", "reason"])
+    equity = _equity_curve(grid, price, trades, initial_cash)
+    trades["pnl"] = trades["proceeds"] - trades["cost"]
+    trades["return"] = trades["pnl"] / trades["cost"]
+    trades["symbol"] = [grid.symbols[s] for s in trades["symbol"]]
+    trades["entry_time"] = grid.timestamps[trades["entry"].to_numpy()]
+    trades["exit_time"] = grid.timestamps[trades["exit"].to_numpy()]
+    summary = _summary(trades, equity)
+    summary["seconds"] = time.perf_counter() - started
+    return {"trades": trades, "equity": equity, "summary": summary}
+
+
+def _exit(close, price, sell_next, t, entry_price, tolerance, hold_steps):
+    # First hour after t where a rule sells the position, stop-loss before expiry before the sell signal
+    n_times = len(price)
+    end = min(t + hold_steps, n_times - 1)
+    stop = np.flatnonzero(close[t + 1:end + 1] < entry_price * (1 - tolerance))
+    stop_index = t + 1 + stop[0] if len(stop) else n_times
+    expire_index = t + hold_steps if t + hold_steps < n_times else n_times
+    signal_index = sell_next[t + 1] if t + 1 < n_times else n_times
+    exit_index = min(stop_index, expire_index, signal_index)
+    if exit_index >= n_times:
+        return n_times - 1, OPEN
+    if exit_index == stop_index:
+        return exit_index, SAFETY
+    if exit_index == expire_index:
+        return exit_index, EXPIRE
+    return exit_index, SIGNAL
+
+
+def _equity_curve(grid, price, trades, cash_start):
+    # Cash plus the value of the open positions at every hourly close
+    n_symbols, n_times = price.shape
+    holdings = np.zeros((n_symbols, n_times + 1))
+    cash_flow = np.zeros(n_times + 1)
+    if len(trades):
+        symbol = trades["symbol"].to_numpy()
+        entry = trades["entry"].to_numpy()
+        exit_ = np.where(trades["reason"].to_numpy() == OPEN, n_times, trades["exit"].to_numpy())
+        quantity = trades["quantity"].to_numpy()
+        np.add.at(holdings, (symbol, entry), quantity)
+        np.add.at(holdings, (symbol, exit_), -quantity)
+        np.add.at(cash_flow, entry, -trades["cost"].to_numpy())
+        np.add.at(cash_flow, exit_, trades["proceeds"].to_numpy())
+    holdings = np.cumsum(holdings, axis=1)[:, :n_times]
+    value = np.nansum(holdings * price, axis=0)
+    cash = cash_start + np.cumsum(cash_flow)[:n_times]
+    return pd.Series(cash + value, index=grid.timestamps, name="equity")
+
+
+def _summary(trades, equity):
+    returns = equity.pct_change().dropna()
+    drawdown = equity / equity.cummax() - 1
+    closed = trades[trades["reason"] != OPEN]
+    return {
+        "start_equity": float(equity.iloc[0]),
+        "final_equity": float(equity.iloc[-1]),
+        "total_return": float(equity.iloc[-1] / equity.iloc[0] - 1),
+        "max_drawdown": float(drawdown.min()),
+        "sharpe": float(returns.mean() / returns.std() * np.sqrt(24 * 365)) if returns.std() > 0 else 0.0,
+        "trades": int(len(trades)),
+        "win_rate": float((closed["pnl"] > 0).mean()) if len(closed) else 0.0,
+        "mean_trade_return": float(closed["return"].mean()) if len(closed) else 0.0,
+        "exits": closed["reason"].value_counts().to_dict(),
+    }
+
+
+if __name__ == "__main__":
+    from ringobot.serviceData.bulkDataImport import symbols
+    from ringobot.db.configurations import Configurations
+    grid = load_grid(symbols)
+    config = Configurations(id=0, allow_buy=1, allow_sell=1, budget=100, tolerance=0.05, hold_time=24, max_trade=10)
+    result = run_backtest(grid, config)
+    for key, value in result["summary"].items():
+        print(f"{key}: {value}")
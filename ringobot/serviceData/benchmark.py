@@ -0,0 +1,169 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+import requests
+from ringobot.config import EXCHANGE_URL, DATABASE_URL
+from ringobot.serviceData.klineCache import kline_cache
+from ringobot.serviceData.simulation import create_signals
+from ringobot.serviceData.streamingFeatures import IndicatorState, batch_features, check_parity
+
+
+def synthetic_candles(n=240, seed=0):
+    # Random walk close prices with positive volumes, indexed like get_symbol_data output
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    volume = rng.uniform(100, 1000, n)
+    index = pd.date_range("2024-01-01", periods=n, freq="1h")
+    return pd.DataFrame({"close": close, "volume": volume}, index=index)
+
+
+def time_per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark_create_signals(n_symbols=45, limit=240, repeat=5):
+    """
+    Compare the per-symbol latency of the full-history and live modes of create_signals.
+
+    Args:
+        n_symbols (int, optional): Number of synthetic symbols (default: 45).
+        limit (int, optional): Candles per symbol, as fetched by the runner (default: 240).
+        repeat (int, optional): Passes over all symbols (default: 5).
+
+    Returns:
+        dict: Mean seconds per symbol for each mode.
+    """
+    frames = [synthetic_candles(limit, seed) for seed in range(n_symbols)]
+    # Both modes must hand the model the same latest window
+    for df in frames:
+        full, _ = create_signals(df.copy())
+        live, _ = create_signals(df.copy(), live=True)
+        np.testing.assert_allclose(full[-1], live[0], equal_nan=True)
+
+    def run(live):
+        for df in frames:
+            create_signals(df.copy(), live=live)
+
+    full = time_per_call(lambda: run(False), repeat) / n_symbols
+    live = time_per_call(lambda: run(True), repeat) / n_symbols
+    return {"full": full, "live": live}
+
+
+def benchmark_streaming_features(n_symbols=45, limit=240, repeat=5):
+    """
+    Check the streaming indicator engine against the batch functions and compare their cost
+    of bringing one symbol up to date with a new closed candle.
+
+    Args:
+        n_symbols (int, optional): Number of synthetic symbols (default: 45).
+        limit (int, optional): Candles of history per symbol (default: 240).
+        repeat (int, optional): Passes over all symbols (default: 5).
+
+    Returns:
+        dict: Mean seconds per symbol for a batch recompute and a streaming update.
+    """
+    frames = [synthetic_candles(limit, seed) for seed in range(n_symbols)]
+    states = []
+    for df in frames:
+        check_parity(df)
+        state = IndicatorState()
+        for close, volume in zip(df["close"], df["volume"]):
+            state.update(close, volume)
+        states.append(state)
+
+    def run_batch():
+        for df in frames:
+            batch_features(df)
+
+    def run_streaming():
+        for df, state in zip(frames, states):
+            state.update(df["close"].iat[-1], df["volume"].iat[-1])
+
+    batch = time_per_call(run_batch, repeat) / n_symbols
+    streaming = time_per_call(run_streaming, repeat) / n_symbols
+    return {"batch": batch, "streaming": streaming}
+
+
+def benchmark_trading_loop(hours=24, config=None):
+    """
+    Run the scheduler jobs against the fake exchange (RINGOBOT_EXCHANGE_URL) and a local database
+    (RINGOBOT_DATABASE_URL), stepping the replay clock instead of waiting for the cron times.
+
+        python -m ringobot.serviceData.fakeExchange BTCUSDT ETHUSDT --port 8900 &
+        RINGOBOT_EXCHANGE_URL=http://127.0.0.1:8900 RINGOBOT_DATABASE_URL=sqlite:///e2e.db RINGOBOT_SLACK_WEBHOOK_URL= \
+            python -m ringobot.serviceData.benchmark trading-loop
+
+    Hold times are measured on the wall clock, so positions do not expire during a stepped run.
+    After every step the 5m candles read through kline_cache must have moved on, otherwise the jobs
+    would be trading on stale candles and the run stops.
+
+    Args:
+        hours (int, optional): Replay hours to run, each one hourly_job and twelve minute5_job runs (default: 24).
+        config (dict, optional): Config row to seed an empty database with.
+
+    Returns:
+        dict: Seconds per run of each job (mean, p50, max), the candle checks passed and the fake
+              exchange state at the end.
+
+    Raises:
+        RuntimeError: If a step brings no new candle.
+    """
+    if not EXCHANGE_URL or not DATABASE_URL:
+        raise RuntimeError("Set RINGOBOT_EXCHANGE_URL and RINGOBOT_DATABASE_URL to run against the fake exchange")
+    from ringobot.db.tables import create_database
+    from serviceMoney import hourly_job, minute5_job
+    create_database(config=config or {"allow_buy": 1, "allow_sell": 1, "budget": 100, "tolerance": 0.05,
+                                      "hold_time": 24, "max_trade": 10})
+    session = requests.Session()
+
+    def advance(seconds):
+        session.post(f"{EXCHANGE_URL}/fake/advance", data={"seconds": seconds}).raise_for_status()
+
+    # Any symbol the fake exchange replays, the jobs read every symbol's candles the same way
+    symbol = session.get(f"{EXCHANGE_URL}/api/v3/ticker/price").json()[0]["symbol"]
+    newest = [kline_cache.get_symbol_data(symbol, "5m", 2).index[-1]]
+
+    def check_new_candles():
+        candle = kline_cache.get_symbol_data(symbol, "5m", 2).index[-1]
+        if candle <= newest[-1]:
+            raise RuntimeError(f"No new {symbol} 5m candle after advancing the replay, the newest is still {candle}")
+        newest.append(candle)
+
+    durations = {"hourly_job": [], "minute5_job": []}
+    for _ in range(hours):
+        start = time.perf_counter()
+        hourly_job()
+        durations["hourly_job"].append(time.perf_counter() - start)
+        for _ in range(12):
+            advance(5 * 60)
+            check_new_candles()
+            start = time.perf_counter()
+            minute5_job()
+            durations["minute5_job"].append(time.perf_counter() - start)
+    results = {job: {"mean": float(np.mean(seconds)), "p50": float(np.median(seconds)), "max": float(np.max(seconds))}
+               for job, seconds in durations.items()}
+    results["candle_checks"] = len(newest) - 1
+    results["exchange"] = session.get(f"{EXCHANGE_URL}/fake/state").json()
+    return results
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["trading-loop"]:
+        results = benchmark_trading_loop()
+        for job in ("hourly_job", "minute5_job"):
+            print(f"{job}: mean {results[job]['mean'] * 1000:.1f} ms, p50 {results[job]['p50'] * 1000:.1f} ms, "
+                  f"max {results[job]['max'] * 1000:.1f} ms")
+        print(f"new candles seen after all {results['candle_checks']} steps")
+        print(f"fake exchange: {results['exchange']}")
+        sys.exit()
+    results = benchmark_create_signals()
+    print(f"create_signals full: {results['full'] * 1000:.3f} ms/symbol")
+    print(f"create_signals live: {results['live'] * 1000:.3f} ms/symbol")
+    print(f"speedup: {results['full'] / results['live']:.2f}x")
+    results = benchmark_streaming_features()
+    print(f"features batch recompute: {results['batch'] * 1000:.3f} ms/symbol")
+    print(f"features streaming update: {results['streaming'] * 1e6:.1f} us/symbol (parity checked)")
@@ -1,15 +1,52 @@
-from ringobot.config import binance_client, dryRun
+from ringobot.config import get_binance_client, dryRun, BINANCE_REQUEST_WEIGHT_PER_MINUTE, BINANCE_ORDERS_PER_10S, BINANCE_MAX_WORKERS, EXCHANGE_INFO_TTL
+from ringobot.serviceData.rateLimiter import RequestWeightLimiter, endpoint_weight, ORDER
+from binance.exceptions import BinanceAPIException
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+import threading
+import logging
+
+
+request_weight_limiter = RequestWeightLimiter(BINANCE_REQUEST_WEIGHT_PER_MINUTE, max_orders=BINANCE_ORDERS_PER_10S)
+_responses = threading.local()
+
+
+def _keep_response(response, *args, **kwargs):
+    # requests hook, runs in the calling thread, unlike client.response which every thread overwrites
+    _responses.last = response
 
 
 class BinanceAPI:
-    def __init__(self):
-        self.client = binance_client
+    def __init__(self, client=None):
+        self._client = client
         self.dry_run = dryRun
 
+    @property
+    def client(self):
+        # The shared client is only created by the first exchange call, importing stays offline
+        if self._client is None:
+            self._client = get_binance_client()
+        hooks = self._client.session.hooks["response"]
+        if _keep_response not in hooks:
+            hooks.append(_keep_response)
+        return self._client
+
+    def _request(self, method, **params):
+        # Every exchange call goes through the request weight limiter, which also reads the usage headers
+        weight, priority = endpoint_weight(method, params)
+        request_weight_limiter.acquire(weight, priority, orders=1 if method.startswith("order_") else 0)
+        _responses.last = None
+        try:
+            result = getattr(self.client, method)(**params)
+        except BinanceAPIException as e:
+            request_weight_limiter.record_response(e.response)
+            raise
+        request_weight_limiter.record_response(_responses.last)
+        return result
+
     def get_account_balance(self):
         # Get account balance for all assets
-        account_info = self.client.get_account()
+        account_info = self._request("get_account")
         balances = {item['asset']: float(item['free']) for item in account_info['balances']}
         return balances
 
@@ -19,7 +56,7 @@ class BinanceAPI:
             print(f"Dry run: Placing market buy order for {symbol} with quantity {quantity}")
             return {'order_id': 'dry_run_order_id'}  # Return dummy order data
         else:
-            order = self.client.order_market_buy(symbol=symbol, quantity=quantity)
+            order = self._request("order_market_buy", symbol=symbol, quantity=quantity)
             return order
 
     def place_market_sell_order(self, symbol, quantity):
@@ -28,56 +65,162 @@ class BinanceAPI:
             print(f"Dry run: Placing market sell order for {symbol} with quantity {quantity}")
             return {'order_id': 'dry_run_order_id'}  # Return dummy order data
         else:
-            order = self.client.order_market_sell(symbol=symbol, quantity=quantity)
+            order = self._request("order_market_sell", symbol=symbol, quantity=quantity)
             return order
 
     def get_symbol_ticker(self, symbol):
         # Get latest price for a symbol
-        ticker = self.client.get_symbol_ticker(symbol=symbol)
+        ticker = self._request("get_symbol_ticker", symbol=symbol)
         return float(ticker['price'])
 
+    def get_all_prices(self):
+        # Get latest prices for all symbols with one request
+        tickers = self._request("get_all_tickers")
+        return {ticker['symbol']: float(ticker['price']) for ticker in tickers}
+
+    def get_order(self, symbol, order_id):
+        # Get the status and executed quantities of an order
+        return self._request("get_order", symbol=symbol, orderId=order_id)
+
     def wait_for_order_completion(self, symbol, order_id, timeout=60):
         # Wait for an order to be completed
         start_time = time.time()
         while True:
-            order_status = self.client.get_order(symbol=symbol, orderId=order_id)
+            order_status = self.get_order(symbol, order_id)
             if order_status['status'] == 'FILLED':
                 return True
             elif time.time() - start_time > timeout:
                 return False
             time.sleep(1)
 
-    def get_latest_kline_data(self, symbol, interval, limit=1000):
+    def get_latest_kline_data(self, symbol, interval, limit=1000, start_time=None):
         # Get the latest N hours of candlestick data (kline data)
         # Interval options: 1m, 3m, 5m, 15m, 30m, 1h, 2h, 4h, 6h, 8h, 12h, 1d, 3d, 1w, 1M
         # Limit: Maximum 1000
-        klines = self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
+        # start_time: Optional open time in ms of the first candle to return
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        klines = self._request("get_klines", **params)
         return klines
 
+    def get_latest_kline_data_batch(self, symbols, interval, limit=1000, max_workers=BINANCE_MAX_WORKERS):
+        # Fetch klines for many symbols in parallel within the request weight budget
+        # Returns ({symbol: klines}, {symbol: exception}), a failing symbol does not abort the batch
+        results = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.get_latest_kline_data, symbol, interval, limit): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = e
+        return results, errors
+
+    def get_exchange_info(self):
+        # Trading rules of every symbol, use the cached get_symbol_filters instead
+        return self._request("get_exchange_info")
+
     def get_all_symbols(self):
         # Get all symbols from Binance
-        exchange_info = self.client.get_exchange_info()
-        symbols = [symbol['symbol'] for symbol in exchange_info['symbols']]
-        return symbols
+        return exchange_info_cache.symbols(self)
+
+    def get_symbol_filters(self, symbol):
+        # LOT_SIZE, MIN_NOTIONAL and PRICE_FILTER values from the cached exchange info
+        return exchange_info_cache.get(self, symbol)
 
     def get_symbol_minQty(self, symbol):
-        # Get the lot size for a symbol
-        symbol_info = self.client.get_symbol_info(symbol=symbol)
-        # return stepSize, minQty, minNotional
-        filters = symbol_info['filters']
-        minQty = None
+        # Get the minimum order quantity for a symbol
+        return self.get_symbol_filters(symbol).min_qty
+
+    def get_symbol_stepSize(self, symbol):
+        # Get the lot size step for a symbol
+        return self.get_symbol_filters(symbol).step_size
+
+
+class SymbolFilters:
+    # Trading rules of a symbol from its exchange info filters
+    def __init__(self, symbol, filters):
+        self.symbol = symbol
+        self.step_size = None
+        self.min_qty = None
+        self.max_qty = None
+        self.min_notional = None
+        self.tick_size = None
+        self.min_price = None
+        self.max_price = None
         for filter_item in filters:
-            if filter_item['filterType'] == 'LOT_SIZE':
-                minQty = float(filter_item['minQty'])
-        return minQty
-
-
-
-
-
-
-
-
-
-
-
+            filter_type = filter_item['filterType']
+            if filter_type == 'LOT_SIZE':
+                self.step_size = float(filter_item['stepSize'])
+                self.min_qty = float(filter_item['minQty'])
+                self.max_qty = float(filter_item['maxQty'])
+            elif filter_type in ('MIN_NOTIONAL', 'NOTIONAL'):
+                self.min_notional = float(filter_item['minNotional'])
+            elif filter_type == 'PRICE_FILTER':
+                self.tick_size = float(filter_item['tickSize'])
+                self.min_price = float(filter_item['minPrice'])
+                self.max_price = float(filter_item['maxPrice'])
+
+
+class ExchangeInfoCache:
+    """
+    Symbol filters for every symbol from a single get_exchange_info call.
+    The first access loads synchronously, after ttl seconds the data is refreshed in a
+    background thread while readers keep getting the previous copy.
+    """
+
+    def __init__(self, ttl=EXCHANGE_INFO_TTL):
+        self.ttl = ttl
+        self.filters = {}
+        self.loaded_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def refresh(self, client):
+        self.load(client.get_exchange_info())
+
+    def load(self, exchange_info):
+        filters = {item['symbol']: SymbolFilters(item['symbol'], item['filters']) for item in exchange_info['symbols']}
+        with self._lock:
+            self.filters = filters
+            self.loaded_at = time.time()
+            self._refreshing = False
+
+    def _refresh_in_background(self, client):
+        try:
+            self.refresh(client)
+        except Exception as e:
+            logging.error("Exchange info refresh failed")
+            logging.error(e)
+            with self._lock:
+                self._refreshing = False
+
+    def is_stale(self):
+        return not self.filters or time.time() - self.loaded_at >= self.ttl
+
+    def _ensure_loaded(self, client):
+        if not self.filters:
+            self.refresh(client)
+            return
+        with self._lock:
+            if self._refreshing or time.time() - self.loaded_at < self.ttl:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, args=(client,), daemon=True).start()
+
+    def get(self, client, symbol):
+        self._ensure_loaded(client)
+        if symbol not in self.filters:
+            # Newly listed symbol, load it now rather than waiting for the next refresh
+            self.refresh(client)
+        return self.filters[symbol]
+
+    def symbols(self, client):
+        self._ensure_loaded(client)
+        return list(self.filters)
+
+
+exchange_info_cache = ExchangeInfoCache()
@@ -1,8 +1,16 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
-import gc
 from ringobot.config import org, bucketMain, influxDBwriteApi
 from ringobot.serviceData.featureEngineering import *
 from ringobot.serviceData.calculateBuySellSignals import *
+from ringobot.serviceData.klineDataset import read_klines, dataset_fingerprint, ensure_dataset
 from tqdm import tqdm
 pd.set_option('display.max_columns', None)
 
@@ -21,59 +29,195 @@ symbols = [
 
 
 def import_coin_data(symbol):
-    try:
-        print(f"Importing data for {symbol}")
-        df = pd.read_parquet(f"kline_data/{symbol}/{symbol}-5m.parquet")
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df = df.sort_values(by='timestamp')
-        df = df.set_index('timestamp')
-        df = df[["close", "volume"]]
-        df = df.resample('1h').agg({'close': 'last', 'volume': 'sum'}).dropna()
-        df["symbol"] = symbol
-        df = calculate_bollinger_bands(df)
-        df = calculate_macd(df)
-        df = calculate_rsi(df)
-        df = calculate_rolling_mean_std(df)
-        df = calculate_vwma(df)
-        df.to_parquet(f"kline_data/{symbol}/{symbol}-1h.parquet")
-        influxDBwriteApi.write(bucketMain, org, df, data_frame_measurement_name="coinsH", data_frame_tag_columns=["symbol"])
-        influxDBwriteApi.close()
-        del df
-        gc.collect()
-    except Exception as e:
-        print(e)
+    # Hourly features of the 5m klines, saved as {symbol}-1h.parquet and written to InfluxDB
+    # Returns the number of rows written, errors are raised to the caller
+    print(f"Importing data for {symbol}")
+    df = read_klines(symbol, "5m", columns=["timestamp", "close", "volume"])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df = df.set_index('timestamp')
+    df = df.resample('1h').agg({'close': 'last', 'volume': 'sum'}).dropna()
+    features = compute_features(df['close'].values, df['volume'].values)
+    # The float32 matrix is the model's input, stored prices and volumes keep their float64 values
+    features = pd.DataFrame(features, index=df.index, columns=FEATURE_COLUMNS).astype("float64")
+    features["close"] = df["close"].astype("float64")
+    features["volume"] = df["volume"].astype("float64")
+    df = features
+    df["symbol"] = symbol
+    os.makedirs(f"kline_data/{symbol}", exist_ok=True)
+    df.to_parquet(f"kline_data/{symbol}/{symbol}-1h.parquet")
+    influxDBwriteApi.write(bucketMain, org, df, data_frame_measurement_name="coinsH", data_frame_tag_columns=["symbol"])
+    influxDBwriteApi.close()
+    return len(df)
 
 
 def import_buy_sell_signals(symbol):
+    # Buy/sell signals of the hourly features, saved as {symbol}-1h-signals.parquet and written to InfluxDB
+    # Returns the number of rows written, errors are raised to the caller
+    print(f"Importing buy/sell signals for {symbol}")
+    df = pd.read_parquet(f"kline_data/{symbol}/{symbol}-1h.parquet")
+    df = calculate_macd_buy_sell_signals(df)
+    df = calculate_rsi_buy_sell_signals(df)
+    df = calculate_bollinger_band_buy_sell_signals(df)
+    df = calculate_rolling_mean_std_buy_sell_signals(df)
+    df = calculate_vwma_buy_sell_signals(df)
+    df.drop(["bollinger_upper", "bollinger_lower", "bollinger_width", "bollinger_pct_b", "macd", "macd_signal", "macd_hist",
+                "rsi", "rolling_mean_12h", "rolling_std_12h", "rolling_mean_36h", "rolling_std_36h", "rolling_mean_96h", "rolling_std_96h",
+                "vwma_4h", "vwma_24h", "vwma_96h"], axis=1, inplace=True)
+    signal_cols = [col for col in df.columns if "buy" in col or "sell" in col]
+    df[signal_cols] = df[signal_cols].astype(int)
+    # drop records with no 1s in signal_cols
+    df = df[df[signal_cols].sum(axis=1) > 0]
+    df.to_parquet(f"kline_data/{symbol}/{symbol}-1h-signals.parquet")
+    influxDBwriteApi.write(bucketMain, org, df, data_frame_measurement_name="signalsv1", data_frame_tag_columns=["symbol"])
+    influxDBwriteApi.close()
+    return len(df)
+
+
+# Import stages in the order they run, with the source file whose change makes a stage run again
+STAGES = {
+    "features": (import_coin_data, lambda symbol: dataset_fingerprint(symbol, "5m")),
+    "signals": (import_buy_sell_signals, lambda symbol: file_fingerprint(f"kline_data/{symbol}/{symbol}-1h.parquet")),
+}
+
+
+def file_fingerprint(file_name):
+    # Size and modification time of a file, None when it does not exist
+    if not os.path.exists(file_name):
+        return None
+    stat = os.stat(file_name)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _import_symbol(symbol, stages, done):
+    """
+    Run the import stages of one symbol in a worker process.
+
+    Args:
+        symbol (str): Symbol to import.
+        stages (list): Stage names, in STAGES order.
+        done (dict): Stage name -> source fingerprint of its last successful run, from the manifest.
+
+    Returns:
+        dict: Stage name -> {"status": done/skipped/failed, "rows", "seconds", "source", "error"}.
+    """
+    results = {}
+    started = time.perf_counter()
     try:
-        print(f"Importing buy/sell signals for {symbol}")
-        df = pd.read_parquet(f"kline_data/{symbol}/{symbol}-1h.parquet")
-        df = calculate_macd_buy_sell_signals(df)
-        df = calculate_rsi_buy_sell_signals(df)
-        df = calculate_bollinger_band_buy_sell_signals(df)
-        df = calculate_rolling_mean_std_buy_sell_signals(df)
-        df = calculate_vwma_buy_sell_signals(df)
-        df.drop(["bollinger_upper", "bollinger_lower", "bollinger_width", "bollinger_pct_b", "macd", "macd_signal", "macd_hist",
-                    "rsi", "rolling_mean_12h", "rolling_std_12h", "rolling_mean_36h", "rolling_std_36h", "rolling_mean_96h", "rolling_std_96h",
-                    "vwma_4h", "vwma_24h", "vwma_96h"], axis=1, inplace=True)
-        signal_cols = [col for col in df.columns if "buy" in col or "sell" in col]
-        df[signal_cols] = df[signal_cols].astype(int)
-        # drop records with no 1s in signal_cols
-        df = df[df[signal_cols].sum(axis=1) > 0]
-        df.to_parquet(f"kline_data/{symbol}/{symbol}-1h-signals.parquet")
-        influxDBwriteApi.write(bucketMain, org, df, data_frame_measurement_name="signalsv1", data_frame_tag_columns=["symbol"])
-        influxDBwriteApi.close()
-        del df
-        gc.collect()
+        # A symbol that only has its file from before the kline dataset is moved into the dataset here,
+        # in its own worker, the fingerprints taken in the parent process only read
+        ensure_dataset(symbol, "5m")
     except Exception as e:
-        print(e)
+        return {stages[0]: {"status": "failed", "rows": 0, "seconds": time.perf_counter() - started, "source": None,
+                            "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}}
+    for stage in stages:
+        function, fingerprint = STAGES[stage]
+        started = time.perf_counter()
+        source = None
+        try:
+            source = fingerprint(symbol)
+            if source is None:
+                raise FileNotFoundError(f"No source data for the {stage} stage")
+            if done.get(stage) == source:
+                results[stage] = {"status": "skipped", "rows": 0, "seconds": time.perf_counter() - started, "source": source}
+                continue
+            rows = function(symbol)
+            results[stage] = {"status": "done", "rows": rows, "seconds": time.perf_counter() - started, "source": source}
+        except Exception as e:
+            results[stage] = {"status": "failed", "rows": 0, "seconds": time.perf_counter() - started, "source": source,
+                              "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+            # Later stages read what this one writes
+            break
+    return results
 
 
-if __name__ == "__main__":
-    for symbol in tqdm(symbols):
-        #import_coin_data(symbol)
-        import_buy_sell_signals(symbol)
+def run_import(symbols, stages=tuple(STAGES), workers=None, force=False, manifest_file="kline_data/import_manifest.json"):
+    """
+    Import many symbols in parallel, one symbol per task on a process pool.
+
+    Every worker process imports a single symbol and exits, which returns its memory to the
+    system, so the memory used stays at one symbol per worker. A failing symbol is reported and
+    the other symbols continue. A stage is skipped when its source data is unchanged since its
+    last successful run, recorded in manifest_file, so running the import again only redoes
+    what changed.
 
+    Args:
+        symbols (list): Symbols to import.
+        stages (list, optional): STAGES to run (default: all of them).
+        workers (int, optional): Processes, the cores available to this process by default.
+        force (bool, optional): Run every stage even when its source is unchanged (default: False).
+        manifest_file (str, optional): JSON file of the source fingerprints per symbol and stage.
 
+    Returns:
+        dict: summary (DataFrame of symbols done, skipped, failed, rows and seconds per stage)
+              and failures ({symbol: {stage: error}}).
+    """
+    stages = [stage for stage in STAGES if stage in stages]
+    manifest = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
 
+    started = time.perf_counter()
+    rows = []
+    failures = {}
+    # Symbols whose every stage is up to date do not need a worker
+    pending = []
+    for symbol in symbols:
+        done = {} if force else manifest.get(symbol, {})
+        if all(done.get(stage) is not None and done.get(stage) == STAGES[stage][1](symbol) for stage in stages):
+            rows += [{"symbol": symbol, "stage": stage, "status": "skipped", "rows": 0, "seconds": 0.0} for stage in stages]
+        else:
+            pending.append(symbol)
+    workers = max(min(workers, len(pending)), 1)
+    # Spawned workers open their own InfluxDB connections instead of sharing the parent's sockets
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             max_tasks_per_child=1) as executor:
+        futures = {executor.submit(_import_symbol, symbol, stages, {} if force else manifest.get(symbol, {})): symbol
+                   for symbol in pending}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            symbol = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                # The worker process itself died, e.g. killed for running out of memory
+                results = {stages[0]: {"status": "failed", "rows": 0, "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}}
+            entry = manifest.setdefault(symbol, {})
+            for stage, result in results.items():
+                rows.append({"symbol": symbol, "stage": stage, **result})
+                if result["status"] == "failed":
+                    entry.pop(stage, None)
+                    failures.setdefault(symbol, {})[stage] = result["error"]
+                    logging.error(f"Import of {symbol} failed in the {stage} stage: {result.get('traceback', result['error'])}")
+                else:
+                    entry[stage] = result["source"]
+            # Saved after every symbol so an interrupted import keeps the progress made
+            os.makedirs(os.path.dirname(manifest_file) or ".", exist_ok=True)
+            with open(manifest_file + ".tmp", "w") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(manifest_file + ".tmp", manifest_file)
 
+    results = pd.DataFrame(rows, columns=["symbol", "stage", "status", "rows", "seconds"])
+    summary = results.pivot_table(index="stage", columns="status", values="symbol", aggfunc="count", fill_value=0)
+    summary = summary.reindex(columns=["done", "skipped", "failed"], fill_value=0)
+    summary["rows"] = results.groupby("stage")["rows"].sum()
+    summary["seconds"] = results.groupby("stage")["seconds"].sum()
+    summary = summary.reindex(stages).fillna(0).astype({"done": int, "skipped": int, "failed": int, "rows": int})
+    logging.info(f"Imported {len(pending)} of {len(symbols)} symbols on {workers} workers in {time.perf_counter() - started:.1f} s")
+    return {"summary": summary, "failures": failures}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import features and buy/sell signals of many symbols in parallel")
+    parser.add_argument("symbols", nargs="*", default=symbols)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--force", action="store_true", help="Import symbols whose source data is unchanged too")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    result = run_import(args.symbols, args.stages, args.workers, args.force)
+    print(result["summary"].to_string())
+    for symbol, errors in result["failures"].items():
+        for stage, error in errors.items():
+            print(f"{symbol} failed in {stage}: {error}")
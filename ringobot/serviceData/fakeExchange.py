@@ -0,0 +1,380 @@
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+import numpy as np
+import pandas as pd
+from ringobot.serviceData.klineDataset import read_klines
+from ringobot.serviceData.rateLimiter import endpoint_weight
+
+# Kept free of ringobot.config so the server can run before, and without, the exchange client it replaces
+
+
+UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+# REST path -> python-binance method name, for the request weights in rateLimiter.ENDPOINTS
+PATHS = {
+    ("GET", "/api/v3/klines"): "get_klines",
+    ("GET", "/api/v3/ticker/price"): "get_all_tickers",
+    ("GET", "/api/v3/account"): "get_account",
+    ("GET", "/api/v3/exchangeInfo"): "get_exchange_info",
+    ("GET", "/api/v3/order"): "get_order",
+    ("POST", "/api/v3/order"): "order_market_buy",
+}
+
+
+def interval_ms(interval):
+    return int(interval[:-1]) * UNIT_MS[interval[-1]]
+
+
+def load_candles(symbols, path="kline_data", interval="5m", start=None, end=None):
+    # Historical candles downloaded by test.py, one frame per symbol, optionally only [start, end)
+    return {symbol: read_klines(symbol, interval, columns=["timestamp", "open", "high", "low", "close", "volume"],
+                                start=start, end=end, path=path) for symbol in symbols}
+
+
+class FakeExchangeError(Exception):
+    def __init__(self, status, code, msg, headers=None):
+        super().__init__(msg)
+        self.status = status
+        self.code = code
+        self.msg = msg
+        self.headers = headers or {}
+
+
+class ReplayCandles:
+    # Source candles of one symbol as sorted arrays
+    def __init__(self, df):
+        df = df.reset_index() if "timestamp" not in df.columns else df
+        timestamp = df["timestamp"]
+        if not np.issubdtype(timestamp.dtype, np.integer):
+            timestamp = pd.to_datetime(timestamp).astype("datetime64[ms]").astype(np.int64)
+        order = np.argsort(timestamp.to_numpy(), kind="stable")
+        self.open_time = timestamp.to_numpy()[order].astype(np.int64)
+        close = df["close"].to_numpy(dtype=np.float64)[order]
+        self.close = close
+        self.open = df["open"].to_numpy(dtype=np.float64)[order] if "open" in df else close
+        self.high = df["high"].to_numpy(dtype=np.float64)[order] if "high" in df else close
+        self.low = df["low"].to_numpy(dtype=np.float64)[order] if "low" in df else close
+        self.volume = df["volume"].to_numpy(dtype=np.float64)[order]
+        self.step = int(np.median(np.diff(self.open_time))) if len(self.open_time) > 1 else 300_000
+
+    def aggregate(self, lo, hi, step):
+        # Candles of length step (ms) from source rows lo:hi, finer steps split each source candle evenly
+        if step < self.step:
+            parts = self.step // step
+            open_time = (self.open_time[lo:hi, None] + np.arange(parts) * step).ravel()
+            close = np.repeat(self.close[lo:hi], parts)
+            return open_time, close, close, close, close, np.repeat(self.volume[lo:hi] / parts, parts)
+        keys = self.open_time[lo:hi] // step * step
+        if len(keys) == 0:
+            return (keys,) + tuple(np.zeros(0) for _ in range(5))
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+        return (keys[starts], self.open[lo:hi][starts], np.maximum.reduceat(self.high[lo:hi], starts),
+                np.minimum.reduceat(self.low[lo:hi], starts), self.close[lo:hi][ends], np.add.reduceat(self.volume[lo:hi], starts))
+
+
+class FakeExchange:
+    """
+    Local stand-in for the Binance REST endpoints BinanceAPI uses, serving historical candles as if
+    they were live. The replay clock starts at `start` (default: 120 hours into the data) and runs at
+    `speed` times real time, advance() moves it forward instantly. Served timestamps are shifted so
+    the replay start maps to the moment the server started.
+
+    Orders fill immediately at the current close against an in-memory account, or after
+    fill_delay seconds to exercise order polling. Responses carry X-MBX-USED-WEIGHT-1M and
+    X-MBX-ORDER-COUNT-10S headers like Binance.
+
+    Args:
+        candles (dict): Symbol -> DataFrame with timestamp (ms or datetime), close and volume, plus optional open/high/low.
+        balances (dict, optional): Starting free balance per asset (default: 10000 USDT).
+        start (int, optional): Data time in ms the replay starts from.
+        speed (float, optional): Replay seconds per wall-clock second (default: 1).
+        latency (float or tuple, optional): Seconds added to every response, or a (min, max) range.
+        error_rate (float, optional): Fraction of requests answered with a 503.
+        rate_limit_rate (float, optional): Fraction of requests answered with a 429.
+        fill_delay (float, optional): Seconds before orders report FILLED (default: 0).
+        seed (int, optional): Seed of the error injection.
+    """
+
+    def __init__(self, candles, balances=None, start=None, speed=1.0, latency=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, fill_delay=0.0, seed=None):
+        self.candles = {symbol: ReplayCandles(df) for symbol, df in candles.items()}
+        self.balances = dict(balances or {"USDT": 10000.0})
+        first = max(int(replay.open_time[0]) for replay in self.candles.values())
+        self.start = int(start) if start is not None else first + 120 * 3_600_000
+        self.speed = speed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.fill_delay = fill_delay
+        self.random = random.Random(seed)
+        self.started = time.time()
+        self.shift = int(self.started * 1000) - self.start
+        self.advanced = 0
+        self.orders = {}
+        self.next_order_id = 1
+        self.failures = []  # (status, code, msg, retry_after) answered before anything else
+        self.weight = (None, 0)  # (minute, used weight)
+        self.order_times = []
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def now(self):
+        # Current replay time in data ms
+        return int(self.start + ((time.time() - self.started) * self.speed + self.advanced) * 1000)
+
+    def advance(self, seconds):
+        with self._lock:
+            self.advanced += seconds
+        return self.now()
+
+    def fail_next(self, status=503, n=1, retry_after=None):
+        # Answer the next n requests with an error
+        code, msg = (-1003, "Too many requests.") if status in (418, 429) else (-1001, "Internal error.")
+        with self._lock:
+            self.failures.extend([(status, code, msg, retry_after)] * n)
+
+    def _index(self, symbol):
+        # Source candles visible at the current replay time
+        candles = self.candles.get(symbol)
+        if candles is None:
+            raise FakeExchangeError(400, -1121, "Invalid symbol.")
+        return candles, int(np.searchsorted(candles.open_time, self.now(), side="right"))
+
+    def price(self, symbol):
+        candles, hi = self._index(symbol)
+        return float(candles.close[max(hi - 1, 0)])
+
+    def klines(self, symbol, interval, limit=500, startTime=None, endTime=None, **_):
+        candles, hi = self._index(symbol)
+        step, limit = interval_ms(interval), min(int(limit), 1000)
+        if endTime is not None:
+            hi = min(hi, int(np.searchsorted(candles.open_time, int(endTime) - self.shift, side="right")))
+        per_candle = max(math.ceil(step / candles.step), 1)
+        if startTime is not None:
+            first = (int(startTime) - self.shift) // step * step
+            lo = int(np.searchsorted(candles.open_time, first))
+            hi = min(hi, lo + (limit + 1) * per_candle)
+            rows = [column[:limit] for column in candles.aggregate(lo, hi, step)]
+        else:
+            lo = max(hi - (limit + 1) * per_candle, 0)
+            rows = [column[-limit:] for column in candles.aggregate(lo, hi, step)]
+        open_time, open_, high, low, close, volume = rows
+        open_time = open_time + self.shift
+        return [[int(t), f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.8f}", int(t) + step - 1,
+                 f"{c * v:.8f}", 0, "0", "0", "0"] for t, o, h, l, c, v in zip(open_time, open_, high, low, close, volume)]
+
+    def tickers(self, symbol=None, **_):
+        if symbol is not None:
+            return {"symbol": symbol, "price": f"{self.price(symbol):.8f}"}
+        return [{"symbol": symbol, "price": f"{self.price(symbol):.8f}"} for symbol in self.candles]
+
+    def account(self, **_):
+        with self._lock:
+            balances = [{"asset": asset, "free": f"{free:.8f}", "locked": "0.00000000"} for asset, free in self.balances.items()]
+        return {"canTrade": True, "balances": balances}
+
+    def exchange_info(self, **_):
+        symbols = []
+        for symbol in self.candles:
+            # Lot size with about five significant digits of quantity at the current price
+            step_size = min(max(10.0 ** (math.floor(math.log10(self.price(symbol))) - 4), 1e-8), 1.0)
+            symbols.append({
+                "symbol": symbol, "status": "TRADING", "baseAsset": symbol[:-4], "quoteAsset": symbol[-4:],
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "minPrice": "0.00000001", "maxPrice": "1000000.00000000", "tickSize": "0.00000001"},
+                    {"filterType": "LOT_SIZE", "minQty": f"{step_size:.8f}", "maxQty": "9000000.00000000", "stepSize": f"{step_size:.8f}"},
+                    {"filterType": "NOTIONAL", "minNotional": "5.00000000"},
+                ],
+            })
+        return {"timezone": "UTC", "serverTime": self.now() + self.shift, "rateLimits": [], "symbols": symbols}
+
+    def create_order(self, symbol, side, quantity, type="MARKET", **_):
+        if type != "MARKET":
+            raise FakeExchangeError(400, -1116, "Invalid orderType.")
+        price, quantity = self.price(symbol), float(quantity)
+        base, quote = symbol[:-4], symbol[-4:]
+        with self._lock:
+            pay, pay_amount, receive, receive_amount = (quote, price * quantity, base, quantity) if side == "BUY" \
+                else (base, quantity, quote, price * quantity)
+            if self.balances.get(pay, 0.0) + 1e-12 < pay_amount:
+                raise FakeExchangeError(400, -2010, "Account has insufficient balance for requested action.")
+            self.balances[pay] = self.balances.get(pay, 0.0) - pay_amount
+            self.balances[receive] = self.balances.get(receive, 0.0) + receive_amount
+            order_id, self.next_order_id = self.next_order_id, self.next_order_id + 1
+            order = {
+                "symbol": symbol, "orderId": order_id, "clientOrderId": f"fake{order_id}", "transactTime": self.now() + self.shift,
+                "price": "0.00000000", "origQty": f"{quantity:.8f}", "executedQty": f"{quantity:.8f}",
+                "cummulativeQuoteQty": f"{price * quantity:.8f}", "status": "FILLED", "timeInForce": "GTC",
+                "type": "MARKET", "side": side,
+                "fills": [{"price": f"{price:.8f}", "qty": f"{quantity:.8f}", "commission": "0", "commissionAsset": quote}],
+            }
+            self.orders[order_id] = (time.time() + self.fill_delay, order)
+        return self._order_view(order_id)
+
+    def _order_view(self, order_id):
+        filled_at, order = self.orders[order_id]
+        if time.time() >= filled_at:
+            return order
+        return dict(order, status="NEW", executedQty="0.00000000", cummulativeQuoteQty="0.00000000", fills=[])
+
+    def get_order(self, symbol, orderId, **_):
+        with self._lock:
+            if int(orderId) not in self.orders:
+                raise FakeExchangeError(400, -2013, "Order does not exist.")
+            return self._order_view(int(orderId))
+
+    def handle(self, method, path, params):
+        # Returns (status, body, headers) for one request
+        if self.latency:
+            time.sleep(self.random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency)
+        headers = {}
+        try:
+            with self._lock:
+                self.requests += 1
+                failure = self.failures.pop(0) if self.failures else None
+            if failure is None and self.random.random() < self.rate_limit_rate:
+                failure = (429, -1003, "Too many requests.", 1)
+            if failure is None and self.random.random() < self.error_rate:
+                failure = (503, -1001, "Internal error.", None)
+            if failure is not None:
+                status, code, msg, retry_after = failure
+                raise FakeExchangeError(status, code, msg, {"Retry-After": str(retry_after)} if retry_after else None)
+            body = self._route(method, path, params)
+            status = 200
+        except FakeExchangeError as e:
+            status, body = e.status, {"code": e.code, "msg": e.msg}
+            headers.update(e.headers)
+        except Exception as e:
+            logging.exception(f"Fake exchange failed on {method} {path}")
+            status, body = 500, {"code": -1000, "msg": str(e)}
+        headers.update(self._count(method, path, params))
+        return status, body, headers
+
+    def _route(self, method, path, params):
+        if path == "/api/v3/ping":
+            return {}
+        if path == "/api/v3/time":
+            return {"serverTime": self.now() + self.shift}
+        if path == "/api/v3/klines":
+            return self.klines(**params)
+        if path == "/api/v3/ticker/price":
+            return self.tickers(**params)
+        if path == "/api/v3/account":
+            return self.account(**params)
+        if path == "/api/v3/exchangeInfo":
+            return self.exchange_info(**params)
+        if path == "/api/v3/order":
+            return self.create_order(**params) if method == "POST" else self.get_order(**params)
+        # Control endpoints for driving the replay from another process
+        if path == "/fake/advance" and method == "POST":
+            return {"now": self.advance(float(params.get("seconds", 0))) + self.shift}
+        if path == "/fake/state":
+            with self._lock:
+                return {"now": self.now() + self.shift, "requests": self.requests, "orders": len(self.orders), "balances": dict(self.balances)}
+        raise FakeExchangeError(404, -1000, f"Unknown endpoint {method} {path}")
+
+    def _count(self, method, path, params):
+        # Usage headers, counted per calendar minute like Binance
+        name = PATHS.get((method, path))
+        weight = endpoint_weight(name, {"limit": int(params.get("limit", 500))})[0] if name else 1
+        now = time.time()
+        with self._lock:
+            minute = int(now // 60)
+            used = self.weight[1] + weight if self.weight[0] == minute else weight
+            self.weight = (minute, used)
+            if method == "POST" and path == "/api/v3/order":
+                self.order_times.append(now)
+            self.order_times = [t for t in self.order_times if now - t < 10]
+            return {"X-MBX-USED-WEIGHT-1M": str(used), "X-MBX-ORDER-COUNT-10S": str(len(self.order_times))}
+
+
+class FakeExchangeServer:
+    """
+    Serves a FakeExchange over HTTP. Point a client at it with RINGOBOT_EXCHANGE_URL (see config.py),
+    AsyncBinanceAPI(base_url=...) or with_api_url().
+
+    Args:
+        exchange (FakeExchange): Replay state.
+        host (str, optional): Interface to bind (default: 127.0.0.1).
+        port (int, optional): Port to bind, 0 picks a free one (default: 0).
+    """
+
+    def __init__(self, exchange, host="127.0.0.1", port=0):
+        self.exchange = exchange
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive like the real API
+
+            def _serve(self, method):
+                url = urlparse(self.path)
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    params.update(parse_qsl(self.rfile.read(length).decode()))
+                params.pop("signature", None)
+                params.pop("timestamp", None)
+                status, body, headers = exchange.handle(method, url.path, params)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self.url = f"http://{self.address[0]}:{self.address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Replay the kline_data dataset as a local Binance REST API")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--path", default="kline_data")
+    parser.add_argument("--data-start", help="Only load candles from this time, e.g. 2024-01-01")
+    parser.add_argument("--data-end", help="Only load candles before this time")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--fill-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    candles = load_candles(args.symbols, args.path, start=args.data_start, end=args.data_end)
+    exchange = FakeExchange(candles, speed=args.speed, latency=args.latency,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, fill_delay=args.fill_delay)
+    server = FakeExchangeServer(exchange, port=args.port).start()
+    logging.info(f"Fake exchange for {len(args.symbols)} symbols on {server.url}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -2,6 +2,18 @@ import pandas as pd
 import numpy as np
 
 
+# Layout of the matrix returned by compute_features. Bump FEATURE_VERSION whenever the columns,
+# their order or their definition change, models trained on another version cannot be used.
+FEATURE_VERSION = 1
+FEATURE_COLUMNS = [
+    "close", "volume",
+    "bollinger_upper", "bollinger_lower", "bollinger_width", "bollinger_pct_b",
+    "macd", "macd_signal", "macd_hist", "rsi",
+    "rolling_mean_12h", "rolling_std_12h", "rolling_mean_36h", "rolling_std_36h", "rolling_mean_96h", "rolling_std_96h",
+    "vwma_4h", "vwma_24h", "vwma_96h",
+]
+
+
 def calculate_macd(data, slow=26, fast=12, smooth=9):
     """
     This function calculates the Moving Average Convergence Divergence (MACD) indicator.
@@ -109,3 +121,98 @@ def calculate_vwma(data, windows=[4, 24, 96]):
 
 
 
+
+
+def feature_warmup(slow=26, smooth=9, rsi_period=14, bollinger_window=20, rolling_windows=[12, 36, 96], vwma_windows=[4, 24, 96]):
+    """
+    This function calculates how many candles the feature set needs before every feature has a value.
+
+    Args:
+        slow (int, optional): Period for the slow MACD moving average (default: 26).
+        smooth (int, optional): Period for the MACD signal line (default: 9).
+        rsi_period (int, optional): Period for calculating RSI (default: 14).
+        bollinger_window (int, optional): Window size of the Bollinger Bands (default: 20).
+        rolling_windows (list): Window sizes of the rolling mean and standard deviation.
+        vwma_windows (list): Window sizes of the VWMA.
+
+    Returns:
+        int: Index of the first row where no feature is NaN, plus one.
+    """
+    return max(slow + smooth - 1, rsi_period + 1, bollinger_window, max(rolling_windows), max(vwma_windows))
+
+
+def feature_manifest():
+    """
+    This function describes the layout of the compute_features matrix.
+
+    Returns:
+        dict: Feature version and column names in matrix order.
+    """
+    return {"version": FEATURE_VERSION, "columns": list(FEATURE_COLUMNS)}
+
+
+def compute_features(close, volume, slow=26, fast=12, smooth=9, rsi_period=14, bollinger_window=20, bollinger_std=2,
+                     rolling_windows=[12, 36, 96], vwma_windows=[4, 24, 96]):
+    """
+    This function calculates every model feature in one pass into a preallocated matrix.
+    The values are the ones the calculate_* functions above produce, in FEATURE_COLUMNS order.
+
+    Args:
+        close (array-like): Close prices, oldest first.
+        volume (array-like): Volumes aligned with close.
+
+    Returns:
+        np.ndarray: C-contiguous float32 matrix of shape (len(close), len(FEATURE_COLUMNS)).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    out = np.empty((len(close), len(FEATURE_COLUMNS)), dtype=np.float32)
+    price = pd.Series(close)
+    out[:, 0] = close
+    out[:, 1] = volume
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Bollinger Bands
+        rolling = price.rolling(window=bollinger_window)
+        moving_average = rolling.mean().to_numpy()
+        std_dev = rolling.std().to_numpy()
+        upper = moving_average + bollinger_std * std_dev
+        lower = moving_average - bollinger_std * std_dev
+        out[:, 2] = upper
+        out[:, 3] = lower
+        out[:, 4] = (upper - lower) / moving_average * 100
+        out[:, 5] = (close - lower) / (upper - lower)
+
+        # MACD
+        ema_slow = price.ewm(span=slow, min_periods=slow).mean()
+        ema_fast = price.ewm(span=fast, min_periods=fast).mean()
+        macd = ema_fast - ema_slow
+        macd_signal = macd.ewm(span=smooth, min_periods=smooth).mean()
+        out[:, 6] = macd.to_numpy()
+        out[:, 7] = macd_signal.to_numpy()
+        out[:, 8] = (macd - macd_signal).to_numpy()
+
+        # RSI, the first row has no change and stays NaN
+        delta = price.diff().iloc[1:]
+        avg_gain = delta.clip(lower=0).ewm(alpha=1 / rsi_period, min_periods=rsi_period).mean().to_numpy()
+        avg_loss = (-delta).clip(lower=0).ewm(alpha=1 / rsi_period, min_periods=rsi_period).mean().to_numpy(copy=True)
+        avg_loss[avg_loss == 0] = np.nan
+        out[:1, 9] = np.nan
+        out[1:, 9] = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        # Rolling mean and standard deviation
+        column = 10
+        for window in rolling_windows:
+            rolling = price.rolling(window=window)
+            out[:, column] = rolling.mean().to_numpy()
+            out[:, column + 1] = rolling.std().to_numpy()
+            column += 2
+
+        # VWMA
+        price_volume = pd.Series(close * volume)
+        volume_series = pd.Series(volume)
+        for window in vwma_windows:
+            out[:, column] = price_volume.rolling(window=window).sum().to_numpy() / volume_series.rolling(window=window).sum().to_numpy()
+            column += 1
+    return out
+
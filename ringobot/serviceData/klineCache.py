@@ -0,0 +1,175 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from ringobot.config import BINANCE_MAX_WORKERS
+from ringobot.serviceData.binance import BinanceAPI
+from ringobot.serviceData.featureEngineering import feature_warmup
+
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000, "8h": 28_800_000,
+    "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000, "1w": 604_800_000,
+}
+MAX_KLINES_PER_REQUEST = 1000
+
+
+def required_candles(window_size=24):
+    # Candles needed so the latest model window has no NaN features
+    # The newest candle is still open and is not part of the window, which the warm-up count already covers
+    return feature_warmup() + window_size
+
+
+def decode_klines(klines):
+    """
+    Parse only the fields the bot uses from a Binance klines response.
+
+    Args:
+        klines (list): Rows of [open_time, open, high, low, close, volume, close_time, ...].
+
+    Returns:
+        tuple: open_time and close_time as int64 arrays, close and volume as float64 arrays.
+    """
+    open_time = np.fromiter((k[0] for k in klines), dtype=np.int64, count=len(klines))
+    close_time = np.fromiter((k[6] for k in klines), dtype=np.int64, count=len(klines))
+    close = np.fromiter((float(k[4]) for k in klines), dtype=np.float64, count=len(klines))
+    volume = np.fromiter((float(k[5]) for k in klines), dtype=np.float64, count=len(klines))
+    return open_time, close_time, close, volume
+
+
+def to_dataframe(open_time, close, volume):
+    # Same layout as simulation.get_symbol_data
+    index = pd.to_datetime(open_time, unit='ms')
+    index.name = 'timestamp'
+    return pd.DataFrame({"close": close, "volume": volume}, index=index)
+
+
+class KlineRingBuffer:
+    """
+    Fixed-size, time-ordered store of candles for one (symbol, interval).
+
+    Args:
+        capacity (int): Maximum number of candles kept, the oldest are overwritten first.
+        interval_ms (int, optional): Candle length, when given candles that would leave a gap after
+                                     the cached ones are rejected.
+    """
+
+    def __init__(self, capacity, interval_ms=None):
+        self.capacity = capacity
+        self.interval_ms = interval_ms
+        self.open_time = np.zeros(capacity, dtype=np.int64)
+        self.close_time = np.zeros(capacity, dtype=np.int64)
+        self.close = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _positions(self, n):
+        return (self.start + self.size - n + np.arange(n)) % self.capacity
+
+    def last_open_time(self):
+        return int(self.open_time[(self.start + self.size - 1) % self.capacity]) if self.size else None
+
+    def extend(self, open_time, close_time, close, volume):
+        # Returns False without storing anything when the candles do not follow on from the cached ones
+        if len(open_time) == 0:
+            return True
+        if self.interval_ms is not None and self.size and open_time[0] > self.last_open_time() + self.interval_ms:
+            return False
+        # Candles that come again (the one that was still open) replace the cached copy
+        while self.size and self.last_open_time() >= open_time[0]:
+            self.size -= 1
+        # Only the newest capacity candles can be kept
+        open_time, close_time = open_time[-self.capacity:], close_time[-self.capacity:]
+        close, volume = close[-self.capacity:], volume[-self.capacity:]
+        n = len(open_time)
+        overflow = max(self.size + n - self.capacity, 0)
+        self.start = (self.start + overflow) % self.capacity
+        self.size -= overflow
+        positions = (self.start + self.size + np.arange(n)) % self.capacity
+        self.open_time[positions] = open_time
+        self.close_time[positions] = close_time
+        self.close[positions] = close
+        self.volume[positions] = volume
+        self.size += n
+        return True
+
+    def tail(self, n):
+        # Newest n candles in chronological order, as copies
+        positions = self._positions(min(n, self.size))
+        return self.open_time[positions], self.close_time[positions], self.close[positions], self.volume[positions]
+
+
+class KlineCache:
+    """
+    In-process kline cache. The first request for a (symbol, interval) downloads the
+    candles, later requests only fetch the candles newer than the cached ones.
+
+    Args:
+        api (BinanceAPI, optional): Client used for fetching.
+        capacity (int, optional): Candles kept per (symbol, interval) (default: 1000).
+    """
+
+    def __init__(self, api=None, capacity=MAX_KLINES_PER_REQUEST):
+        self.api = api or BinanceAPI()
+        self.capacity = capacity
+        self._buffers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, symbol, interval, limit, start_time=None):
+        klines = self.api.get_latest_kline_data(symbol, interval, limit=limit, start_time=start_time)
+        return decode_klines(klines)
+
+    def refresh(self, symbol, interval, limit):
+        key = (symbol, interval)
+        with self._key_lock(key):
+            buffer = self._buffers.get(key)
+            if buffer is None or buffer.capacity < limit:
+                buffer = KlineRingBuffer(max(self.capacity, limit), INTERVAL_MS[interval])
+                self._buffers[key] = buffer
+            last_open = buffer.last_open_time()
+            now = int(time.time() * 1000)
+            # At least the cached candle and the one after it, a local clock behind the exchange would give less
+            missing = max((now - last_open) // INTERVAL_MS[interval] + 1, 2) if last_open is not None else None
+            if len(buffer) >= limit and missing < min(limit, MAX_KLINES_PER_REQUEST):
+                # Delta fetch, starting at the last cached candle which may not have closed yet
+                delta_limit = int(missing) + 1
+                open_time, close_time, close, volume = self._fetch(symbol, interval, delta_limit, start_time=last_open)
+                # A full response may have stopped short of the exchange's newest candle, e.g. when its clock
+                # is ahead of ours, so only a shorter one is known to reach it
+                if 0 < len(open_time) < delta_limit and buffer.extend(open_time, close_time, close, volume):
+                    return buffer.tail(limit)
+            # Cold start, too long a gap or a delta that does not reach the newest candle, download the whole lookback
+            buffer.size = 0
+            buffer.extend(*self._fetch(symbol, interval, limit))
+            return buffer.tail(limit)
+
+    def get_symbol_data(self, symbol, interval, limit):
+        open_time, _, close, volume = self.refresh(symbol, interval, limit)
+        return to_dataframe(open_time, close, volume)
+
+    def get_symbols_data(self, symbols, interval, limit, max_workers=BINANCE_MAX_WORKERS):
+        # Returns ({symbol: DataFrame}, {symbol: exception}) in the order of symbols
+        results = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {symbol: executor.submit(self.get_symbol_data, symbol, interval, limit) for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                errors[symbol] = e
+        return results, errors
+
+
+kline_cache = KlineCache()
@@ -0,0 +1,113 @@
+import glob
+import io
+import os
+import zipfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+
+# Columns of the Binance kline CSVs
+COLUMNS = [
+    "timestamp", "open", "high", "low", "close",
+    "volume", "close_time", "quote_asset_volume",
+    "number_of_trades", "taker_buy_base_asset_volume",
+    "taker_buy_quote_asset_volume", "ignore"
+]
+
+# Parquet schema, the unused "ignore" column is not kept
+SCHEMA = pa.schema([
+    ("timestamp", pa.int64()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("volume", pa.float64()),
+    ("close_time", pa.int64()),
+    ("quote_asset_volume", pa.float64()),
+    ("number_of_trades", pa.int32()),
+    ("taker_buy_base_asset_volume", pa.float64()),
+    ("taker_buy_quote_asset_volume", pa.float64()),
+])
+
+# Times above this are microseconds, Binance switched the spot archives from milliseconds in 2025
+_MICROSECONDS = 10 ** 14
+
+
+def read_archive(file_name):
+    """
+    Read the kline CSVs of one zip archive without extracting it.
+
+    Args:
+        file_name (str): Path of the zip archive.
+
+    Returns:
+        pa.Table: Klines with the SCHEMA columns, timestamps in milliseconds.
+    """
+    tables = []
+    with zipfile.ZipFile(file_name) as archive:
+        for member in archive.namelist():
+            if not member.endswith(".csv"):
+                continue
+            with archive.open(member) as stream:
+                stream = io.BufferedReader(stream)
+                # Some archives start with a header line, the others with the first kline
+                has_header = not stream.peek(1)[:1].isdigit()
+                tables.append(pv.read_csv(
+                    stream,
+                    read_options=pv.ReadOptions(column_names=COLUMNS, skip_rows=1 if has_header else 0),
+                    convert_options=pv.ConvertOptions(column_types=SCHEMA, include_columns=SCHEMA.names),
+                ))
+    if not tables:
+        return SCHEMA.empty_table()
+    table = pa.concat_tables(tables)
+    for column in ("timestamp", "close_time"):
+        values = table[column]
+        values = pc.if_else(pc.greater(values, _MICROSECONDS), pc.divide(values, 1000), values)
+        table = table.set_column(table.schema.get_field_index(column), column, values)
+    return table
+
+
+
+def convert_archives_to_parquet(symbol, interval, path="kline_data", out_file=None):
+    """
+    Convert the monthly zip archives of a symbol into one Parquet file, one row group per archive.
+
+    Archives are read one at a time in month order, so memory stays at one month of klines however
+    many months are converted. Rows are sorted by timestamp, rows whose timestamp was already written
+    are dropped. The file is written under a temporary name and renamed once complete. The bot reads
+    the klineDataset partitions filled by klineDataset.append_archives, this single file is an export
+    for tools that want a symbol's whole history in one file.
+
+    Args:
+        symbol (str): Symbol of the archives.
+        interval (str): Kline interval of the archives.
+        path (str, optional): Folder of the {SYMBOL}/{interval}/*.zip archives (default: kline_data).
+        out_file (str, optional): Parquet file to write (default: {path}/{SYMBOL}/{SYMBOL}-{interval}.parquet).
+
+    Returns:
+        int: Rows written, 0 when there is no archive.
+    """
+    zip_files = sorted(glob.glob(f"{path}/{symbol.upper()}/{interval}/*.zip"))
+    if not zip_files:
+        return 0
+    out_file = out_file or f"{path}/{symbol.upper()}/{symbol.upper()}-{interval}.parquet"
+    rows = 0
+    last_timestamp = None
+    with pq.ParquetWriter(out_file + ".tmp", SCHEMA, compression="snappy") as writer:
+        for file_name in zip_files:
+            table = read_archive(file_name).sort_by("timestamp")
+            timestamps = table["timestamp"].to_numpy()
+            keep = np.ones(len(timestamps), dtype=bool)
+            keep[1:] = timestamps[1:] != timestamps[:-1]
+            if last_timestamp is not None:
+                keep &= timestamps > last_timestamp
+            table = table.filter(pa.array(keep))
+            if len(table):
+                writer.write_table(table)
+                rows += len(table)
+                last_timestamp = table["timestamp"][-1].as_py()
+    os.replace(out_file + ".tmp", out_file)
+    return rows
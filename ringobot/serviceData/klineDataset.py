@@ -0,0 +1,226 @@
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from ringobot.serviceData.klineConverter import SCHEMA, read_archive
+
+
+# Partition directories below the symbol=... directory of a symbol
+MONTH_PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+
+
+def dataset_path(interval, path="kline_data"):
+    # Root of the dataset of one interval, laid out as symbol=.../year=.../month=.../part-0.parquet
+    return f"{path}/klines-{interval}"
+
+
+def symbol_path(symbol, interval, path="kline_data"):
+    return f"{dataset_path(interval, path)}/symbol={symbol.upper()}"
+
+
+def month_path(symbol, interval, year, month, path="kline_data"):
+    return f"{symbol_path(symbol, interval, path)}/year={year}/month={month}/part-0.parquet"
+
+
+def legacy_path(symbol, interval, path="kline_data"):
+    # Single Parquet file per symbol written before the dataset existed
+    return f"{path}/{symbol.upper()}/{symbol.upper()}-{interval}.parquet"
+
+
+def _to_ms(value):
+    # Epoch milliseconds of an int, a string or anything pd.Timestamp accepts
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return pd.Timestamp(value).value // 10 ** 6
+
+
+def _sorted_unique(table):
+    # Sort by timestamp, a timestamp seen more than once keeps its last row
+    table = table.sort_by("timestamp")
+    timestamps = table["timestamp"].to_numpy()
+    keep = np.ones(len(timestamps), dtype=bool)
+    keep[:-1] = timestamps[:-1] != timestamps[1:]
+    return table.filter(pa.array(keep))
+
+
+def append_klines(data, symbol, interval, path="kline_data"):
+    """
+    Add klines to the dataset, one file per month.
+
+    A month that already has a file is merged with the new rows, the new row wins when both have
+    the same timestamp, so appending the same data twice changes nothing. Only the months of the
+    new rows are rewritten, each under a temporary name first.
+
+    Args:
+        data (pa.Table or pd.DataFrame): Klines with the klineConverter.SCHEMA columns, times in milliseconds.
+        symbol (str): Symbol of the klines.
+        interval (str): Kline interval.
+        path (str, optional): Folder of the datasets (default: kline_data).
+
+    Returns:
+        int: Rows in the months written.
+    """
+    if isinstance(data, pd.DataFrame):
+        data = pa.Table.from_pandas(data[SCHEMA.names], preserve_index=False)
+    table = data.select(SCHEMA.names).cast(SCHEMA)
+    dates = table["timestamp"].to_numpy().astype("datetime64[ms]")
+    months = dates.astype("datetime64[M]")
+    rows = 0
+    for month in np.unique(months):
+        year_month = pd.Timestamp(month)
+        file_name = month_path(symbol, interval, year_month.year, year_month.month, path)
+        part = table.filter(pa.array(months == month))
+        if os.path.exists(file_name):
+            part = pa.concat_tables([pq.read_table(file_name, schema=SCHEMA), part])
+        part = _sorted_unique(part)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        pq.write_table(part, file_name + ".tmp", compression="snappy")
+        os.replace(file_name + ".tmp", file_name)
+        rows += len(part)
+    return rows
+
+
+def append_archives(symbol, interval, path="kline_data"):
+    """
+    Add the downloaded monthly zip archives of a symbol to the dataset.
+
+    An archive is skipped when its month was written after the archive was downloaded, so running
+    this again after a partial download only converts the new months.
+
+    Args:
+        symbol (str): Symbol of the archives.
+        interval (str): Kline interval of the archives.
+        path (str, optional): Folder of the {SYMBOL}/{interval}/*.zip archives and of the datasets (default: kline_data).
+
+    Returns:
+        int: Rows in the months written.
+    """
+    rows = 0
+    for file_name in sorted(glob.glob(f"{path}/{symbol.upper()}/{interval}/*.zip")):
+        # Archives are named {SYMBOL}-{interval}-{year}-{month}.zip
+        year, month = map(int, os.path.basename(file_name)[:-len(".zip")].split("-")[-2:])
+        target = month_path(symbol, interval, year, month, path)
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(file_name):
+            continue
+        rows += append_klines(read_archive(file_name), symbol, interval, path)
+    return rows
+
+
+def import_parquet(symbol, interval, path="kline_data", batch_size=100_000):
+    """
+    Add a {SYMBOL}-{interval}.parquet file written before the dataset existed to the dataset.
+
+    A symbol without a dataset is built in a temporary folder of its own and moved into place once
+    complete, so an interrupted import leaves no partial dataset behind and imports of the same
+    symbol running at once do not write into each other's files.
+
+    Args:
+        symbol (str): Symbol of the file.
+        interval (str): Kline interval of the file.
+        path (str, optional): Folder of the {SYMBOL}/{SYMBOL}-{interval}.parquet file and of the datasets (default: kline_data).
+        batch_size (int, optional): Rows read at a time (default: 100000).
+
+    Returns:
+        int: Rows in the months written.
+    """
+    target = symbol_path(symbol, interval, path)
+    out_path = path
+    if not os.path.exists(target):
+        os.makedirs(path, exist_ok=True)
+        out_path = tempfile.mkdtemp(prefix=f".import-{symbol.upper()}-{interval}-", dir=path)
+    try:
+        rows = 0
+        parquet_file = pq.ParquetFile(legacy_path(symbol, interval, path))
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=SCHEMA.names):
+            rows += append_klines(pa.Table.from_batches([batch]), symbol, interval, out_path)
+        if out_path != path and rows:
+            os.makedirs(dataset_path(interval, path), exist_ok=True)
+            try:
+                os.replace(symbol_path(symbol, interval, out_path), target)
+            except OSError:
+                # Another process imported the same file first, its dataset is kept
+                if not os.path.isdir(target):
+                    raise
+    finally:
+        if out_path != path:
+            shutil.rmtree(out_path, ignore_errors=True)
+    return rows
+
+
+def ensure_dataset(symbol, interval="5m", path="kline_data"):
+    # Import the legacy file of a symbol that has no dataset yet, False when there is no data at all
+    if os.path.exists(symbol_path(symbol, interval, path)):
+        return True
+    if not os.path.exists(legacy_path(symbol, interval, path)):
+        return False
+    rows = import_parquet(symbol, interval, path)
+    logging.info(f"Imported {rows} rows of {legacy_path(symbol, interval, path)} into the kline dataset")
+    return rows > 0
+
+
+def dataset_fingerprint(symbol, interval="5m", path="kline_data"):
+    # Changes whenever a month of the symbol is added or rewritten, None when the symbol has no data.
+    # Only reads, a symbol that still only has its legacy file is fingerprinted by that file.
+    files = sorted(glob.glob(f"{symbol_path(symbol, interval, path)}/*/*/*.parquet"))
+    if not files:
+        files = [file_name for file_name in [legacy_path(symbol, interval, path)] if os.path.exists(file_name)]
+    if not files:
+        return None
+    digest = hashlib.sha1()
+    for file_name in files:
+        stat = os.stat(file_name)
+        digest.update(f"{os.path.relpath(file_name, path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def read_klines(symbol, interval="5m", columns=None, start=None, end=None, path="kline_data"):
+    """
+    Klines of one symbol from the dataset.
+
+    Only the symbol's own directory is listed. Months outside [start, end) are pruned by their
+    partition directories, the timestamp bounds are pushed down to the Parquet row groups and only
+    the requested columns are read. A symbol that only has a {SYMBOL}-{interval}.parquet file from
+    before the dataset is imported into it first.
+
+    Args:
+        symbol (str): Symbol to read.
+        interval (str, optional): Kline interval (default: 5m).
+        columns (list, optional): Columns to read, every klineConverter.SCHEMA column by default.
+        start (optional): First time to include, epoch milliseconds or anything pd.Timestamp accepts.
+        end (optional): Time to stop before, same types as start.
+        path (str, optional): Folder of the datasets (default: kline_data).
+
+    Returns:
+        pd.DataFrame: Klines sorted by timestamp, times in epoch milliseconds like the archives.
+
+    Raises:
+        FileNotFoundError: If the symbol has neither a dataset nor a {SYMBOL}-{interval}.parquet file.
+    """
+    if not ensure_dataset(symbol, interval, path):
+        raise FileNotFoundError(f"No {interval} klines of {symbol.upper()} in {path}, neither "
+                                f"{symbol_path(symbol, interval, path)} nor {legacy_path(symbol, interval, path)}")
+    columns = list(columns or SCHEMA.names)
+    if "timestamp" not in columns:
+        columns = ["timestamp"] + columns
+    dataset = ds.dataset(symbol_path(symbol, interval, path), schema=SCHEMA.append(
+        pa.field("year", pa.int16())).append(pa.field("month", pa.int8())), format="parquet",
+        partitioning=MONTH_PARTITIONING)
+    year, month, timestamp = ds.field("year"), ds.field("month"), ds.field("timestamp")
+    condition = None
+    if start is not None:
+        start = pd.Timestamp(_to_ms(start), unit="ms")
+        condition = ((year > start.year) | ((year == start.year) & (month >= start.month))) & \
+                    (timestamp >= _to_ms(start))
+    if end is not None:
+        end = pd.Timestamp(_to_ms(end), unit="ms")
+        before = ((year < end.year) | ((year == end.year) & (month <= end.month))) & (timestamp < _to_ms(end))
+        condition = before if condition is None else condition & before
+    table = dataset.to_table(columns=columns, filter=condition)
+    return table.sort_by("timestamp").to_pandas()
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+
+# Base URL for Binance data API
+DATA_URL = "https://data.binance.vision"
+
+# Outcomes of download_file
+DOWNLOADED = "downloaded"
+SKIPPED = "skipped"    # Already on disk
+MISSING = "missing"    # Not published, e.g. a month before the symbol was listed
+FAILED = "failed"
+
+
+def monthly_kline_path(symbol, interval, year, month):
+    # Path of a monthly kline archive, on data.binance.vision and below the local kline_data folder
+    return f"data/spot/monthly/klines/{symbol.upper()}/{interval}/{symbol.upper()}-{interval}-{year}-{month:02}.zip"
+
+
+def months_between(start, end):
+    """
+    Every month from start to end, both included.
+
+    Args:
+        start (tuple): (year, month) of the first month.
+        end (tuple): (year, month) of the last month.
+
+    Returns:
+        list: (year, month) tuples.
+    """
+    (year, month), months = start, []
+    while (year, month) <= tuple(end):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def make_session(pool_size):
+    # One session for every worker, its connections are kept alive and reused between files
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _retry_after(response, default):
+    # Seconds to wait from a Retry-After header, given as seconds or as an HTTP date
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def _get(session, url, timeout, retries, backoff, stream=False):
+    # GET with retries on connection errors, 429 and 5xx, None when the file does not exist
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(url, timeout=timeout, stream=stream)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+            continue
+        if response.status_code == 404:
+            response.close()
+            return None
+        if response.status_code != 429 and response.status_code < 500:
+            response.raise_for_status()
+            return response
+        response.close()
+        if attempt == retries:
+            response.raise_for_status()
+        time.sleep(_retry_after(response, backoff * 2 ** attempt))
+
+
+def download_file(session, url, file_name, timeout=30, retries=3, backoff=1.0):
+    """
+    Download one archive and verify it against the .CHECKSUM file published next to it.
+
+    The archive is streamed to file_name + ".part" and only renamed to file_name once its sha256
+    matches, so a file under file_name is always complete and is skipped on the next run.
+
+    Args:
+        session (requests.Session): Session to send the requests with.
+        url (str): URL of the archive.
+        file_name (str): Local path of the archive.
+        timeout (float, optional): Seconds to wait for the server (default: 30).
+        retries (int, optional): Retries after a failed request, an interrupted download or a checksum mismatch (default: 3).
+        backoff (float, optional): Seconds before the first retry, doubled for every further one (default: 1).
+
+    Returns:
+        str: DOWNLOADED, SKIPPED or MISSING.
+    """
+    if os.path.exists(file_name):
+        return SKIPPED
+    checksum = _get(session, url + ".CHECKSUM", timeout, retries, backoff)
+    if checksum is None:
+        return MISSING
+    expected = checksum.text.split()[0].lower()
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    for attempt in range(retries + 1):
+        response = _get(session, url, timeout, retries, backoff, stream=True)
+        if response is None:
+            return MISSING
+        digest = hashlib.sha256()
+        try:
+            with response, open(file_name + ".part", "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    digest.update(chunk)
+                    f.write(chunk)
+        except requests.RequestException as e:
+            # The connection broke during the body, the download starts over
+            os.remove(file_name + ".part")
+            if attempt == retries:
+                raise
+            logging.warning(f"Download of {url} interrupted (attempt {attempt + 1}): {e}")
+            time.sleep(backoff * 2 ** attempt)
+            continue
+        if digest.hexdigest() == expected:
+            os.replace(file_name + ".part", file_name)
+            return DOWNLOADED
+        os.remove(file_name + ".part")
+        logging.warning(f"Checksum mismatch for {url} (attempt {attempt + 1})")
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+    raise IOError(f"Checksum mismatch for {url}")
+
+
+def download_klines(symbols, intervals=("5m",), start=(2019, 1), end=(2024, 12), out_dir="kline_data",
+                    base_url=DATA_URL, workers=16, timeout=30, retries=3, backoff=1.0):
+    """
+    Download the monthly kline archives of many symbols in parallel.
+
+    Archives are saved as {out_dir}/{SYMBOL}/{interval}/{SYMBOL}-{interval}-{year}-{month}.zip,
+    files already there are skipped, so an interrupted backfill resumes where it stopped.
+
+    Args:
+        symbols (list): Symbols to download.
+        intervals (list, optional): Kline intervals (default: 5m).
+        start (tuple, optional): (year, month) of the first archive (default: 2019-01).
+        end (tuple, optional): (year, month) of the last archive (default: 2024-12).
+        out_dir (str, optional): Local folder of the archives (default: kline_data).
+        base_url (str, optional): Server to download from, e.g. a local stand-in (default: DATA_URL).
+        workers (int, optional): Downloads in flight at once (default: 16).
+        timeout, retries, backoff: See download_file.
+
+    Returns:
+        tuple: ({outcome: count}, {archive path: error message}) for the files that failed.
+    """
+    jobs = [(symbol, interval, year, month) for symbol in symbols for interval in intervals
+            for year, month in months_between(start, end)]
+    counts = {DOWNLOADED: 0, SKIPPED: 0, MISSING: 0, FAILED: 0}
+    failures = {}
+    with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for symbol, interval, year, month in jobs:
+            path = monthly_kline_path(symbol, interval, year, month)
+            file_name = os.path.join(out_dir, symbol.upper(), interval, os.path.basename(path))
+            futures[executor.submit(download_file, session, f"{base_url}/{path}", file_name, timeout, retries,
+                                    backoff)] = file_name
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                counts[future.result()] += 1
+            except Exception as e:
+                counts[FAILED] += 1
+                failures[futures[future]] = str(e)
+                logging.error(f"Failed to download {futures[future]}: {e}")
+    return counts, failures
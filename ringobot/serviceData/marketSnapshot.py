@@ -0,0 +1,91 @@
+import threading
+import time
+from ringobot.config import PRICE_CACHE_TTL
+from ringobot.serviceData.binance import BinanceAPI
+from ringobot.serviceData.marketStream import market_data
+
+
+class MarketSnapshot:
+    """
+    Prices and balances for one scheduler tick. All prices come from one bulk ticker call and all
+    balances from one account call, both made on first use. Prices are kept for the whole tick,
+    balances are fetched again on the next read after an order fills.
+
+    Args:
+        api (BinanceAPI, optional): Client used for fetching.
+    """
+
+    def __init__(self, api=None):
+        self.api = api or BinanceAPI()
+        self.prices = None
+        self.balances = None
+        self.calls = 0
+
+    def price(self, symbol):
+        if self.prices is None:
+            self.prices = self.api.get_all_prices()
+            self.calls += 1
+        return self.prices[symbol]
+
+    def balance(self, asset):
+        if self.balances is None:
+            self.balances = self.api.get_account_balance()
+            self.calls += 1
+        return self.balances.get(asset, 0.0)
+
+    def order_filled(self):
+        # Balances have moved, read them again next time
+        self.balances = None
+
+    def invalidate(self):
+        self.prices = None
+        self.balances = None
+
+
+class PriceCache:
+    """
+    All symbol prices from one bulk ticker call, shared by every caller for ttl seconds.
+
+    Args:
+        api (BinanceAPI, optional): Client used for fetching.
+        ttl (float, optional): Seconds a fetched set of prices stays valid.
+    """
+
+    def __init__(self, api=None, ttl=PRICE_CACHE_TTL):
+        self.api = api or BinanceAPI()
+        self.ttl = ttl
+        self.prices = {}
+        self.loaded_at = 0
+        self._lock = threading.Lock()
+
+    def get_prices(self):
+        with self._lock:
+            if time.time() - self.loaded_at > self.ttl:
+                self.prices = self.api.get_all_prices()
+                self.loaded_at = time.time()
+            return self.prices
+
+
+price_cache = PriceCache()
+
+
+def resolve_prices(symbols):
+    # Streamed prices where available, the rest from the shared price cache with at most one call
+    prices = {symbol: market_data.get_price(symbol) for symbol in symbols}
+    if any(price is None for price in prices.values()):
+        cached = price_cache.get_prices()
+        prices = {symbol: price if price is not None else cached[symbol] for symbol, price in prices.items()}
+    return prices
+
+
+class LazyPrices:
+    # Resolves the prices of a group of symbols together, the first time any of them is read
+    def __init__(self, symbols):
+        self.symbols = set(symbols)
+        self.prices = None
+
+    def get(self, symbol):
+        if self.prices is None or symbol not in self.prices:
+            self.symbols.add(symbol)
+            self.prices = resolve_prices(self.symbols)
+        return self.prices[symbol]
@@ -0,0 +1,393 @@
+import abc
+import json
+import logging
+import socket
+import socketserver
+import threading
+import time
+import numpy as np
+from ringobot.config import ringobot_api_key, ringobot_secret_key
+from ringobot.serviceData.binance import BinanceAPI
+from ringobot.serviceData.klineCache import KlineRingBuffer, INTERVAL_MS, MAX_KLINES_PER_REQUEST, decode_klines, to_dataframe, required_candles
+
+
+class StreamTransport(abc.ABC):
+    """
+    Delivers combined-stream messages ({"stream": ..., "data": ...}) to on_message.
+    A transport reports a lost connection by sending {"e": "error"}.
+    """
+
+    @abc.abstractmethod
+    def start(self, streams, on_message):
+        # Connect and subscribe to streams, messages are delivered on a background thread
+        pass
+
+    @abc.abstractmethod
+    def stop(self):
+        pass
+
+
+class BinanceStreamTransport(StreamTransport):
+    # Binance combined streams through python-binance's ThreadedWebsocketManager
+
+    def __init__(self, api_key=ringobot_api_key, api_secret=ringobot_secret_key):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.manager = None
+
+    def start(self, streams, on_message):
+        from binance import ThreadedWebsocketManager
+        self.manager = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret)
+        self.manager.start()
+        self.manager.start_multiplex_socket(callback=on_message, streams=streams)
+
+    def stop(self):
+        if self.manager is not None:
+            self.manager.stop()
+            self.manager = None
+
+
+class LocalStreamTransport(StreamTransport):
+    """
+    Reads newline-delimited JSON messages from a TCP server such as FakeStreamServer.
+
+    Args:
+        host (str): Server host.
+        port (int): Server port.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.thread = None
+
+    def start(self, streams, on_message):
+        self.sock = socket.create_connection((self.host, self.port))
+        self.sock.sendall((json.dumps({"subscribe": streams}) + "\n").encode())
+        self.thread = threading.Thread(target=self._read, args=(self.sock, on_message), daemon=True)
+        self.thread.start()
+
+    def _read(self, sock, on_message):
+        try:
+            with sock.makefile("r") as lines:
+                for line in lines:
+                    on_message(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        if sock is self.sock:
+            on_message({"e": "error", "m": "connection closed"})
+
+    def stop(self):
+        sock, self.sock = self.sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+class FakeStreamServer:
+    """
+    Local stand-in for the Binance combined stream endpoint. Every published message is sent
+    to all connected clients as one JSON line.
+
+    Args:
+        host (str, optional): Interface to bind (default: 127.0.0.1).
+        port (int, optional): Port to bind, 0 picks a free one (default: 0).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        clients = self.clients = []
+        lock = self.lock = threading.Lock()
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.rfile.readline()  # subscription request
+                with lock:
+                    clients.append(self)
+                # Keep the connection open until the client or the server closes it
+                while self.rfile.readline():
+                    pass
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def wait_for_clients(self, n=1, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if len(self.clients) >= n:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def publish(self, message):
+        line = (json.dumps(message) + "\n").encode()
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    client.wfile.write(line)
+                    client.wfile.flush()
+                except OSError:
+                    self.clients.remove(client)
+
+    def disconnect_all(self):
+        # Simulates a dropped connection
+        with self.lock:
+            for client in self.clients:
+                try:
+                    client.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.clients.clear()
+
+    def stop(self):
+        self.disconnect_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MarketDataService:
+    """
+    Keeps closed and in-progress candles and the last price of every symbol in memory from
+    kline and miniTicker streams. Gaps after a reconnect are backfilled over REST, klines streamed
+    while a backfill runs are held back and applied after it. A closed candle that does not follow
+    on from the cached ones triggers another backfill.
+
+    Args:
+        transport (StreamTransport, optional): Message source (default: BinanceStreamTransport).
+        api (BinanceAPI, optional): REST client for backfills.
+        lookback (dict, optional): Candles to backfill per interval.
+        stale_after (float, optional): Seconds without any message before reconnecting (default: 60).
+    """
+
+    def __init__(self, transport=None, api=None, lookback=None, stale_after=60):
+        self.transport = transport
+        self.api = api
+        self.lookback = lookback or {"1h": required_candles(), "1m": 5}
+        self.stale_after = stale_after
+        self.symbols = []
+        self.closed = {}  # (symbol, interval) -> KlineRingBuffer
+        self.open = {}  # (symbol, interval) -> (open_time, close, volume)
+        self.prices = {}  # symbol -> (price, received at)
+        self.running = False
+        self.last_message = 0
+        self.reconnects = 0
+        self._lock = threading.Lock()
+        self._reconnect_lock = threading.Lock()
+        self._watchdog = None
+        self._pending = None  # (symbol, kline) messages held back while connecting, None when live
+        self.listeners = []
+
+    def add_listener(self, callback):
+        # callback(symbol, price, event_time) runs on the stream thread for every price update
+        self.listeners.append(callback)
+
+    def _notify(self, symbol, price, event_time):
+        for callback in self.listeners:
+            try:
+                callback(symbol, price, event_time)
+            except Exception as e:
+                logging.error(f"{symbol} price listener failed")
+                logging.error(e)
+
+    def streams(self):
+        streams = []
+        for symbol in self.symbols:
+            streams.append(f"{symbol.lower()}@miniTicker")
+            streams.extend(f"{symbol.lower()}@kline_{interval}" for interval in self.lookback)
+        return streams
+
+    def start(self, symbols):
+        self.transport = self.transport or BinanceStreamTransport()
+        self.api = self.api or BinanceAPI()
+        self.symbols = list(symbols)
+        self.running = True
+        self.last_message = time.time()
+        self._connect()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.transport is not None:
+            self.transport.stop()
+
+    def is_live(self):
+        # Running and a message arrived within stale_after
+        return self.running and time.time() - self.last_message <= self.stale_after
+
+    def _watch(self):
+        while self.running:
+            time.sleep(1)
+            if self.running and time.time() - self.last_message > self.stale_after:
+                logging.warning("Market data stream is stale, reconnecting")
+                self.reconnect()
+
+    def reconnect(self):
+        if not self._reconnect_lock.acquire(blocking=False):
+            return
+        try:
+            self.transport.stop()
+            self.last_message = time.time()
+            self._connect()
+            self.reconnects += 1
+        except Exception as e:
+            logging.error("Market data reconnect failed")
+            logging.error(e)
+        finally:
+            self._reconnect_lock.release()
+
+    def _connect(self):
+        # The stream starts before the backfill so no candle closes unseen in between, its klines
+        # are applied once the backfilled candles are in place
+        with self._lock:
+            self._pending = []
+        try:
+            self.transport.start(self.streams(), self.handle_message)
+            self.backfill()
+        finally:
+            self._replay()
+
+    def _replay(self):
+        while True:
+            with self._lock:
+                pending = self._pending
+                # Live again once nothing is left, in the same step so no message slips in between
+                self._pending = [] if pending else None
+            if not pending:
+                return
+            for symbol, kline in pending:
+                self._on_kline(symbol, kline)
+
+    def backfill(self):
+        # Fetch every candle missed since the last closed one (or the whole lookback on first start)
+        for symbol in self.symbols:
+            for interval, lookback in self.lookback.items():
+                try:
+                    self._backfill(symbol, interval, lookback)
+                except Exception as e:
+                    logging.error(f"{symbol} {interval} backfill failed")
+                    logging.error(e)
+
+    def _backfill(self, symbol, interval, lookback):
+        key = (symbol, interval)
+        with self._lock:
+            buffer = self.closed.get(key)
+            last_open = buffer.last_open_time() if buffer is not None else None
+        if last_open is not None:
+            # Only the candles missed since the cached ones plus the in-progress one, a short gap costs
+            # the lowest request weight instead of a full 1000 candle request
+            missed = (int(time.time() * 1000) - last_open) // INTERVAL_MS[interval] + 2
+            klines = self.api.get_latest_kline_data(symbol, interval, limit=min(missed, MAX_KLINES_PER_REQUEST),
+                                                    start_time=last_open + INTERVAL_MS[interval])
+            if self._store(key, lookback, klines):
+                return
+            # The exchange has no candle right after the cached ones, start over with the whole lookback
+        klines = self.api.get_latest_kline_data(symbol, interval, limit=lookback + 1)
+        self._store(key, lookback, klines, reset=True)
+
+    def _store(self, key, lookback, klines, reset=False):
+        # Add REST klines to the buffer of key, False when they would leave a gap after the cached ones
+        open_time, close_time, close, volume = decode_klines(klines)
+        is_closed = close_time < int(time.time() * 1000)
+        with self._lock:
+            buffer = self.closed.get(key)
+            if reset or buffer is None:
+                buffer = self.closed[key] = KlineRingBuffer(max(lookback, 1000), INTERVAL_MS[key[1]])
+            if not buffer.extend(open_time[is_closed], close_time[is_closed], close[is_closed], volume[is_closed]):
+                return False
+            if not is_closed.all():
+                self.open[key] = (int(open_time[-1]), float(close[-1]), float(volume[-1]))
+        return True
+
+    def handle_message(self, message):
+        self.last_message = time.time()
+        data = message.get("data", message)
+        event = data.get("e")
+        if event == "error":
+            if self.running:
+                threading.Thread(target=self.reconnect, daemon=True).start()
+        elif event == "kline":
+            with self._lock:
+                held = self._pending is not None
+                if held:
+                    self._pending.append((data["s"], data["k"]))
+            if not held:
+                self._on_kline(data["s"], data["k"])
+            self._notify(data["s"], float(data["k"]["c"]), data.get("E", self.last_message * 1000) / 1000)
+        elif event == "24hrMiniTicker":
+            with self._lock:
+                self.prices[data["s"]] = (float(data["c"]), self.last_message)
+            self._notify(data["s"], float(data["c"]), data.get("E", self.last_message * 1000) / 1000)
+
+    def _on_kline(self, symbol, kline):
+        interval = kline["i"]
+        key = (symbol, interval)
+        open_time, close, volume = int(kline["t"]), float(kline["c"]), float(kline["v"])
+        with self._lock:
+            self.prices[symbol] = (close, self.last_message)
+            buffer = self.closed.get(key)
+            last_open = buffer.last_open_time() if buffer is not None else None
+            # Klines held back during a backfill can be older than the backfilled candles
+            if last_open is not None and (open_time < last_open or (open_time == last_open and not kline["x"])):
+                return
+            if not kline["x"]:
+                self.open[key] = (open_time, close, volume)
+                return
+            if buffer is None:
+                buffer = self.closed[key] = KlineRingBuffer(max(self.lookback.get(interval, 0), 1000), INTERVAL_MS[interval])
+            stored = buffer.extend(np.array([open_time]), np.array([int(kline["T"])]), np.array([close]), np.array([volume]))
+            if stored and self.open.get(key, (open_time,))[0] <= open_time:
+                self.open.pop(key, None)
+        if not stored:
+            # A closed candle was missed, the backfill fetches it and this one, on this thread so
+            # later klines wait for it
+            logging.warning(f"{symbol} {interval} candle gap before {open_time}, backfilling")
+            try:
+                self._backfill(symbol, interval, self.lookback.get(interval, 0))
+            except Exception as e:
+                logging.error(f"{symbol} {interval} backfill failed")
+                logging.error(e)
+
+    def get_price(self, symbol, max_age=10):
+        # Latest streamed price, None when not streaming or older than max_age seconds
+        with self._lock:
+            price = self.prices.get(symbol)
+        if not self.running or price is None or time.time() - price[1] > max_age:
+            return None
+        return price[0]
+
+    def get_symbol_data(self, symbol, interval, limit):
+        # Same frame as simulation.get_symbol_data: limit - 1 closed candles plus the one in progress, None if not covered
+        with self._lock:
+            buffer = self.closed.get((symbol, interval))
+            if not self.running or buffer is None or len(buffer) < max(limit - 1, 1):
+                return None
+            open_time, _, close, volume = buffer.tail(max(limit - 1, 1))
+            current = self.open.get((symbol, interval))
+            price = self.prices.get(symbol)
+        next_open = int(open_time[-1]) + INTERVAL_MS[interval]
+        if int(time.time() * 1000) >= next_open + INTERVAL_MS[interval]:
+            # Closed candles are missing up to now
+            return None
+        if current is None or current[0] != next_open:
+            # No update of the new candle yet, it starts at the last price with no volume
+            current = (next_open, price[0] if price is not None else float(close[-1]), 0.0)
+        n_closed = limit - 1
+        open_time = np.append(open_time[len(open_time) - n_closed:], current[0])
+        close = np.append(close[len(close) - n_closed:], current[1])
+        volume = np.append(volume[len(volume) - n_closed:], current[2])
+        return to_dataframe(open_time, close, volume)
+
+
+market_data = MarketDataService()
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from catboost import CatBoostClassifier
+
+
+CATBOOST_MODEL_PATH = "ringobot/serviceData/train/models/catboost_classifier.cbm"
+SCALER_PATH = "ringobot/serviceData/train/models/scaler.pkl"
+
+
+def _file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _current_rss():
+    # Resident set size of this process in bytes, None where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_catboost(path):
+    return CatBoostClassifier().load_model(path)
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class Artifact:
+    """
+    A model or scaler loaded from disk together with what it cost to load.
+
+    Args:
+        path (str): Path of the artifact file.
+        obj: The deserialized object.
+        mtime (float): Modification time of the file when it was loaded.
+        sha256 (str): Content hash of the file when it was loaded.
+        load_seconds (float): Wall time spent deserializing the file.
+        file_bytes (int): Size of the file on disk.
+        memory_bytes (int): Growth of the process RSS while loading, None if unknown.
+    """
+    __slots__ = ("path", "obj", "mtime", "sha256", "load_seconds", "file_bytes", "memory_bytes", "loaded_at")
+
+    def __init__(self, path, obj, mtime, sha256, load_seconds, file_bytes, memory_bytes):
+        self.path = path
+        self.obj = obj
+        self.mtime = mtime
+        self.sha256 = sha256
+        self.load_seconds = load_seconds
+        self.file_bytes = file_bytes
+        self.memory_bytes = memory_bytes
+        self.loaded_at = time.time()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "sha256": self.sha256,
+            "load_seconds": round(self.load_seconds, 4),
+            "file_bytes": self.file_bytes,
+            "memory_bytes": self.memory_bytes,
+            "loaded_at": int(self.loaded_at),
+        }
+
+
+class Predictor:
+    """
+    Immutable pairing of a trained model and the scaler it was trained with.
+    A new Predictor is built whenever either artifact changes on disk, so callers
+    holding a reference keep a consistent model/scaler pair.
+    """
+    __slots__ = ("model", "scaler", "version")
+
+    def __init__(self, model, scaler, version):
+        object.__setattr__(self, "model", model)
+        object.__setattr__(self, "scaler", scaler)
+        object.__setattr__(self, "version", version)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Predictor is immutable")
+
+    def predict(self, windows):
+        # Flatten the windows
+        time_steps, n_features = windows.shape[1], windows.shape[2]
+        windows = windows.reshape(-1, time_steps * n_features)
+        # Standardize the data
+        windows = self.scaler.transform(windows)
+        return self.model.predict(windows)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of model artifacts. Each file is deserialized once and reloaded
+    only when its mtime changes and its content hash differs from the loaded copy.
+    """
+
+    def __init__(self):
+        self._artifacts = {}
+        self._predictors = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path, loader):
+        mtime = os.path.getmtime(path)
+        sha256 = _file_hash(path)
+        rss_before = _current_rss()
+        start = time.perf_counter()
+        obj = loader(path)
+        load_seconds = time.perf_counter() - start
+        rss_after = _current_rss()
+        memory_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        logging.info(f"Loaded {path} in {load_seconds * 1000:.1f} ms")
+        return Artifact(path, obj, mtime, sha256, load_seconds, os.path.getsize(path), memory_bytes)
+
+    def get_artifact(self, path, loader):
+        with self._lock:
+            artifact = self._artifacts.get(path)
+            if artifact is None:
+                artifact = self._load(path, loader)
+            elif os.path.getmtime(path) != artifact.mtime:
+                if _file_hash(path) != artifact.sha256:
+                    logging.info(f"{path} changed on disk, reloading")
+                    artifact = self._load(path, loader)
+                else:
+                    artifact.mtime = os.path.getmtime(path)
+            self._artifacts[path] = artifact
+            return artifact
+
+    def get(self, path, loader):
+        return self.get_artifact(path, loader).obj
+
+    def get_predictor(self, model_path=CATBOOST_MODEL_PATH, scaler_path=SCALER_PATH, model_loader=load_catboost):
+        model = self.get_artifact(model_path, model_loader)
+        scaler = self.get_artifact(scaler_path, load_pickle)
+        version = (model.sha256, scaler.sha256)
+        key = (model_path, scaler_path)
+        with self._lock:
+            predictor = self._predictors.get(key)
+            if predictor is None or predictor.version != version:
+                predictor = Predictor(model.obj, scaler.obj, version)
+                self._predictors[key] = predictor
+            return predictor
+
+    def stats(self):
+        with self._lock:
+            return [artifact.stats() for artifact in self._artifacts.values()]
+
+
+registry = ModelRegistry()
@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ringobot.config import ringobot_api_key, ringobot_secret_key
+from ringobot.serviceData.binance import BinanceAPI
+
+
+BUY = "BUY"
+SELL = "SELL"
+
+
+class Order:
+    # A market order to place, price is the pre-trade quote used when no fill is reported (dry run)
+    def __init__(self, symbol, side, quantity, price, context=None):
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.price = price
+        self.context = context  # Caller data, e.g. the session being sold
+
+
+class Fill:
+    # Outcome of an order: what was actually executed, or the error that stopped it
+    def __init__(self, order, order_id=None, status=None, executed_qty=0.0, avg_price=None, seconds=None, error=None):
+        self.order = order
+        self.order_id = order_id
+        self.status = status
+        self.executed_qty = executed_qty
+        self.avg_price = avg_price
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def filled(self):
+        # Partially executed orders count, the executed part has to be recorded, check status == "FILLED"
+        # before treating the whole quantity as executed
+        return self.error is None and self.executed_qty > 0
+
+
+def fill_from_report(report):
+    # Executed quantity and average price from an order response, get_order result or executionReport
+    if "e" in report:  # executionReport field names
+        executed_qty, quote_qty, status = float(report["z"]), float(report["Z"]), report["X"]
+    else:
+        executed_qty, quote_qty, status = float(report.get("executedQty", 0)), float(report.get("cummulativeQuoteQty", 0)), report.get("status")
+    avg_price = quote_qty / executed_qty if executed_qty > 0 else None
+    return status, executed_qty, avg_price
+
+
+class UserStreamFills:
+    """
+    Tracks order fills from the user data stream (executionReport events) so the executor does
+    not have to poll get_order. Until started, every wait() returns None and the executor polls.
+
+    Reports nobody waits for, e.g. of market orders the REST response already returned filled,
+    are dropped after max_age seconds.
+
+    Args:
+        max_age (float, optional): Seconds a report is kept for a wait() that has not started yet (default: 300).
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self.reports = {}  # order id -> (arrival time, executionReport)
+        self.events = {}
+        self.running = False
+        self.manager = None
+        self._lock = threading.Lock()
+
+    def start(self, api_key=ringobot_api_key, api_secret=ringobot_secret_key):
+        from binance import ThreadedWebsocketManager
+        self.manager = ThreadedWebsocketManager(api_key=api_key, api_secret=api_secret)
+        self.manager.start()
+        self.manager.start_user_socket(callback=self.handle_message)
+        self.running = True
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.manager is not None:
+            self.manager.stop()
+            self.manager = None
+
+    def handle_message(self, message):
+        if message.get("e") != "executionReport" or message.get("X") not in ("FILLED", "CANCELED", "REJECTED", "EXPIRED"):
+            return
+        now = time.monotonic()
+        with self._lock:
+            # A report can arrive before its wait() starts, so it is kept for a while even without a waiter
+            for order_id in [order_id for order_id, (arrived, _) in self.reports.items() if now - arrived > self.max_age]:
+                del self.reports[order_id]
+            self.reports[message["i"]] = (now, message)
+            event = self.events.get(message["i"])
+        if event is not None:
+            event.set()
+
+    def wait(self, order_id, timeout):
+        if not self.running:
+            return None
+        with self._lock:
+            if order_id in self.reports:
+                return self.reports.pop(order_id)[1]
+            event = self.events.setdefault(order_id, threading.Event())
+        event.wait(timeout)
+        with self._lock:
+            self.events.pop(order_id, None)
+            _, report = self.reports.pop(order_id, (None, None))
+            return report
+
+
+user_stream_fills = UserStreamFills()
+
+
+class OrderExecutor:
+    """
+    Places independent market orders concurrently and waits for their fills. Fills come from the
+    order response when the exchange returns it filled, otherwise from the user data stream, with
+    get_order polling as a fallback.
+
+    Args:
+        api (BinanceAPI, optional): Client used for placing and polling orders.
+        fills (UserStreamFills, optional): User data stream tracker.
+        max_workers (int, optional): Orders in flight at once (default: 8).
+        fill_timeout (float, optional): Seconds to wait for a fill (default: 60).
+    """
+
+    def __init__(self, api=None, fills=user_stream_fills, max_workers=8, fill_timeout=60):
+        self.api = api or BinanceAPI()
+        self.fills = fills
+        self.max_workers = max_workers
+        self.fill_timeout = fill_timeout
+
+    def _place(self, order):
+        if order.side == BUY:
+            return self.api.place_market_buy_order(order.symbol, quantity=order.quantity)
+        return self.api.place_market_sell_order(order.symbol, quantity=order.quantity)
+
+    def _wait_for_fill(self, order, order_id, deadline):
+        # The user stream usually reports the fill first, it is waited for in short slices with a
+        # get_order poll after each, so a report the stream never delivers costs one slice, not fill_timeout
+        delay = 0.2
+        while True:
+            streaming = self.fills is not None and self.fills.running
+            report = self.fills.wait(order_id, delay) if streaming else None
+            if report is not None:
+                return report
+            report = self.api.get_order(order.symbol, order_id)
+            status, _, _ = fill_from_report(report)
+            if status in ("FILLED", "CANCELED", "REJECTED", "EXPIRED") or time.time() > deadline:
+                return report
+            if not streaming:
+                time.sleep(delay)
+            delay = min(delay * 2, 1)
+
+    def _execute(self, order):
+        start = time.perf_counter()
+        try:
+            response = self._place(order)
+            order_id = response.get("orderId")
+            if order_id is None:
+                # Dry run, nothing was sent to the exchange
+                return Fill(order, response.get("order_id"), "FILLED", order.quantity, order.price, time.perf_counter() - start)
+            status, executed_qty, avg_price = fill_from_report(response)
+            if status != "FILLED":
+                report = self._wait_for_fill(order, order_id, time.time() + self.fill_timeout)
+                status, executed_qty, avg_price = fill_from_report(report)
+            return Fill(order, order_id, status, executed_qty, avg_price, time.perf_counter() - start)
+        except Exception as e:
+            return Fill(order, seconds=time.perf_counter() - start, error=e)
+
+    def execute(self, orders):
+        """
+        Place the orders concurrently and wait for every fill.
+
+        Args:
+            orders (list): Order objects.
+
+        Returns:
+            tuple: Fills in the order of orders, and a batch report with the time from submission
+                   until the last order completed.
+        """
+        if not orders:
+            return [], {"orders": 0, "filled": 0, "failed": 0, "seconds": 0.0}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(orders))) as executor:
+            fills = list(executor.map(self._execute, orders))
+        report = {
+            "orders": len(orders),
+            "filled": sum(fill.filled for fill in fills),
+            "failed": sum(not fill.filled for fill in fills),
+            "seconds": time.perf_counter() - start,
+        }
+        logging.info(f"Order batch: {report['filled']}/{report['orders']} filled in {report['seconds'] * 1000:.0f} ms")
+        return fills, report
@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+# Request priorities, lower goes first
+ORDER = 0
+ACCOUNT = 1
+MARKET_DATA = 2
+
+
+def kline_weight(limit):
+    # Request weight of GET /api/v3/klines depends on the number of candles asked for
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit < 1000:
+        return 5
+    return 10
+
+
+# Weight and priority of every client method the bot calls, keyed by python-binance method name
+ENDPOINTS = {
+    "order_market_buy": (1, ORDER),
+    "order_market_sell": (1, ORDER),
+    "get_order": (4, ORDER),
+    "get_account": (20, ACCOUNT),
+    "get_klines": (kline_weight, MARKET_DATA),
+    "get_symbol_ticker": (2, MARKET_DATA),
+    "get_all_tickers": (4, MARKET_DATA),
+    "get_exchange_info": (20, MARKET_DATA),
+}
+
+
+def endpoint_weight(method, params):
+    # Weight and priority of a client call, unknown methods count as one market data request
+    weight, priority = ENDPOINTS.get(method, (1, MARKET_DATA))
+    if callable(weight):
+        weight = weight(params.get("limit", 500))
+    return weight, priority
+
+
+def _header(headers, name):
+    # requests and aiohttp headers are case-insensitive, plain dicts are not
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    return int(value) if value is not None else None
+
+
+class RequestWeightLimiter:
+    """
+    Thread-safe sliding-window budget of request weight per interval, corrected by the usage
+    Binance reports in the X-MBX-USED-WEIGHT-1M and X-MBX-ORDER-COUNT-* response headers.
+
+    Callers are admitted by priority: while a higher priority request waits no lower priority
+    request is let through, and each priority may only fill its share of the budget (headroom),
+    so market data backs off before the budget is spent and orders always find room. A 429 or
+    418 response pauses everything for its Retry-After.
+
+    Args:
+        max_weight (int): Weight allowed within one interval.
+        interval (float, optional): Length of the window in seconds (default: 60).
+        max_orders (int, optional): Orders allowed within order_interval, None for no limit.
+        order_interval (float, optional): Length of the order count window in seconds (default: 10).
+        headroom (dict, optional): Fraction of max_weight each priority may use.
+    """
+
+    def __init__(self, max_weight, interval=60, max_orders=None, order_interval=10, headroom=None):
+        self.max_weight = max_weight
+        self.interval = interval
+        self.max_orders = max_orders
+        self.order_interval = order_interval
+        self.headroom = headroom or {ORDER: 1.0, ACCOUNT: 0.9, MARKET_DATA: 0.8}
+        self._spent = deque()  # (timestamp, weight)
+        self._used = 0
+        self._orders = deque()  # timestamps of orders placed
+        self._waiting = {priority: 0 for priority in self.headroom}
+        self._server_used = (None, 0)  # (wall clock minute, weight reported by Binance)
+        self._server_orders = {}  # header name -> count
+        self._blocked_until = 0
+        self.bans = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._spent and now - self._spent[0][0] >= self.interval:
+            _, weight = self._spent.popleft()
+            self._used -= weight
+        while self._orders and now - self._orders[0] >= self.order_interval:
+            self._orders.popleft()
+
+    def _server_weight(self):
+        # Binance counts weight per calendar minute, an older report no longer applies
+        minute, used = self._server_used
+        return used if minute == int(time.time() // 60) else 0
+
+    def used_weight(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return max(self._used, self._server_weight())
+
+    def try_acquire(self, weight=1, priority=MARKET_DATA, orders=0):
+        # Record the request if it may go now, returns 0 then or else the seconds to wait before trying again
+        # A request heavier than its priority's share could never be admitted, it counts as the whole share
+        weight = min(weight, self.max_weight * self.headroom.get(priority, 1.0))
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if any(self._waiting.get(higher) for higher in range(priority)):
+                return 0.05
+            self._expire(now)
+            waits = []
+            used = max(self._used, self._server_weight())
+            if used + weight > self.max_weight * self.headroom.get(priority, 1.0):
+                waits.append(self.interval - (now - self._spent[0][0]) if self._spent else 60 - time.time() % 60)
+            if orders and self.max_orders is not None and len(self._orders) + orders > self.max_orders:
+                waits.append(self.order_interval - (now - self._orders[0]))
+            if waits:
+                return max(min(waits), 0.05)
+            self._spent.append((now, weight))
+            self._used += weight
+            self._orders.extend([now] * orders)
+            return 0
+
+    def acquire(self, weight=1, priority=MARKET_DATA, orders=0):
+        # Block until the request may go, then record it
+        self._wait(priority, 1)
+        try:
+            while True:
+                wait = self.try_acquire(weight, priority, orders)
+                if not wait:
+                    return
+                time.sleep(wait)
+        finally:
+            self._wait(priority, -1)
+
+    async def acquire_async(self, weight=1, priority=MARKET_DATA, orders=0):
+        # acquire() for coroutines, sleeps without blocking the event loop
+        self._wait(priority, 1)
+        try:
+            while True:
+                wait = self.try_acquire(weight, priority, orders)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            self._wait(priority, -1)
+
+    def _wait(self, priority, delta):
+        with self._lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + delta
+
+    def record_response(self, response):
+        """
+        Update the usage from a requests or aiohttp response and back off on 429/418.
+
+        Args:
+            response: Response of the last call, e.g. client.response or BinanceAPIException.response.
+        """
+        if response is None:
+            return
+        headers = response.headers
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+        used = _header(headers, "X-MBX-USED-WEIGHT-1M")
+        with self._lock:
+            if used is not None:
+                minute = int(time.time() // 60)
+                if self._server_used[0] != minute or used > self._server_used[1]:
+                    self._server_used = (minute, used)
+            for name in ("X-MBX-ORDER-COUNT-10S", "X-MBX-ORDER-COUNT-1D"):
+                count = _header(headers, name)
+                if count is not None:
+                    self._server_orders[name] = count
+            if status in (418, 429):
+                # 429 warns, 418 is the IP ban itself, both say how long to stay away
+                retry_after = _header(headers, "Retry-After") or 60
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                self.bans += 1
+
+    def metrics(self):
+        # Current usage for monitoring
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            server_used = self._server_weight()
+            return {
+                "used_weight": self._used,
+                "server_used_weight": server_used,
+                "max_weight": self.max_weight,
+                "utilization": max(self._used, server_used) / self.max_weight,
+                "orders_in_window": len(self._orders),
+                "server_order_count_10s": self._server_orders.get("X-MBX-ORDER-COUNT-10S"),
+                "server_order_count_1d": self._server_orders.get("X-MBX-ORDER-COUNT-1D"),
+                "waiting": dict(self._waiting),
+                "blocked_for": max(self._blocked_until - now, 0),
+                "rate_limit_responses": self.bans,
+            }
@@ -1,5 +1,11 @@
 from ringobot.serviceData.binance import BinanceAPI
-from ringobot.serviceData.simulation import get_symbol_data, create_signals, predict_signals
+from ringobot.serviceData.simulation import get_symbol_data, get_symbols_data, create_signals, predict_signals
+from ringobot.serviceData.klineCache import kline_cache, required_candles
+from ringobot.serviceData.marketStream import market_data
+from ringobot.serviceData.marketSnapshot import MarketSnapshot
+from ringobot.serviceData.stopLossMonitor import SAFETY
+from ringobot.serviceData.orderExecutor import OrderExecutor, Order, BUY, SELL
+from ringobot.db.utils import session_scope
 from ringobot.serviceData.bulkDataImport import symbols
 import time
 from ringobot.db.session import Session
@@ -8,9 +14,24 @@ from ringobot.db.tables import Coins, Transactions
 from ringobot.tools import calculate_max_qty, calculate_max_sell_qty
 from ringobot.toChat import send_slack_message, to_slack
 import logging
+import numpy as np
 
 # Initialize Binance API
 binanceApi = BinanceAPI()
+order_executor = OrderExecutor(binanceApi)
+
+
+def get_price(symbol, snapshot=None):
+    # Streamed price when the market data service runs, the tick's snapshot or a REST ticker otherwise
+    price = market_data.get_price(symbol)
+    if price is not None:
+        return price
+    return snapshot.price(symbol) if snapshot is not None else binanceApi.get_symbol_ticker(symbol)
+
+
+def get_recent_candles(symbol, interval, limit):
+    df = market_data.get_symbol_data(symbol, interval, limit)
+    return df if df is not None else kline_cache.get_symbol_data(symbol, interval, limit)
 
 
 def make_buy_sell_decision(symbol, interval='1h'):
@@ -23,14 +44,39 @@ def make_buy_sell_decision(symbol, interval='1h'):
     return probs
 
 
-def detect_buy_sell_signal():
+def make_batch_buy_sell_decisions(symbols, interval='1h'):
+    # Gather the latest window of every symbol and predict them with a single model call
+    latest_windows = []
+    batch_symbols = []
+    frames = get_symbols_data(symbols, interval, limit=required_candles())
+    for symbol, df in frames.items():
+        try:
+            windows, _ = create_signals(df, live=True)
+        except Exception as e:
+            logging.error(f"{symbol} feature window failed")
+            logging.error(e)
+            continue
+        if len(windows) == 0:
+            continue
+        latest_windows.append(windows[-1])
+        batch_symbols.append(symbol)
+    if not latest_windows:
+        return {}
+    probs = predict_signals(np.stack(latest_windows))
+    return {symbol: int(np.ravel(prob)[0]) for symbol, prob in zip(batch_symbols, probs)}
+
+
+def detect_buy_sell_signal(batched=True):
     buys = []
     sells = []
-    for symbol in symbols:
-        probs = make_buy_sell_decision(symbol)
-        if probs[-1] == 1:
+    if batched:
+        decisions = make_batch_buy_sell_decisions(symbols)
+    else:
+        decisions = {symbol: make_buy_sell_decision(symbol)[-1] for symbol in symbols}
+    for symbol, decision in decisions.items():
+        if decision == 1:
             buys.append(symbol)
-        elif probs[-1] == -1:
+        elif decision == -1:
             sells.append(symbol)
     return buys, sells
 
@@ -43,20 +89,83 @@ def update_transaction(db_session, session, price):
     db_session.commit()
 
 
-def safety_sell(db_session, active_sessions, config):
+def split_transaction(db_session, session, price, sold_qty):
+    # Record the sold part of a partially filled sell as a completed transaction, the rest stays open
+    transaction = db_session.query(Transactions).filter(Transactions.id == session.id).first()
+    remaining = transaction.quantity - sold_qty
+    db_session.add(Transactions(coin_id=transaction.coin_id, buy_price=transaction.buy_price, quantity=sold_qty,
+                                buy_timestamp=transaction.buy_timestamp, sell_price=price,
+                                sell_timestamp=int(time.time()), status=0))
+    transaction.quantity = remaining
+    db_session.commit()
+    return remaining
+
+
+def record_sell(db_session, fill, reason):
+    # Close the session of a sell order with the executed price, a partial fill only closes the sold part
+    session = fill.order.context
+    symbol = session.name
+    if not fill.filled:
+        logging.error(f"{symbol} {reason} sell order failed")
+        logging.error(fill.error or fill.status)
+        return
+    if fill.status == "FILLED" or fill.executed_qty >= session.quantity:
+        update_transaction(db_session, session, fill.avg_price)
+        logging.info(f"{reason.capitalize()} sell order filled for {symbol} at price {fill.avg_price} in {fill.seconds * 1000:.0f} ms")
+        return
+    remaining = split_transaction(db_session, session, fill.avg_price, fill.executed_qty)
+    logging.error(f"{symbol} {reason} sell order {fill.status}: sold {fill.executed_qty} at {fill.avg_price}, "
+                  f"{remaining} left in the open session")
+
+
+def sell_session(db_session, session, quantity, price, snapshot, reason):
+    # Sell one session through the executor, price is only the pre-trade quote
+    fills, _ = order_executor.execute([Order(session.name, SELL, quantity, price, context=session)])
+    snapshot.order_filled()
+    record_sell(db_session, fills[0], reason)
+
+
+def safety_sell_session(db_session, session, price, snapshot):
+    # Stop-loss sell of one session
+    sell_session(db_session, session, session.quantity, price, snapshot, "safety")
+
+
+def expire_sell_session(db_session, session, price, snapshot):
+    # Sell the whole asset balance of a session that exceeded hold_time
+    symbol = session.name
+    asset_balance = snapshot.balance(symbol.replace("USDT", ""))  # Get the asset balance
+    step_size = binanceApi.get_symbol_stepSize(symbol)  # Cached LOT_SIZE step, no network call
+    quantity = calculate_max_sell_qty(asset_balance, step_size)
+    sell_session(db_session, session, quantity, price, snapshot, "expire")
+
+
+def monitor_sell(session_id, reason, price=None):
+    # Sell path for the stop-loss monitor, runs as soon as a rule fires
+    with session_scope() as db_session:
+        sessions = Session.get_session_by_id(db_session, session_id)
+        if not sessions or sessions[0].status != 1:
+            return
+        session = sessions[0]
+        snapshot = MarketSnapshot(binanceApi)
+        price = price if price is not None else get_price(session.name, snapshot)
+        if reason == SAFETY:
+            safety_sell_session(db_session, session, price, snapshot)
+        else:
+            expire_sell_session(db_session, session, price, snapshot)
+
+
+def safety_sell(db_session, active_sessions, config, snapshot=None):
     if not active_sessions:
         return
+    snapshot = snapshot or MarketSnapshot(binanceApi)
     tolerance = config.tolerance
     for session in active_sessions:
         symbol = session.name
         try:
-            price = binanceApi.get_symbol_ticker(symbol)
-            quantity = session.quantity
-            df = get_symbol_data(symbol, '1m', limit=5)
+            price = get_price(symbol, snapshot)
+            df = get_recent_candles(symbol, '1m', limit=5)
             if df['close'].mean() < session.buy_price * (1 - tolerance):
-                    order = binanceApi.place_market_sell_order(symbol, quantity=quantity)
-                    logging.info(f"Safety sell order placed for {symbol} at price {price}")
-                    update_transaction(db_session, session, price)
+                safety_sell_session(db_session, session, price, snapshot)
             else:
                 pass
         except Exception as e:
@@ -64,22 +173,17 @@ def safety_sell(db_session, active_sessions, config):
             logging.error(e)
 
 
-def expire_sell(db_session, active_sessions, config):
+def expire_sell(db_session, active_sessions, config, snapshot=None):
     if not active_sessions:
         return
+    snapshot = snapshot or MarketSnapshot(binanceApi)
     timeout = config.hold_time
     for session in active_sessions:
         symbol = session.name
         try:
             if int(time.time()) - session.buy_timestamp > timeout:
-                price = binanceApi.get_symbol_ticker(symbol)
-                #quantity = session.quantity
-                asset_balance = binanceApi.get_account_balance()[symbol.replace("USDT", "")]  # Get the asset balance
-                min_quantity = binanceApi.get_symbol_minQty(symbol)  # Get the minimum quantity for the symbol
-                quantity = calculate_max_sell_qty(asset_balance, min_quantity)
-                order = binanceApi.place_market_sell_order(symbol, quantity=quantity)
-                logging.info(f"Expire sell order placed for {symbol} at price {price}")
-                update_transaction(db_session, session, price)
+                price = get_price(symbol, snapshot)
+                expire_sell_session(db_session, session, price, snapshot)
             else:
                 pass
         except Exception as e:
@@ -95,9 +199,10 @@ def insert_transaction(db_session, symbol, price, quantity):
     db_session.commit()
 
 
-def buy_crypto(buys, config, db_session):
+def buy_crypto(buys, config, db_session, snapshot=None):
     if not buys:
         return
+    snapshot = snapshot or MarketSnapshot(binanceApi)
     allow_buy = config.allow_buy
     max_trade = config.max_trade
     budget = config.budget  # Budget per trade
@@ -110,54 +215,62 @@ def buy_crypto(buys, config, db_session):
     buys = [symbol for symbol in buys if symbol not in owned_symbols]  # Remove already owned symbols
     allowed_trade_count = max_trade - len(owned_symbols) # Calculate the number of trades allowed
     buys = buys[:allowed_trade_count]  # Limit the number of trades to max_trade
-    cash = binanceApi.get_account_balance()['USDT']
+    cash = snapshot.balance('USDT')
     if cash < budget:
         return
+    orders = []
     for symbol in buys:
         if symbol not in owned_symbols:
-            price = binanceApi.get_symbol_ticker(symbol)
-            min_quantity = binanceApi.get_symbol_minQty(symbol)
-            quantity = calculate_max_qty(price, budget, min_quantity)
-            try:
-                order = binanceApi.place_market_buy_order(symbol, quantity=quantity)
-                insert_transaction(db_session, symbol, price, quantity)
-                logging.info(f"Buy order placed for {symbol} at price {price}")
-            except Exception as e:
-                logging.error(f"{symbol} buy order failed")
-                logging.error(e)
+            price = get_price(symbol, snapshot)
+            step_size = binanceApi.get_symbol_stepSize(symbol)
+            quantity = calculate_max_qty(price, budget, step_size)
+            orders.append(Order(symbol, BUY, quantity, price))
         else:
             pass
+    # Orders go out concurrently, the transactions record what was actually executed
+    fills, _ = order_executor.execute(orders)
+    if orders:
+        snapshot.order_filled()
+    for fill in fills:
+        symbol = fill.order.symbol
+        if fill.filled:
+            insert_transaction(db_session, symbol, fill.avg_price, fill.executed_qty)
+            logging.info(f"Buy order filled for {symbol} at price {fill.avg_price} in {fill.seconds * 1000:.0f} ms")
+        else:
+            logging.error(f"{symbol} buy order failed")
+            logging.error(fill.error or fill.status)
 
 
-def sell_crypto(sells, config, db_session):
+def sell_crypto(sells, config, db_session, snapshot=None):
     if not sells:
         return
+    snapshot = snapshot or MarketSnapshot(binanceApi)
     allow_sell = config.allow_sell
     if not allow_sell:
         return
     active_sessions = Session.get_active_sessions(db_session)
+    orders = []
     for session in active_sessions:
         if session.name in sells:
             symbol = session.name
-            price = binanceApi.get_symbol_ticker(symbol)
+            price = get_price(symbol, snapshot)
             quantity = session.quantity
-
-            try:
-                order = binanceApi.place_market_sell_order(symbol, quantity=quantity)
-                update_transaction(db_session, session, price)
-                logging.info(f"Sell order placed for {symbol} at price {price}")
-            except Exception as e:
-                logging.error(f"{symbol} sell order failed")
-                logging.error(e)
+            orders.append(Order(symbol, SELL, quantity, price, context=session))
         else:
             pass
+    fills, _ = order_executor.execute(orders)
+    if orders:
+        snapshot.order_filled()
+    for fill in fills:
+        record_sell(db_session, fill, "signal")
 
 
 def trade(db_session):
     buys, sells = detect_buy_sell_signal()
     config = Configurations.get_config(db_session)
-    sell_crypto(sells, config, db_session)
-    buy_crypto(buys, config, db_session)
+    snapshot = MarketSnapshot(binanceApi)
+    sell_crypto(sells, config, db_session, snapshot)
+    buy_crypto(buys, config, db_session, snapshot)
 
 
 
@@ -0,0 +1,182 @@
+import time
+import numpy as np
+import pandas as pd
+from ringobot.serviceData.featureEngineering import FEATURE_COLUMNS
+from ringobot.serviceData.calculateBuySellSignals import *
+
+
+# Rules of calculateBuySellSignals by the suffix of the columns they add
+RULES = {
+    "macd": calculate_macd_buy_sell_signals,
+    "rsi": calculate_rsi_buy_sell_signals,
+    "bollinger": calculate_bollinger_band_buy_sell_signals,
+    "rolling": calculate_rolling_mean_std_buy_sell_signals,
+    "vwma": calculate_vwma_buy_sell_signals,
+}
+
+
+def load_hourly(symbols, path="kline_data"):
+    # Hourly features written by bulkDataImport.import_coin_data
+    return {symbol: pd.read_parquet(f"{path}/{symbol}/{symbol}-1h.parquet", columns=FEATURE_COLUMNS).sort_index()
+            for symbol in symbols}
+
+
+def rule_signals(df, rules, combine="any"):
+    """
+    Buy and sell signals of one or more rules.
+
+    Args:
+        df (pd.DataFrame): Hourly candles with the feature columns, left unchanged.
+        rules (str, callable or list): Names in RULES or calculateBuySellSignals-style functions that add
+            buy_signal_* and sell_signal_* columns.
+        combine (str, optional): "any" signals when one rule does, "all" when every rule does (default: any).
+
+    Returns:
+        tuple: Boolean numpy arrays of buy and sell signals.
+    """
+    rules = [rules] if isinstance(rules, str) or callable(rules) else rules
+    data = df.copy()
+    columns = set(data.columns)
+    for rule in rules:
+        data = (RULES[rule] if isinstance(rule, str) else rule)(data)
+    added = [column for column in data.columns if column not in columns]
+    buy = data[[column for column in added if column.startswith("buy_signal")]].fillna(False).to_numpy(dtype=bool)
+    sell = data[[column for column in added if column.startswith("sell_signal")]].fillna(False).to_numpy(dtype=bool)
+    reduce = np.all if combine == "all" else np.any
+    return reduce(buy, axis=1), reduce(sell, axis=1)
+
+
+def pair_trades(buy, sell):
+    """
+    Long-only entry/exit pairs: enter on a buy while flat, exit on the next sell. A bar with both
+    a buy and a sell signal is ignored.
+
+    Args:
+        buy (np.ndarray): Boolean buy signal per bar.
+        sell (np.ndarray): Boolean sell signal per bar.
+
+    Returns:
+        tuple: Entry indexes, exit indexes (the last bar for a position still held) and the boolean
+               position after every bar.
+    """
+    event = np.where(buy & ~sell, 1, np.where(sell & ~buy, -1, 0))
+    # Carry the last event forward, holding means the last event was a buy
+    last = np.where(event != 0, np.arange(len(event)), -1)
+    np.maximum.accumulate(last, out=last)
+    position = (last >= 0) & (event[np.maximum(last, 0)] == 1)
+    change = np.diff(position.astype(np.int8), prepend=0, append=0)
+    entries = np.flatnonzero(change[:-1] == 1)
+    exits = np.minimum(np.flatnonzero(change[1:] == -1) + 1, len(position) - 1)
+    return entries, exits, position
+
+
+def backtest_rule(df, rules, combine="any", fee=0.0, symbol=None):
+    """
+    Trades and cumulative P&L of a signal rule on one symbol, every trade invests the whole balance.
+
+    Args:
+        df (pd.DataFrame): Hourly candles with the feature columns.
+        rules (str, callable or list): See rule_signals.
+        combine (str, optional): See rule_signals.
+        fee (float, optional): Fee fraction charged on entry and on exit (default: 0).
+        symbol (str, optional): Label of the trades.
+
+    Returns:
+        dict: trades (DataFrame with entry/exit time and price, return and cumulative P&L),
+              equity (Series, growth of 1 marked to market every bar) and summary (dict).
+    """
+    buy, sell = rule_signals(df, rules, combine)
+    entries, exits, position = pair_trades(buy, sell)
+    close = df["close"].to_numpy(dtype=np.float64)
+    # A position held on the last bar is marked to its close without the exit fee
+    is_open = np.zeros(len(entries), dtype=bool)
+    if len(position) and position[-1]:
+        is_open[-1] = True
+    entry_price, exit_price = close[entries], close[exits]
+    returns = exit_price / entry_price * (1 - fee) * np.where(is_open, 1, 1 - fee) - 1
+    trades = pd.DataFrame({
+        "symbol": symbol,
+        "entry_time": df.index[entries],
+        "exit_time": df.index[exits],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "return": returns,
+        "cumulative_pnl": np.cumprod(1 + returns) - 1,
+        "open": is_open,
+    })
+    # Bar returns while in a position, fees applied on the entry and exit bars
+    bar_return = np.zeros(len(close))
+    bar_return[1:] = np.where(position[:-1], close[1:] / close[:-1] - 1, 0)
+    growth = 1 + bar_return
+    growth[entries] *= 1 - fee
+    growth[exits[~is_open]] *= 1 - fee
+    equity = pd.Series(np.cumprod(growth), index=df.index, name="equity")
+    drawdown = equity / equity.cummax() - 1
+    summary = {
+        "symbol": symbol,
+        "trades": int(len(trades)),
+        "win_rate": float((returns[~is_open] > 0).mean()) if (~is_open).any() else 0.0,
+        "mean_trade_return": float(returns[~is_open].mean()) if (~is_open).any() else 0.0,
+        "total_return": float(equity.iloc[-1] - 1) if len(equity) else 0.0,
+        "max_drawdown": float(drawdown.min()) if len(drawdown) else 0.0,
+        "exposure": float(position.mean()) if len(position) else 0.0,
+    }
+    return {"trades": trades, "equity": equity, "summary": summary}
+
+
+def backtest_rule_batch(frames, rules, combine="any", fee=0.0):
+    """
+    backtest_rule over many symbols.
+
+    Args:
+        frames (dict): Symbol -> hourly candles with the feature columns, e.g. from load_hourly.
+        rules, combine, fee: See backtest_rule.
+
+    Returns:
+        dict: trades of all symbols (DataFrame) and one summary row per symbol (DataFrame).
+    """
+    results = [backtest_rule(df, rules, combine, fee, symbol) for symbol, df in frames.items()]
+    trades = pd.concat([result["trades"] for result in results], ignore_index=True) if results else pd.DataFrame()
+    summary = pd.DataFrame([result["summary"] for result in results]).set_index("symbol") if results else pd.DataFrame()
+    return {"trades": trades, "summary": summary}
+
+
+def compare_rules(frames, variants, fee=0.0):
+    """
+    Universe-wide comparison of rule variants.
+
+    Args:
+        frames (dict): Symbol -> hourly candles with the feature columns.
+        variants (dict): Variant name -> rules, or (rules, combine).
+        fee (float, optional): Fee fraction per entry and exit (default: 0).
+
+    Returns:
+        pd.DataFrame: One row per variant with trade count, win rate, mean trade return, median
+                      symbol return, share of profitable symbols and seconds taken.
+    """
+    rows = []
+    for name, variant in variants.items():
+        rules, combine = variant if isinstance(variant, tuple) else (variant, "any")
+        started = time.perf_counter()
+        result = backtest_rule_batch(frames, rules, combine, fee)
+        trades, summary = result["trades"], result["summary"]
+        closed = trades[~trades["open"]] if len(trades) else trades
+        rows.append({
+            "variant": name,
+            "trades": int(len(trades)),
+            "win_rate": float((closed["return"] > 0).mean()) if len(closed) else 0.0,
+            "mean_trade_return": float(closed["return"].mean()) if len(closed) else 0.0,
+            "median_symbol_return": float(summary["total_return"].median()) if len(summary) else 0.0,
+            "profitable_symbols": float((summary["total_return"] > 0).mean()) if len(summary) else 0.0,
+            "seconds": time.perf_counter() - started,
+        })
+    return pd.DataFrame(rows).set_index("variant")
+
+
+if __name__ == "__main__":
+    from ringobot.serviceData.bulkDataImport import symbols
+    frames = load_hourly(symbols)
+    variants = {name: name for name in RULES}
+    variants["macd+rsi all"] = (["macd", "rsi"], "all")
+    variants["all rules any"] = (list(RULES), "any")
+    print(compare_rules(frames, variants, fee=0.001).to_string())
@@ -1,11 +1,13 @@
 from ringobot.serviceData.featureEngineering import *
-from ringobot.serviceData.train.preprocess import sliding_window, label_data
+from ringobot.serviceData.train.preprocess import sliding_window, compute_labels
 from ringobot.serviceData.binance import BinanceAPI
+from ringobot.serviceData.klineCache import kline_cache, decode_klines, to_dataframe
+from ringobot.serviceData.marketStream import market_data
 import pandas as pd
+import logging
 import matplotlib.pyplot as plt
 from ringobot.serviceData.bulkDataImport import symbols
-from catboost import CatBoostClassifier
-import pickle
+from ringobot.serviceData.modelRegistry import registry
 pd.set_option('display.max_columns', None)
 
 # Initialize Binance API
@@ -15,46 +17,59 @@ binanceApi = BinanceAPI()
 """balances = binanceApi.get_account_balance()
 print("Account Balance:", balances)"""
 
+def klines_to_dataframe(klines):
+    # Parse only close and volume straight into float arrays
+    open_time, _, close, volume = decode_klines(klines)
+    return to_dataframe(open_time, close, volume)
+
+
 # Get last N hours of data for a symbol from Binance
 def get_symbol_data(symbol, interval, limit=240):
-
     # Get historical kline data from Binance
     klines = binanceApi.get_latest_kline_data(symbol=symbol, interval=interval, limit=limit)
-    # Create a DataFrame from the klines
-    df = pd.DataFrame(klines, columns=["timestamp", "open", "high", "low", "close", "volume", "close_time", "quote_asset_volume", "number_of_trades", "taker_buy_base_asset_volume", "taker_buy_quote_asset_volume", "ignore"])
-    # Convert the timestamp to a datetime object
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    # Set the timestamp as the index
-    df = df.set_index('timestamp')
-    # Convert the columns to numeric
-    df = df.apply(pd.to_numeric)
-    df = df[["close", "volume"]]
-    return df
-
-
-def create_signals(df):
-    df = calculate_bollinger_bands(df)
-    df = calculate_macd(df)
-    df = calculate_rsi(df)
-    df = calculate_rolling_mean_std(df)
-    df = calculate_vwma(df)
-    df, labels = label_data(df)
-    windows = sliding_window(df, window_size=24)
+    return klines_to_dataframe(klines)
+
+
+# Get last N hours of data for many symbols concurrently, served from the kline cache
+def get_symbols_data(symbols, interval, limit=240):
+    # Symbols covered by the market data stream need no network call
+    streamed = {symbol: market_data.get_symbol_data(symbol, interval, limit) for symbol in symbols}
+    missing = [symbol for symbol, df in streamed.items() if df is None]
+    frames, errors = kline_cache.get_symbols_data(missing, interval, limit)
+    frames = {symbol: streamed[symbol] if streamed[symbol] is not None else frames[symbol] for symbol in symbols if symbol in frames or streamed[symbol] is not None}
+    for symbol, error in errors.items():
+        logging.error(f"{symbol} kline fetch failed")
+        logging.error(error)
+    return frames
+
+
+def create_signals(df, window_size=24, live=False):
+    """
+    Build the model input windows for a symbol.
+
+    Args:
+        df (pd.DataFrame): Candles with close and volume columns, the features come from compute_features.
+        window_size (int, optional): Number of candles in each window (default: 24).
+        live (bool, optional): Only build the latest window for trading decisions (default: False).
+            Labeling is skipped and labels is None.
+
+    Returns:
+        tuple: Windows of shape (n_windows, window_size, n_features) and the labels.
+    """
+    features = compute_features(df['close'].values, df['volume'].values)
+    if live:
+        # Same window the full mode predicts last, as one contiguous (1, window_size, n_features) array
+        windows = sliding_window(features, window_size=window_size, rows=[-1])
+        return windows, None
+    labels, _ = compute_labels(df['close'].values)
+    windows = sliding_window(features, window_size=window_size)
     return windows, labels
 
 
 def predict_signals(windows):
-    # Load the trained model
-    catboostModel = CatBoostClassifier().load_model("ringobot/serviceData/train/models/catboost_classifier.cbm")
-    # Flatten the windows
-    time_steps, n_features = windows.shape[1], windows.shape[2]
-    windows = windows.reshape(-1, time_steps * n_features)
-    # Standardize the data
-    scaler = pickle.load(open("ringobot/serviceData/train/models/scaler.pkl", "rb"))
-    windows = scaler.transform(windows)
-    # Load the trained model
-    catboost_predictions = catboostModel.predict(windows)
-    return catboost_predictions
+    # The registry loads the model and scaler once per process and reloads them when the files change
+    predictor = registry.get_predictor()
+    return predictor.predict(windows)
 
 
 if __name__ == "__main__":
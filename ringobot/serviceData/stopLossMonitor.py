@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+SAFETY = "safety"
+EXPIRE = "expire"
+
+
+class PositionMonitor:
+    """
+    Evaluates the stop-loss (tolerance) and expiry (hold_time) rules of every open position on each
+    price update instead of every 5 minutes. Like safety_sell, the stop-loss compares the mean of the
+    last `minutes` one-minute closes (the current minute included) against the buy price. A symbol's
+    stop-loss is only evaluated once all `minutes` closes are known, new symbols start from history
+    when it is given.
+
+    Args:
+        on_trigger (callable): on_trigger(session_id, symbol, reason, price) performs the sell.
+        tolerance (float): Stop-loss fraction below the buy price.
+        hold_time (int): Seconds a position may be held.
+        minutes (int, optional): One-minute closes averaged for the stop-loss (default: 5).
+        executor (Executor, optional): Runs on_trigger off the price feed thread, None runs it inline.
+        history (callable, optional): history(symbol, minutes) returns recent one-minute candles with a
+            close column, the current minute last, e.g. MarketDataService.get_symbol_data with "1m".
+    """
+
+    def __init__(self, on_trigger, tolerance, hold_time, minutes=5, executor=None, history=None):
+        self.on_trigger = on_trigger
+        self.tolerance = tolerance
+        self.hold_time = hold_time
+        self.minutes = minutes
+        self.executor = executor
+        self.history = history
+        self._lock = threading.Lock()
+        # Positions, one entry per open session
+        self.session_ids = np.zeros(0, dtype=np.int64)
+        self.position_symbol = np.zeros(0, dtype=np.int64)
+        self.buy_price = np.zeros(0)
+        self.buy_timestamp = np.zeros(0)
+        self.active = np.zeros(0, dtype=bool)
+        self.pending = set()  # Sessions whose sell is running, kept inactive across sync()
+        self.symbols = []
+        # Rolling one-minute closes per symbol, newest in the last column
+        self.symbol_index = {}
+        self.minute_close = np.full((0, minutes), np.nan)
+        self.current_minute = np.zeros(0, dtype=np.int64)
+        self.filled = np.zeros(0, dtype=np.int64)  # Minutes of minute_close known per symbol
+
+    def _symbol(self, symbol):
+        index = self.symbol_index.get(symbol)
+        if index is None:
+            index = self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self.minute_close = np.vstack([self.minute_close, np.full((1, self.minutes), np.nan)])
+            self.current_minute = np.append(self.current_minute, -1)
+            self.filled = np.append(self.filled, 0)
+            if self.history is not None:
+                self._seed(index, symbol)
+        return index
+
+    def _seed(self, index, symbol):
+        try:
+            df = self.history(symbol, self.minutes)
+        except Exception as e:
+            logging.error(f"{symbol} one-minute history failed")
+            logging.error(e)
+            return
+        if df is None or len(df) == 0:
+            return
+        closes = df["close"].to_numpy()[-self.minutes:]
+        self.minute_close[index, -len(closes):] = closes
+        self.current_minute[index] = df.index[-1].value // (60 * 10 ** 9)
+        self.filled[index] = len(closes)
+
+    def update_config(self, config):
+        with self._lock:
+            self.tolerance = config.tolerance
+            self.hold_time = config.hold_time
+
+    def sync(self, sessions):
+        # Replace the tracked positions with the given active sessions
+        with self._lock:
+            self.session_ids = np.array([session.id for session in sessions], dtype=np.int64)
+            self.position_symbol = np.array([self._symbol(session.name) for session in sessions], dtype=np.int64)
+            self.buy_price = np.array([session.buy_price for session in sessions], dtype=np.float64)
+            self.buy_timestamp = np.array([session.buy_timestamp for session in sessions], dtype=np.float64)
+            self.active = np.array([session.id not in self.pending for session in sessions], dtype=bool)
+
+    def on_price(self, symbol, price, event_time=None):
+        """
+        Feed one price update and fire the rules it triggers.
+
+        Args:
+            symbol (str): Symbol of the update.
+            price (float): Last price.
+            event_time (float, optional): Exchange time of the update in seconds, now if omitted.
+
+        Returns:
+            list: (session_id, symbol, reason, price) of every position triggered.
+        """
+        now = time.time() if event_time is None else event_time
+        with self._lock:
+            index = self._symbol(symbol)
+            minute = int(now // 60)
+            last = self.current_minute[index]
+            # A tick older than the newest known minute arrived out of order, it only counts for expiry
+            late = last >= 0 and minute < last
+            if not late and minute != last:
+                shift = min(minute - last, self.minutes) if last >= 0 else self.minutes
+                # Minutes without any update repeat the last known close, like an unchanged candle
+                previous = self.minute_close[index, -1]
+                self.minute_close[index] = np.roll(self.minute_close[index], -shift)
+                self.minute_close[index, -shift:-1] = previous
+                self.current_minute[index] = minute
+                self.filled[index] = min(self.filled[index] + shift, self.minutes) if last >= 0 else 1
+            if not late:
+                self.minute_close[index, -1] = price
+            # A single tick is not a `minutes` mean, the stop-loss waits until every minute is known
+            ready = not late and self.filled[index] >= self.minutes
+            rolling_mean = np.mean(self.minute_close[index]) if ready else np.nan
+
+            # Vectorized checks over every open position, stop-losses only for the updated symbol
+            stop = self.active & (self.position_symbol == index) & ready & (rolling_mean < self.buy_price * (1 - self.tolerance))
+            expire = self.active & (now - self.buy_timestamp > self.hold_time)
+            fired = np.flatnonzero(stop | expire)
+            self.active[fired] = False
+            self.pending.update(int(self.session_ids[i]) for i in fired)
+            triggers = [(int(self.session_ids[i]), self.symbols[self.position_symbol[i]], SAFETY if stop[i] else EXPIRE,
+                         price if self.position_symbol[i] == index else None) for i in fired]
+
+        for trigger in triggers:
+            if self.executor is not None:
+                self.executor.submit(self._fire, *trigger)
+            else:
+                self._fire(*trigger)
+        return triggers
+
+    def _fire(self, session_id, symbol, reason, price):
+        try:
+            self.on_trigger(session_id, symbol, reason, price)
+        except Exception as e:
+            logging.error(f"{symbol} {reason} sell failed")
+            logging.error(e)
+        finally:
+            with self._lock:
+                self.pending.discard(session_id)
+
+
+def start_monitor(market_data, sell_session, config, sessions):
+    """
+    Attach a PositionMonitor to a running MarketDataService.
+
+    Args:
+        market_data (MarketDataService): Live price feed.
+        sell_session (callable): sell_session(session_id, reason, price) runs the existing sell path,
+            price is None for expiries detected on another symbol's update.
+        config (Configurations): Current tolerance and hold_time.
+        sessions (list): Active sessions to watch.
+
+    Returns:
+        PositionMonitor: The monitor, keep it in sync with sync() after trades.
+    """
+    monitor = PositionMonitor(lambda session_id, symbol, reason, price: sell_session(session_id, reason, price),
+                              config.tolerance, config.hold_time, executor=ThreadPoolExecutor(max_workers=4),
+                              history=lambda symbol, minutes: market_data.get_symbol_data(symbol, "1m", minutes))
+    monitor.sync(sessions)
+    market_data.add_listener(monitor.on_price)
+    return monitor
+
+
+def replay(events, positions, tolerance, hold_time, minutes=5, poll_interval=300):
+    """
+    Replay recorded price updates through a PositionMonitor to measure reaction latency offline.
+
+    Args:
+        events (iterable): (event_time, symbol, price) tuples in time order, times in seconds.
+        positions (list): (session_id, symbol, buy_price, buy_timestamp) of the open positions.
+        tolerance (float): Stop-loss fraction below the buy price.
+        hold_time (int): Seconds a position may be held.
+        minutes (int, optional): One-minute closes averaged for the stop-loss (default: 5).
+        poll_interval (int, optional): Period of the polling job the monitor replaces (default: 300).
+
+    Returns:
+        dict: Per trigger the processing latency (wall time from receiving the update to calling the
+              sell path) and the market-time lead over the next polling run, plus summary statistics.
+    """
+    fired = []
+    received = {"count": 0}
+
+    def on_trigger(session_id, symbol, reason, price):
+        fired.append((session_id, symbol, reason, time.perf_counter() - received["at"], received["event_time"]))
+
+    class Position:
+        def __init__(self, session_id, symbol, buy_price, buy_timestamp):
+            self.id, self.name, self.buy_price, self.buy_timestamp = session_id, symbol, buy_price, buy_timestamp
+
+    monitor = PositionMonitor(on_trigger, tolerance, hold_time, minutes=minutes)
+    monitor.sync([Position(*position) for position in positions])
+    for event_time, symbol, price in events:
+        received["at"] = time.perf_counter()
+        received["event_time"] = event_time
+        received["count"] += 1
+        monitor.on_price(symbol, price, event_time)
+
+    triggers = []
+    for session_id, symbol, reason, latency, event_time in fired:
+        next_poll = (event_time // poll_interval + 1) * poll_interval
+        triggers.append({"session_id": session_id, "symbol": symbol, "reason": reason, "event_time": event_time,
+                         "processing_latency": latency, "lead_over_polling": next_poll - event_time})
+    latencies = np.array([trigger["processing_latency"] for trigger in triggers])
+    return {
+        "triggers": triggers,
+        "events": received["count"],
+        "p50_latency": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p99_latency": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        "mean_lead_over_polling": float(np.mean([t["lead_over_polling"] for t in triggers])) if triggers else None,
+    }
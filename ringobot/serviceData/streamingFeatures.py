@@ -0,0 +1,210 @@
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+from ringobot.serviceData.featureEngineering import *
+
+
+def _div(a, b):
+    # Division with pandas semantics for zero and NaN denominators
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.float64(a) / np.float64(b))
+
+
+class StreamingEMA:
+    """
+    Exponential moving average equal to pd.Series.ewm(adjust=True, min_periods=...).mean().
+
+    Args:
+        alpha (float): Smoothing factor, 2 / (span + 1) for a span.
+        min_periods (int): Observations needed before a value is returned.
+    """
+
+    def __init__(self, alpha, min_periods):
+        self.decay = 1 - alpha
+        self.min_periods = min_periods
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.count = 0
+
+    def update(self, x):
+        if math.isnan(x):
+            # Leading NaNs are skipped like pandas does
+            if self.count:
+                self.numerator *= self.decay
+                self.denominator *= self.decay
+            return self.value
+        self.numerator = x + self.decay * self.numerator
+        self.denominator = 1 + self.decay * self.denominator
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        return self.numerator / self.denominator if self.count >= self.min_periods else math.nan
+
+
+class RollingWindow:
+    """
+    Rolling sum, mean and sample standard deviation over the last window values, NaN while the
+    window is not full or holds a NaN, like pandas rolling(window). A window of one repeated value
+    has exactly that mean and a zero deviation, as in pandas, instead of the rounding error of the sums.
+    The sums are rebuilt from the window every window updates to stop rounding drift.
+
+    Args:
+        window (int): Number of values in the window.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.nans = 0
+        self.repeats = 0  # Newest values equal to the last one
+        self.updates = 0
+
+    def update(self, x):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.sum -= old
+                self.sum_sq -= old * old
+        self.repeats = self.repeats + 1 if self.values and self.values[-1] == x else 1
+        self.values.append(x)
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.sum += x
+            self.sum_sq += x * x
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self.sum = math.fsum(v for v in self.values if not math.isnan(v))
+            self.sum_sq = math.fsum(v * v for v in self.values if not math.isnan(v))
+
+    @property
+    def full(self):
+        return len(self.values) == self.window and not self.nans
+
+    @property
+    def constant(self):
+        return self.repeats >= self.window
+
+    @property
+    def mean(self):
+        if self.full and self.constant:
+            return self.values[-1]
+        return self.sum / self.window if self.full else math.nan
+
+    @property
+    def std(self):
+        if not self.full:
+            return math.nan
+        if self.constant:
+            return 0.0
+        mean = self.sum / self.window
+        variance = (self.sum_sq - self.window * mean * mean) / (self.window - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def total(self):
+        if self.full and self.constant:
+            return self.values[-1] * self.window
+        return self.sum if self.full else math.nan
+
+
+class IndicatorState:
+    """
+    Incremental state of every model feature for one symbol. update() costs O(1) per closed candle
+    and returns the same values as the batch functions in featureEngineering.
+    """
+
+    def __init__(self, slow=26, fast=12, smooth=9, rsi_period=14, bollinger_window=20, bollinger_std=2,
+                 rolling_windows=(12, 36, 96), vwma_windows=(4, 24, 96)):
+        self.ema_fast = StreamingEMA(2 / (fast + 1), fast)
+        self.ema_slow = StreamingEMA(2 / (slow + 1), slow)
+        self.macd_signal = StreamingEMA(2 / (smooth + 1), smooth)
+        self.avg_gain = StreamingEMA(1 / rsi_period, rsi_period)
+        self.avg_loss = StreamingEMA(1 / rsi_period, rsi_period)
+        self.bollinger = RollingWindow(bollinger_window)
+        self.bollinger_std = bollinger_std
+        self.rolling = [RollingWindow(window) for window in rolling_windows]
+        self.vwma_price_volume = [RollingWindow(window) for window in vwma_windows]
+        self.vwma_volume = [RollingWindow(window) for window in vwma_windows]
+        self.prev_close = None
+
+    def update(self, close, volume):
+        close = float(close)
+        volume = float(volume)
+
+        self.bollinger.update(close)
+        moving_average = self.bollinger.mean
+        upper = moving_average + self.bollinger_std * self.bollinger.std
+        lower = moving_average - self.bollinger_std * self.bollinger.std
+
+        macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+        macd_signal = self.macd_signal.update(macd)
+
+        rsi = math.nan
+        # calculate_rsi drops NaN deltas before averaging, they leave the averages untouched
+        if self.prev_close is not None and not math.isnan(close - self.prev_close):
+            delta = close - self.prev_close
+            avg_gain = self.avg_gain.update(max(delta, 0.0))
+            avg_loss = self.avg_loss.update(abs(min(delta, 0.0)))
+            if avg_loss != 0:
+                rsi = 100 - _div(100, 1 + avg_gain / avg_loss)
+        self.prev_close = close
+
+        row = [close, volume, upper, lower, _div(upper - lower, moving_average) * 100,
+               _div(close - lower, upper - lower), macd, macd_signal, macd - macd_signal, rsi]
+        for rolling in self.rolling:
+            rolling.update(close)
+            row.append(rolling.mean)
+            row.append(rolling.std)
+        for price_volume, volume_sum in zip(self.vwma_price_volume, self.vwma_volume):
+            price_volume.update(close * volume)
+            volume_sum.update(volume)
+            row.append(_div(price_volume.total, volume_sum.total))
+        return np.array(row)
+
+
+def batch_features(df):
+    # Reference values from the pandas implementation, in FEATURE_COLUMNS order
+    df = df[["close", "volume"]].copy()
+    df = calculate_bollinger_bands(df)
+    df = calculate_macd(df)
+    df = calculate_rsi(df)
+    df = calculate_rolling_mean_std(df)
+    df = calculate_vwma(df)
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def check_parity(df, rtol=1e-6, atol=1e-8):
+    """
+    Compare the streaming engine to the batch featureEngineering functions.
+
+    Args:
+        df (pd.DataFrame): Candles with close and volume columns.
+        rtol (float, optional): Relative tolerance (default: 1e-6).
+        atol (float, optional): Absolute tolerance (default: 1e-8).
+
+    Returns:
+        dict: Largest absolute difference per feature column.
+
+    Raises:
+        AssertionError: If any feature differs beyond the tolerance or NaN positions differ.
+    """
+    expected = batch_features(df)
+    state = IndicatorState()
+    actual = np.array([state.update(close, volume) for close, volume in zip(df["close"], df["volume"])])
+    # Both sides treat a zero denominator the same way, compare infinities as NaN
+    expected[~np.isfinite(expected)] = np.nan
+    actual[~np.isfinite(actual)] = np.nan
+    diffs = {}
+    for i, column in enumerate(FEATURE_COLUMNS):
+        np.testing.assert_allclose(actual[:, i], expected[:, i], rtol=rtol, atol=atol, equal_nan=True, err_msg=column)
+        diff = np.abs(actual[:, i] - expected[:, i])
+        diffs[column] = float(np.nanmax(diff)) if np.isfinite(diff).any() else 0.0
+    return diffs
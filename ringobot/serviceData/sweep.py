@@ -0,0 +1,175 @@
+import glob
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from ringobot.db.configurations import Configurations
+from ringobot.serviceData.backtest import MarketGrid, run_backtest, load_grid
+
+
+PARAMETERS = ["tolerance", "hold_time", "budget", "max_trade"]
+
+# Grid of the worker process, attached to the shared memory blocks by _attach
+_grid = None
+_blocks = []
+
+
+def _share(array):
+    # Copy an array into a new shared memory block
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block
+
+
+def _open(name):
+    # Attach to a block, the sweep owner unlinks it. Pool workers share the owner's resource tracker,
+    # so before Python 3.13 (no track argument) the attach only repeats the owner's registration.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _attach(close_spec, signals_spec, symbols, start, periods):
+    global _grid
+    arrays = []
+    for name, shape, dtype in (close_spec, signals_spec):
+        block = _open(name)
+        _blocks.append(block)
+        arrays.append(np.ndarray(shape, dtype=dtype, buffer=block.buf))
+    _grid = MarketGrid(pd.date_range(start, periods=periods, freq="1h"), symbols, *arrays)
+
+
+def _evaluate(combinations, allow_buy, allow_sell, cash, fee):
+    # Backtest a batch of parameter combinations against the shared grid
+    rows = []
+    for tolerance, hold_time, budget, max_trade in combinations:
+        config = Configurations(id=0, allow_buy=allow_buy, allow_sell=allow_sell, budget=budget, tolerance=tolerance,
+                                hold_time=hold_time, max_trade=max_trade)
+        summary = run_backtest(_grid, config, cash=cash, fee=fee)["summary"]
+        exits = summary.pop("exits")
+        row = {"tolerance": tolerance, "hold_time": hold_time, "budget": budget, "max_trade": max_trade}
+        row.update(summary)
+        row.update({f"exits_{reason}": int(count) for reason, count in exits.items()})
+        rows.append(row)
+    return rows
+
+
+def load_results(out_dir):
+    # Every result written so far, one row per parameter combination
+    parts = sorted(glob.glob(os.path.join(out_dir, "part-*.parquet")))
+    if not parts:
+        return pd.DataFrame(columns=PARAMETERS)
+    return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+
+def _check_meta(out_dir, meta):
+    # Results in out_dir are only reused when they were run with the same settings and grid
+    path = os.path.join(out_dir, "meta.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+        if stored != meta:
+            changed = sorted(key for key in set(stored) | set(meta) if stored.get(key) != meta.get(key))
+            raise ValueError(f"{out_dir} holds a sweep run with other {', '.join(changed)}, use another out_dir")
+        return
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def run_sweep(grid, out_dir, tolerance, hold_time, budget, max_trade, allow_buy=1, allow_sell=1, cash=10_000.0,
+              fee=0.0, workers=None, batch_size=8):
+    """
+    Backtest every combination of the parameter values on a process pool.
+
+    The grid's closes and signals are copied into shared memory once, workers map them instead of
+    receiving pickled copies. Results are written as parquet parts to out_dir as batches finish,
+    combinations already in out_dir are skipped, so an interrupted sweep resumes where it stopped.
+    The settings shared by every run and the grid's shape are kept in out_dir/meta.json, a sweep
+    with different ones is refused instead of mixed with the stored results.
+
+    Args:
+        grid (MarketGrid): Closes and signals, e.g. from backtest.load_grid.
+        out_dir (str): Directory of the result parts.
+        tolerance (list): Stop-loss fractions.
+        hold_time (list): Hold times in hours, as stored in the config table.
+        budget (list): Budgets per trade.
+        max_trade (list): Concurrent trade caps.
+        allow_buy (int, optional): Config flag for every run (default: 1).
+        allow_sell (int, optional): Config flag for every run (default: 1).
+        cash (float, optional): Starting balance of every run (default: 10000).
+        fee (float, optional): Fee fraction per fill (default: 0).
+        workers (int, optional): Processes, all cores by default.
+        batch_size (int, optional): Combinations per task and per result part (default: 8).
+
+    Returns:
+        pd.DataFrame: All results in out_dir.
+
+    Raises:
+        ValueError: If out_dir holds results of a sweep with other settings or another grid.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    _check_meta(out_dir, {"allow_buy": int(allow_buy), "allow_sell": int(allow_sell), "cash": float(cash), "fee": float(fee),
+                          "symbols": list(grid.symbols), "start": str(grid.timestamps[0]), "periods": len(grid.timestamps)})
+    done = set(map(tuple, load_results(out_dir)[PARAMETERS].itertuples(index=False)))
+    todo = [combination for combination in itertools.product(tolerance, hold_time, budget, max_trade) if combination not in done]
+    logging.info(f"Sweep: {len(todo)} combinations to run, {len(done)} already done")
+    if not todo:
+        return load_results(out_dir)
+
+    part = len(glob.glob(os.path.join(out_dir, "part-*.parquet")))
+    blocks = [_share(np.ascontiguousarray(grid.close)), _share(np.ascontiguousarray(grid.signals))]
+    specs = [(block.name, array.shape, array.dtype.str) for block, array in zip(blocks, (grid.close, grid.signals))]
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_attach,
+                                 initargs=(*specs, grid.symbols, grid.timestamps[0], len(grid.timestamps))) as executor:
+            futures = [executor.submit(_evaluate, todo[i:i + batch_size], allow_buy, allow_sell, cash, fee)
+                       for i in range(0, len(todo), batch_size)]
+            finished = 0
+            for future in as_completed(futures):
+                rows = future.result()
+                # Written under a temporary name first so a crash never leaves a half-written part
+                path = os.path.join(out_dir, f"part-{part:05d}.parquet")
+                pd.DataFrame(rows).to_parquet(path + ".tmp", index=False)
+                os.replace(path + ".tmp", path)
+                part += 1
+                finished += len(rows)
+                logging.info(f"Sweep: {finished}/{len(todo)} done in {time.perf_counter() - started:.1f} s")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return load_results(out_dir)
+
+
+def best_config(results, metric="sharpe", allow_buy=1, allow_sell=1):
+    """
+    The best parameter combination of a sweep.
+
+    Args:
+        results (pd.DataFrame): Output of run_sweep or load_results.
+        metric (str, optional): Column to maximize (default: sharpe).
+
+    Returns:
+        dict: Keyword arguments for Configurations.update_config(db_session, **config).
+    """
+    best = results.loc[results[metric].idxmax()]
+    return {"allow_buy": allow_buy, "allow_sell": allow_sell, "budget": float(best["budget"]),
+            "tolerance": float(best["tolerance"]), "hold_time": int(best["hold_time"]), "max_trade": int(best["max_trade"])}
+
+
+if __name__ == "__main__":
+    from ringobot.serviceData.bulkDataImport import symbols
+    logging.basicConfig(level=logging.INFO)
+    results = run_sweep(load_grid(symbols), "sweep_results",
+                        tolerance=[0.02, 0.03, 0.05, 0.08, 0.1], hold_time=[6, 12, 24, 48, 72],
+                        budget=[50, 100, 200], max_trade=[5, 10, 20])
+    print(results.sort_values("sharpe", ascending=False).head(10).to_string())
+    print(f"Best config: {best_config(results)}")
@@ -30,10 +30,10 @@ def preprocess_new_data(new_data, window_size):
     # 4. Reshape the data if necessary
 
     # Label the data (you might need to adjust this depending on your new_data format)
-    labeled_data = label_data(new_data, train=False)
+    labeled_data, _ = label_data(new_data, train=False)
 
-    # Perform sliding window method
-    windows, _, _ = sliding_window(labeled_data, window_size)
+    # Perform sliding window method, the windows are a strided view over labeled_data
+    windows = sliding_window(labeled_data, window_size)
     time_steps, n_features = windows.shape[1], windows.shape[2]
     windows = windows.reshape(-1, time_steps * n_features)
     # Standardize the data using the loaded scaler
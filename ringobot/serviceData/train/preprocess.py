@@ -4,9 +4,11 @@ from tqdm import tqdm
 import os
 from ringobot.serviceData.bulkDataImport import symbols
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pickle
+import json
+from ringobot.serviceData.featureEngineering import compute_features, feature_manifest
 from imblearn.under_sampling import RandomUnderSampler
 from imblearn.over_sampling import RandomOverSampler
 
@@ -39,12 +41,46 @@ def label_data(df, future_period=3, threshold=0.02, train=False):
     return df, labels
 
 
-def sliding_window(df, window_size):
-    windows = []
-    for i in range(len(df) - window_size):
-        window = df.iloc[i:i + window_size].values
-        windows.append(window)
-    return np.array(windows)
+def compute_labels(close, future_period=3, threshold=0.02):
+    """
+    Function to label close prices the way label_data does, without a DataFrame
+    :param close: Array of close prices
+    :param future_period: Future period for the price change calculation
+    :param threshold: Threshold for the price change
+    :return: Labels (-1, 0, 1) and a mask of the rows that have a future price
+    """
+    close = np.asarray(close, dtype=np.float64)
+    future_price = np.full(len(close), np.nan)
+    future_price[:len(close) - future_period] = close[future_period:]
+    labels = np.zeros(len(close), dtype=np.int64)
+    with np.errstate(invalid="ignore"):
+        price_change_pct = (future_price - close) / close
+        labels[price_change_pct > threshold] = 1
+        labels[price_change_pct < -threshold] = -1
+    return labels, ~np.isnan(future_price)
+
+
+def sliding_window(df, window_size, rows=None):
+    """
+    Function to build the model input windows without copying the data
+    :param df: DataFrame or 2d array with the features, one row per candle
+    :param window_size: Number of rows in each window
+    :param rows: Optional indices of the windows to materialize, e.g. [-1] for the latest one
+    :return: Read-only array of shape (len(df) - window_size, window_size, n_features),
+             or a contiguous copy of the requested windows when rows is given
+    """
+    values = np.asarray(df.values if hasattr(df, "values") else df)
+    # Float matrices (compute_features returns float32) are used as they are, anything else becomes float64
+    values = np.ascontiguousarray(values, dtype=values.dtype if values.dtype.kind == "f" else np.float64)
+    if len(values) <= window_size:
+        return np.empty((0, window_size, values.shape[1]), dtype=values.dtype)
+    # Window i covers rows i..i+window_size-1, its label is the row right after it
+    windows = sliding_window_view(values, window_size, axis=0)[:len(values) - window_size]
+    # sliding_window_view puts the window axis last, move it before the features
+    windows = windows.transpose(0, 2, 1)
+    if rows is not None:
+        return np.ascontiguousarray(windows[rows])
+    return windows
 
 
 def under_sample_data(X_train, y_train):
@@ -62,13 +98,21 @@ def over_sample_data(X_train, y_train):
 
 
 def preprocess_data(df, window_size, test_size, threshold, future_period=3, balanace_data=False):
-    # Label the data
-    df, labels = label_data(df, future_period=future_period, threshold=threshold, train=True)
+    # Build the same feature matrix the live bot uses and label it
+    features = compute_features(df['close'].values, df['volume'].values)
+    labels, has_future = compute_labels(df['close'].values, future_period=future_period, threshold=threshold)
+    # Drop the indicator warm-up rows and the rows without a future price, like label_data(train=True)
+    keep = has_future & ~np.isnan(features).any(axis=1)
+    features, labels = features[keep], labels[keep]
     # Perform sliding window method
-    windows = sliding_window(df, window_size)
+    windows = sliding_window(features, window_size)
     labels = labels[window_size:]
-    # Split the data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(windows, labels, test_size=test_size, shuffle=False)
+    # Split the data into training and testing sets, chronologically like train_test_split(shuffle=False)
+    # but slicing keeps both parts as views until they are concatenated
+    n_test = int(np.ceil(test_size * len(windows)))
+    n_train = len(windows) - n_test
+    X_train, X_test = windows[:n_train], windows[n_train:]
+    y_train, y_test = labels[:n_train], labels[n_train:]
 
     return X_train, X_test, y_train, y_test
 
@@ -114,6 +158,9 @@ if __name__ == "__main__":
     os.makedirs(f"data/class-window{window_size}-threshold{threshold}-future{future_period}", exist_ok=True)
     with open(f"data/class-window{window_size}-threshold{threshold}-future{future_period}/scaler.pkl", "wb") as f:
         pickle.dump(scaler, f)
+    # Record the feature layout the scaler and models are trained on
+    with open(f"data/class-window{window_size}-threshold{threshold}-future{future_period}/features.json", "w") as f:
+        json.dump(feature_manifest(), f, indent=2)
     # Save combined data
     np.save(f"data/class-window{window_size}-threshold{threshold}-future{future_period}/X_train.npy", X_train_scaled)
     np.save(f"data/class-window{window_size}-threshold{threshold}-future{future_period}/X_test.npy", X_test_scaled)
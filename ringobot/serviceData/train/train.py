@@ -1,33 +1,10 @@
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-import xgboost as xgb
 from catboost import CatBoostClassifier
 from lightgbm import LGBMClassifier
 from sklearn.metrics import f1_score, precision_score, recall_score, confusion_matrix
-from sklearn.model_selection import GridSearchCV
-import seaborn as sns
-import matplotlib.pyplot as plt
 from ringobot.serviceData.train.preprocess import under_sample_data, over_sample_data
 
-# Load the data
-X_train = np.load("data/class-window24-threshold0.02-future3/X_train.npy")
-X_test = np.load("data/class-window24-threshold0.02-future3/X_test.npy")
-y_train = np.load("data/class-window24-threshold0.02-future3/y_train.npy")
-y_test = np.load("data/class-window24-threshold0.02-future3/y_test.npy")
-
-
-# Balance the data
-X_train, y_train = over_sample_data(X_train, y_train)
-
-# print class distribution
-print("Class Distribution train data")
-unique, counts = np.unique(y_train, return_counts=True)
-print(dict(zip(unique, counts)))
-
-print("Class Distribution test data")
-unique, counts = np.unique(y_test, return_counts=True)
-print(dict(zip(unique, counts)))
-
 
 def evaluate_classification(y_true, y_pred):
     """
@@ -47,56 +24,103 @@ def evaluate_classification(y_true, y_pred):
     return f1, precision, recall
 
 
-# Random Forest Classifier
-print("Random Forest Classifier Training Started")
-rf_model = RandomForestClassifier(random_state=42, n_jobs=-1, verbose=2)
-rf_model.fit(X_train, y_train)
-rf_pred = rf_model.predict(X_test)
-rf_f1, rf_precision, rf_recall = evaluate_classification(y_test, rf_pred)
+def make_model(name, threads=-1, verbose=False):
+    """
+    The classifiers compared here, with the settings of the training script.
+
+    Parameters:
+    name (str): random_forest, catboost or lightgbm.
+    threads (int): Threads the model may use, -1 for all cores.
+    verbose (bool): Print training progress.
+
+    Returns:
+    Unfitted classifier.
+    """
+    if name == "random_forest":
+        return RandomForestClassifier(random_state=42, n_jobs=threads, verbose=2 if verbose else 0)
+    if name == "catboost":
+        return CatBoostClassifier(random_seed=42, verbose=200 if verbose else 0, thread_count=threads)
+    if name == "lightgbm":
+        return LGBMClassifier(random_state=42, n_jobs=threads, verbose=2 if verbose else -1)
+    raise ValueError(f"Unknown model: {name}")
+
+
+MODELS = ["random_forest", "catboost", "lightgbm"]
+
+
+if __name__ == "__main__":
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+
+    # Load the data
+    X_train = np.load("data/class-window24-threshold0.02-future3/X_train.npy")
+    X_test = np.load("data/class-window24-threshold0.02-future3/X_test.npy")
+    y_train = np.load("data/class-window24-threshold0.02-future3/y_train.npy")
+    y_test = np.load("data/class-window24-threshold0.02-future3/y_test.npy")
+
+
+    # Balance the data
+    X_train, y_train = over_sample_data(X_train, y_train)
+
+    # print class distribution
+    print("Class Distribution train data")
+    unique, counts = np.unique(y_train, return_counts=True)
+    print(dict(zip(unique, counts)))
+
+    print("Class Distribution test data")
+    unique, counts = np.unique(y_test, return_counts=True)
+    print(dict(zip(unique, counts)))
+
 
+    # Random Forest Classifier
+    print("Random Forest Classifier Training Started")
+    rf_model = make_model("random_forest", verbose=True)
+    rf_model.fit(X_train, y_train)
+    rf_pred = rf_model.predict(X_test)
+    rf_f1, rf_precision, rf_recall = evaluate_classification(y_test, rf_pred)
 
-# CatBoost Classifier
-print("CatBoost Classifier Training Started")
-catboost_model = CatBoostClassifier(random_seed=42, verbose=200, thread_count=-1)
-catboost_model.fit(X_train, y_train)
-catboost_pred = catboost_model.predict(X_test)
-catboost_f1, catboost_precision, catboost_recall = evaluate_classification(y_test, catboost_pred)
 
-# LightGBM Classifier
-print("LightGBM Classifier Training Started")
-lgbm_model = LGBMClassifier( random_state=42, n_jobs=-1, verbose=2)
-lgbm_model.fit(X_train, y_train)
-lgbm_pred = lgbm_model.predict(X_test)
-lgbm_f1, lgbm_precision, lgbm_recall = evaluate_classification(y_test, lgbm_pred)
+    # CatBoost Classifier
+    print("CatBoost Classifier Training Started")
+    catboost_model = make_model("catboost", verbose=True)
+    catboost_model.fit(X_train, y_train)
+    catboost_pred = catboost_model.predict(X_test)
+    catboost_f1, catboost_precision, catboost_recall = evaluate_classification(y_test, catboost_pred)
 
-# Model Comparison
+    # LightGBM Classifier
+    print("LightGBM Classifier Training Started")
+    lgbm_model = make_model("lightgbm", verbose=True)
+    lgbm_model.fit(X_train, y_train)
+    lgbm_pred = lgbm_model.predict(X_test)
+    lgbm_f1, lgbm_precision, lgbm_recall = evaluate_classification(y_test, lgbm_pred)
 
-f1_scores = [rf_f1, catboost_f1, lgbm_f1]
-precision_scores = [rf_precision, catboost_precision, lgbm_precision]
-recall_scores = [rf_recall, catboost_recall, lgbm_recall]
+    # Model Comparison
 
-for model, f1, precision, recall in zip(["Random Forest", "CatBoost", "LightGBM"], f1_scores, precision_scores, recall_scores):
-    print(f"{model} Classifier:")
-    print(f"F1-score: {f1:.3f}, Precision: {precision:.3f}, Recall: {recall:.3f}")
-    print("\n")
+    f1_scores = [rf_f1, catboost_f1, lgbm_f1]
+    precision_scores = [rf_precision, catboost_precision, lgbm_precision]
+    recall_scores = [rf_recall, catboost_recall, lgbm_recall]
 
-# Get the confusion matrix
-cm = confusion_matrix(y_test, catboost_pred)
+    for model, f1, precision, recall in zip(["Random Forest", "CatBoost", "LightGBM"], f1_scores, precision_scores, recall_scores):
+        print(f"{model} Classifier:")
+        print(f"F1-score: {f1:.3f}, Precision: {precision:.3f}, Recall: {recall:.3f}")
+        print("\n")
 
+    # Get the confusion matrix
+    cm = confusion_matrix(y_test, catboost_pred)
 
 
-# Plot the confusion matrix
-plt.figure(figsize=(8, 6))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False)
-plt.xlabel('Predicted Labels')
-plt.ylabel('True Labels')
-plt.title('Confusion Matrix')
-plt.show()
 
-# Save the model
-lgbm_model.booster_.save_model("ringobot/serviceData/train/models/lgbm_classifier.txt")
-catboost_model.save_model("ringobot/serviceData/train/models/catboost_classifier.cbm")
+    # Plot the confusion matrix
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False)
+    plt.xlabel('Predicted Labels')
+    plt.ylabel('True Labels')
+    plt.title('Confusion Matrix')
+    plt.show()
 
+    # Save the model
+    lgbm_model.booster_.save_model("ringobot/serviceData/train/models/lgbm_classifier.txt")
+    catboost_model.save_model("ringobot/serviceData/train/models/catboost_classifier.cbm")
 
 
 """
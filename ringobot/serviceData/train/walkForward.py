@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from ringobot.serviceData.featureEngineering import compute_features, feature_manifest
+from ringobot.serviceData.train.preprocess import compute_labels, sliding_window, under_sample_data, over_sample_data
+from ringobot.serviceData.train.train import MODELS, make_model, evaluate_classification
+
+
+def walk_forward_folds(start, end, train_period="365D", test_period="90D", step=None):
+    """
+    Function to split a time range into rolling train and test windows
+    :param start: First timestamp of the data
+    :param end: Last timestamp of the data
+    :param train_period: Length of every training window
+    :param test_period: Length of every test window, it starts where its training window ends
+    :param step: Shift between consecutive folds, test_period by default so the test windows do not overlap
+    :return: List of (train_start, train_end, test_end) timestamps
+    """
+    train_period, test_period = pd.Timedelta(train_period), pd.Timedelta(test_period)
+    step = pd.Timedelta(step) if step is not None else test_period
+    folds = []
+    train_start = pd.Timestamp(start)
+    while train_start + train_period + test_period <= pd.Timestamp(end):
+        folds.append((train_start, train_start + train_period, train_start + train_period + test_period))
+        train_start += step
+    return folds
+
+
+def symbol_windows(df, window_size=24, threshold=0.02, future_period=3):
+    """
+    Function to build the windows of one symbol like preprocess_data does before its split
+    :param df: DataFrame with close and volume, indexed by time
+    :return: Windows (strided view), their labels and the time of every label row
+    """
+    features = compute_features(df['close'].values, df['volume'].values)
+    labels, has_future = compute_labels(df['close'].values, future_period=future_period, threshold=threshold)
+    keep = has_future & ~np.isnan(features).any(axis=1)
+    windows = sliding_window(features[keep], window_size)
+    return windows, labels[keep][window_size:], df.index[keep][window_size:]
+
+
+def prepare_fold(windows, fold, fold_dir, gap):
+    """
+    Function to write the scaled, flattened matrices of one fold to fold_dir
+    :param windows: {symbol: output of symbol_windows}
+    :param fold: (train_start, train_end, test_end)
+    :param fold_dir: Cache directory of the fold, only created once every file is written
+    :param gap: Timedelta the labels look ahead, training labels must not reach into the test window
+    :return: Number of training and test rows
+    """
+    train_start, train_end, test_end = fold
+    parts = {"X_train": [], "y_train": [], "X_test": [], "y_test": []}
+    for symbol_window, labels, times in windows.values():
+        n_columns = symbol_window.shape[1] * symbol_window.shape[2]
+        train = (times >= train_start) & (times < train_end - gap)
+        test = (times >= train_end) & (times < test_end)
+        parts["X_train"].append(symbol_window[train].reshape(-1, n_columns))
+        parts["y_train"].append(labels[train])
+        parts["X_test"].append(symbol_window[test].reshape(-1, n_columns))
+        parts["y_test"].append(labels[test])
+    arrays = {name: np.concatenate(values) for name, values in parts.items()}
+    if len(arrays["y_train"]) and len(arrays["y_test"]):
+        # Standardize with the statistics of the training window only
+        scaler = StandardScaler()
+        arrays["X_train"] = scaler.fit_transform(arrays["X_train"]).astype(np.float32)
+        arrays["X_test"] = scaler.transform(arrays["X_test"]).astype(np.float32)
+    # Written to a temporary directory first so an interrupted run never leaves a partial fold behind
+    tmp_dir = fold_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "fold.json"), "w") as f:
+        json.dump({"train_start": str(train_start), "train_end": str(train_end), "test_end": str(test_end),
+                   "train_rows": len(arrays["y_train"]), "test_rows": len(arrays["y_test"])}, f, indent=2)
+    os.replace(tmp_dir, fold_dir)
+    return len(arrays["y_train"]), len(arrays["y_test"])
+
+
+def _limit_threads(threads):
+    # Native thread pools of the worker start with this many threads
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+
+def _fit(fold_dir, model, threads, balance):
+    # Train and score one model on one cached fold
+    from threadpoolctl import threadpool_limits
+    X_train = np.load(os.path.join(fold_dir, "X_train.npy"), mmap_mode="r")
+    y_train = np.load(os.path.join(fold_dir, "y_train.npy"))
+    X_test = np.load(os.path.join(fold_dir, "X_test.npy"), mmap_mode="r")
+    y_test = np.load(os.path.join(fold_dir, "y_test.npy"))
+    if balance == "over":
+        X_train, y_train = over_sample_data(X_train, y_train)
+    elif balance == "under":
+        X_train, y_train = under_sample_data(X_train, y_train)
+    with threadpool_limits(threads):
+        classifier = make_model(model, threads)
+        started = time.perf_counter()
+        classifier.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - started
+        predictions = np.ravel(classifier.predict(X_test))
+    f1, precision, recall = evaluate_classification(y_test, predictions)
+    return {"fold": os.path.basename(fold_dir), "model": model, "f1": f1, "precision": precision, "recall": recall,
+            "train_rows": len(y_train), "test_rows": len(y_test), "fit_seconds": fit_seconds}
+
+
+def _cache_key(frames, window_size, threshold, future_period):
+    # Prepared folds are reused while the candles and the preprocessing settings stay the same
+    digest = hashlib.sha1(json.dumps({"window_size": window_size, "threshold": threshold, "future_period": future_period,
+                                      "features": feature_manifest()}, sort_keys=True).encode())
+    for symbol, df in sorted(frames.items()):
+        digest.update(symbol.encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def run_walk_forward(symbols, out_dir="walk_forward", path="kline_data", train_period="365D", test_period="90D",
+                     step=None, models=MODELS, window_size=24, threshold=0.02, future_period=3, balance="over",
+                     workers=None, threads=None):
+    """
+    Function to evaluate the classifiers on rolling walk-forward folds
+    :param symbols: Symbols whose hourly candles are pooled, like the training script does
+    :param out_dir: Directory of the fold cache and the result tables
+    :param path: Directory of the {symbol}/{symbol}-1h.parquet files
+    :param train_period, test_period, step: See walk_forward_folds
+    :param models: Names accepted by train.make_model
+    :param window_size, threshold, future_period: See preprocess_data
+    :param balance: "over", "under" or None, resampling of every training window
+    :param workers: Processes, one (fold, model) pair each; every fold and model by default, at most the cores
+    :param threads: Threads per worker, the cores divided by the workers by default
+    :return: Results per (fold, model) and the comparison per model as DataFrames
+    """
+    frames = {symbol: pd.read_parquet(f"{path}/{symbol}/{symbol}-1h.parquet", columns=["close", "volume"]).sort_index()
+              for symbol in symbols}
+    start = min(df.index[0] for df in frames.values())
+    end = max(df.index[-1] for df in frames.values())
+    folds = walk_forward_folds(start, end, train_period, test_period, step)
+    cache_dir = os.path.join(out_dir, "cache", _cache_key(frames, window_size, threshold, future_period))
+    os.makedirs(cache_dir, exist_ok=True)
+
+    cores = os.cpu_count()
+    workers = workers or max(min(len(folds) * len(models), cores), 1)
+    threads = threads or max(cores // workers, 1)
+    logging.info(f"Walk-forward: {len(folds)} folds x {len(models)} models on {workers} workers with {threads} threads each")
+
+    started = time.perf_counter()
+    windows = None
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads, initargs=(threads,)) as executor:
+        futures = []
+        for fold in folds:
+            fold_dir = os.path.join(cache_dir, "fold-" + "-".join(f"{bound:%Y%m%d}" for bound in fold))
+            if not os.path.exists(fold_dir):
+                if windows is None:
+                    windows = {symbol: symbol_windows(df, window_size, threshold, future_period)
+                               for symbol, df in frames.items()}
+                prepare_fold(windows, fold, fold_dir, pd.Timedelta(hours=future_period))
+            with open(os.path.join(fold_dir, "fold.json")) as f:
+                meta = json.load(f)
+            if not meta["train_rows"] or not meta["test_rows"]:
+                logging.warning(f"Walk-forward: skipping {os.path.basename(fold_dir)}, a window has no rows")
+                continue
+            # The models of a fold start training while the next fold is prepared
+            futures += [executor.submit(_fit, fold_dir, model, threads, balance) for model in models]
+        for future in as_completed(futures):
+            rows.append(future.result())
+            logging.info(f"Walk-forward: {len(rows)}/{len(futures)} done in {time.perf_counter() - started:.1f} s")
+
+    results = pd.DataFrame(rows, columns=["fold", "model", "f1", "precision", "recall", "train_rows", "test_rows",
+                                          "fit_seconds"]).sort_values(["fold", "model"], ignore_index=True)
+    comparison = results.groupby("model")[["f1", "precision", "recall", "fit_seconds"]].agg(["mean", "std"])
+    comparison.columns = [f"{metric}_{stat}" for metric, stat in comparison.columns]
+    comparison = comparison.sort_values("f1_mean", ascending=False)
+    results.to_csv(os.path.join(out_dir, "results.csv"), index=False)
+    comparison.to_csv(os.path.join(out_dir, "comparison.csv"))
+    return results, comparison
+
+
+if __name__ == "__main__":
+    from ringobot.serviceData.bulkDataImport import symbols
+    logging.basicConfig(level=logging.INFO)
+    results, comparison = run_walk_forward(symbols)
+    print(comparison.to_string())
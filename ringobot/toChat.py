@@ -8,7 +8,7 @@ from ringobot.config import SLACK_WEBHOOK_URL, APP_URL
 def send_slack_message(message=None, attachments=None):
     webhook_url = SLACK_WEBHOOK_URL
     payload = {"text": message, "attachments": attachments} if message or attachments else None
-    if payload:
+    if payload and webhook_url:
         response = requests.post(webhook_url, json=payload)
         if response.status_code != 200:
             print(f'Failed to send message to Slack: {response.text}')
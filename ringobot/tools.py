@@ -22,14 +22,15 @@ def timing(f):
     return wrap
 
 
-def calculate_max_qty(price, budget, min_quantity):
-    max_lots = int(budget / price / min_quantity)
-    quantity = round(max_lots * min_quantity, 6)  # Round to 6 decimal places
+def calculate_max_qty(price, budget, step_size):
+    # Largest quantity affordable with budget that is a multiple of the LOT_SIZE step
+    max_lots = int(budget / price / step_size)
+    quantity = round(max_lots * step_size, 6)  # Round to 6 decimal places
     return quantity
 
 
-def calculate_max_sell_qty(asset_balance, min_quantity):
-    max_qty = int(asset_balance / min_quantity) * min_quantity
+def calculate_max_sell_qty(asset_balance, step_size):
+    max_qty = int(asset_balance / step_size) * step_size
     return round(max_qty, 6)  # Round to 6 decimal places
 
 
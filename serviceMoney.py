@@ -1,11 +1,18 @@
 from ringobot.tools import timing
 from ringobot.db.utils import session_scope
 from apscheduler.schedulers.background import BackgroundScheduler
-from ringobot.serviceData.runner import trade, safety_sell, expire_sell, slack
+from ringobot.serviceData.runner import trade, safety_sell, expire_sell, slack, monitor_sell
 import time
 import logging
 from ringobot.db.session import Session
 from ringobot.db.configurations import Configurations
+from ringobot.config import USE_MARKET_STREAM, USE_STOP_LOSS_MONITOR
+from ringobot.serviceData.marketStream import market_data
+from ringobot.serviceData.marketSnapshot import MarketSnapshot
+from ringobot.serviceData.stopLossMonitor import start_monitor
+from ringobot.serviceData.orderExecutor import user_stream_fills
+from ringobot.serviceData.binance import request_weight_limiter
+from ringobot.serviceData.bulkDataImport import symbols
 logging.basicConfig(level=logging.INFO)
 # Set the logging level for the apscheduler logger to WARNING
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
@@ -13,16 +20,35 @@ logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
 # Initialize the scheduler
 sched = BackgroundScheduler({'apscheduler.timezone': 'utc'})
+# Stop-loss monitor, set in __main__ when USE_STOP_LOSS_MONITOR is on
+monitor = None
+
+
+def sync_monitor(db_session, conf=None):
+    if monitor is None:
+        return
+    monitor.update_config(conf or Configurations.get_config(db_session))
+    monitor.sync(Session.get_active_sessions(db_session))
 
 
 @sched.scheduled_job('cron', minute='0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55')
 @timing
 def minute5_job():
+    logging.info(f"Binance request weight: {request_weight_limiter.metrics()}")
     with session_scope() as db_session:
         active_sessions = Session.get_active_sessions(db_session)
         conf = Configurations.get_config(db_session)
-        safety_sell(db_session, active_sessions, conf)
-        expire_sell(db_session, active_sessions, conf)
+        if monitor is not None:
+            sync_monitor(db_session, conf)
+            # Sessions the monitor is already selling are left to it
+            pending = set(monitor.pending)
+            active_sessions = [session for session in active_sessions if session.id not in pending]
+        snapshot = MarketSnapshot()  # One ticker and one account call per tick
+        if monitor is None or not market_data.is_live():
+            # The monitor only sees live price updates, without them the stop-loss stays on the timer
+            safety_sell(db_session, active_sessions, conf, snapshot)
+        # Expiry does not need a price update to fire, the timer always checks it
+        expire_sell(db_session, active_sessions, conf, snapshot)
 
 
 @sched.scheduled_job('cron', minute='0')
@@ -30,11 +56,21 @@ def minute5_job():
 def hourly_job():
     with session_scope() as db_session:
         trade(db_session)
+        sync_monitor(db_session)
         slack(db_session)
 
 
 if __name__ == "__main__":
     logging.info("Scheduler started")
+    if USE_MARKET_STREAM:
+        market_data.start(symbols)
+        user_stream_fills.start()
+        logging.info("Market data and user data streams started")
+        if USE_STOP_LOSS_MONITOR:
+            with session_scope() as db_session:
+                monitor = start_monitor(market_data, monitor_sell, Configurations.get_config(db_session),
+                                        Session.get_active_sessions(db_session))
+            logging.info("Stop-loss monitor started")
     hourly_job()
     sched.start()
     while True:
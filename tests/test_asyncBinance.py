@@ -0,0 +1,117 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from binance.exceptions import BinanceAPIException
+from ringobot.serviceData import asyncBinance
+from ringobot.serviceData.asyncBinance import AsyncBinanceAPI
+from ringobot.serviceData.fakeExchange import FakeExchange, FakeExchangeServer
+from ringobot.serviceData.rateLimiter import RequestWeightLimiter, ORDER, ACCOUNT, MARKET_DATA
+
+
+FIVE_MINUTES = 300_000
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
+
+
+class RecordingLimiter(RequestWeightLimiter):
+    # Counts every acquire_async, the only way AsyncBinanceAPI may reach the exchange
+    def __init__(self):
+        super().__init__(1200)
+        self.acquired = []
+
+    async def acquire_async(self, weight=1, priority=MARKET_DATA, orders=0):
+        self.acquired.append((weight, priority, orders))
+        await super().acquire_async(weight, priority, orders)
+
+
+@pytest.fixture
+def exchange():
+    start = 1_700_000_000_000 // FIVE_MINUTES * FIVE_MINUTES
+    n = 3000
+    candles = {symbol: pd.DataFrame({"timestamp": start + np.arange(n) * FIVE_MINUTES,
+                                     "close": np.linspace(1, 2, n) * (i + 1), "volume": np.ones(n)})
+               for i, symbol in enumerate(SYMBOLS)}
+    exchange = FakeExchange(candles)
+    server = FakeExchangeServer(exchange).start()
+    exchange.url = server.url
+    yield exchange
+    server.stop()
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RecordingLimiter()
+    monkeypatch.setattr(asyncBinance, "request_weight_limiter", limiter)
+    return limiter
+
+
+def run(exchange, calls):
+    # Runs calls(api) against the fake exchange, returns its result
+    async def main():
+        async with AsyncBinanceAPI("key", "secret", base_url=exchange.url, dry_run=False) as api:
+            return await calls(api)
+    return asyncio.run(main())
+
+
+def test_batch_keeps_symbol_order(exchange, limiter):
+    symbols = ["ETHUSDT", "BTCUSDT", "BNBUSDT"]
+    results, errors = run(exchange, lambda api: api.get_latest_kline_data_batch(symbols, "5m", limit=10))
+    assert errors == {}
+    assert list(results) == symbols
+    for i, symbol in enumerate(symbols):
+        klines = results[symbol]
+        assert len(klines) == 10
+        assert all(b[0] - a[0] == FIVE_MINUTES for a, b in zip(klines, klines[1:]))
+        # Each symbol gets its own candles, not another request's
+        assert float(klines[-1][4]) == pytest.approx(exchange.price(symbol))
+
+
+def test_batch_collects_errors(exchange, limiter):
+    symbols = ["BTCUSDT", "XXXUSDT", "ETHUSDT"]
+    results, errors = run(exchange, lambda api: api.get_latest_kline_data_batch(symbols, "5m", limit=10))
+    assert list(results) == ["BTCUSDT", "ETHUSDT"]
+    assert list(errors) == ["XXXUSDT"]
+    assert isinstance(errors["XXXUSDT"], BinanceAPIException) and errors["XXXUSDT"].status_code == 400
+
+    async def calls(api):
+        exchange.fail_next(503)
+        return await api.get_latest_kline_data_batch(SYMBOLS, "5m", limit=10)
+
+    # The 503 hits whichever request arrives first, the rest of the batch still completes
+    results, errors = run(exchange, calls)
+    assert len(results) == 2 and len(errors) == 1
+    assert set(results) | set(errors) == set(SYMBOLS)
+    assert [error.status_code for error in errors.values()] == [503]
+
+
+def test_every_call_goes_through_the_limiter(exchange, limiter):
+    async def calls(api):
+        requests = exchange.requests
+        await api.get_latest_kline_data_batch(SYMBOLS, "5m", limit=10)
+        await asyncio.gather(api.get_all_prices(), api.get_account_balance(), api.get_symbol_ticker("BTCUSDT"))
+        order = await api.place_market_buy_order("BTCUSDT", 1)
+        await api.get_order("BTCUSDT", order["orderId"])
+        await api.get_symbol_stepSize("BTCUSDT")
+        return exchange.requests - requests
+
+    # Creating the client pings the exchange, everything after that is weighed first
+    assert run(exchange, calls) == len(limiter.acquired)
+    assert limiter.acquired[:3] == [(1, MARKET_DATA, 0)] * 3
+    assert (20, ACCOUNT, 0) in limiter.acquired
+    assert (1, ORDER, 1) in limiter.acquired
+    assert limiter.metrics()["server_used_weight"] > 0
+
+
+def test_concurrent_calls_record_their_own_response(exchange, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(asyncBinance.request_weight_limiter, "record_response",
+                        lambda response: recorded.append(str(response.url)))
+
+    async def calls(api):
+        await asyncio.gather(*(api.get_latest_kline_data(symbol, "5m", limit=5) for symbol in SYMBOLS),
+                             api.get_all_prices(), api.get_account_balance())
+
+    run(exchange, calls)
+    assert len(recorded) == 5
+    assert sum("/klines" in url for url in recorded) == 3
+    assert all(any(symbol in url for url in recorded) for symbol in SYMBOLS)
@@ -0,0 +1,104 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ringobot.serviceData import bulkDataImport
+
+
+FIVE_MINUTES = 300_000
+
+
+class FakeWriteApi:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, bucket, org, df, **kwargs):
+        self.frames.append(df)
+
+    def close(self):
+        pass
+
+
+def test_import_coin_data_keeps_float64_prices(tmp_path, monkeypatch):
+    n = 12 * 200
+    # Prices float32 cannot hold
+    close = 60_000.123456 + np.arange(n) * 0.000001
+    volume = 1234.56789012 + np.arange(n) * 0.00000001
+    klines = pd.DataFrame({"timestamp": 1_700_000_000_000 // 3_600_000 * 3_600_000 + np.arange(n) * FIVE_MINUTES,
+                           "close": close, "volume": volume})
+    write_api = FakeWriteApi()
+    monkeypatch.setattr(bulkDataImport, "read_klines", lambda symbol, interval, columns: klines[columns])
+    monkeypatch.setattr(bulkDataImport, "influxDBwriteApi", write_api)
+    monkeypatch.chdir(tmp_path)
+    assert bulkDataImport.import_coin_data("AAAUSDT") == 200
+    df = pd.read_parquet("kline_data/AAAUSDT/AAAUSDT-1h.parquet")
+    hourly = klines.assign(timestamp=pd.to_datetime(klines["timestamp"], unit="ms")).set_index("timestamp").resample("1h")
+    assert df["close"].dtype == np.float64
+    np.testing.assert_array_equal(df["close"].to_numpy(), hourly["close"].last().to_numpy())
+    np.testing.assert_array_equal(df["volume"].to_numpy(), hourly["volume"].sum().to_numpy())
+    assert write_api.frames[0]["close"].dtype == np.float64
+
+
+def features_stage(symbol):
+    # Stand-in for import_coin_data, writes the source of the signals stage
+    with open(f"out/{symbol}", "a") as f:
+        f.write("features\n")
+    return 10
+
+
+def signals_stage(symbol):
+    if symbol == "BADUSDT":
+        raise ValueError("no signals")
+    return 5
+
+
+STAGES = {
+    "features": (features_stage, lambda symbol: bulkDataImport.file_fingerprint(f"src/{symbol}")),
+    "signals": (signals_stage, lambda symbol: bulkDataImport.file_fingerprint(f"out/{symbol}")),
+}
+
+
+def counts(result):
+    return result["summary"][["done", "skipped", "failed"]].to_dict("index")
+
+
+def test_run_import_resumes_from_the_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    symbols = ["AAAUSDT", "BBBUSDT", "BADUSDT"]
+    os.makedirs("src")
+    os.makedirs("out")
+    for symbol in symbols:
+        with open(f"src/{symbol}", "w") as f:
+            f.write(symbol)
+    monkeypatch.setattr(bulkDataImport, "STAGES", STAGES)
+    # Forked workers see the patched stages, spawned ones would import the real ones
+    monkeypatch.setattr(bulkDataImport, "ProcessPoolExecutor", lambda max_workers, **kwargs: ProcessPoolExecutor(
+        max_workers, mp_context=multiprocessing.get_context("fork")))
+    manifest_file = str(tmp_path / "state" / "manifest.json")
+
+    result = bulkDataImport.run_import(symbols, workers=2, manifest_file=manifest_file)
+    assert counts(result) == {"features": {"done": 3, "skipped": 0, "failed": 0},
+                              "signals": {"done": 2, "skipped": 0, "failed": 1}}
+    assert result["summary"].loc["features", "rows"] == 30
+    assert result["failures"] == {"BADUSDT": {"signals": "ValueError: no signals"}}
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    assert set(manifest["AAAUSDT"]) == {"features", "signals"}
+    assert list(manifest["BADUSDT"]) == ["features"]
+
+    # Unchanged symbols are skipped, the failed stage runs again
+    result = bulkDataImport.run_import(symbols, workers=2, manifest_file=manifest_file)
+    assert counts(result) == {"features": {"done": 0, "skipped": 3, "failed": 0},
+                              "signals": {"done": 0, "skipped": 2, "failed": 1}}
+
+    # A changed source redoes that symbol's stages, and the stages that read their output
+    with open("src/AAAUSDT", "a") as f:
+        f.write("more")
+    result = bulkDataImport.run_import(symbols, stages=["features", "signals"], workers=2, manifest_file=manifest_file)
+    assert counts(result) == {"features": {"done": 1, "skipped": 2, "failed": 0},
+                              "signals": {"done": 1, "skipped": 1, "failed": 1}}
+    result = bulkDataImport.run_import(symbols, workers=2, force=True, manifest_file=manifest_file)
+    assert counts(result) == {"features": {"done": 3, "skipped": 0, "failed": 0},
+                              "signals": {"done": 2, "skipped": 0, "failed": 1}}
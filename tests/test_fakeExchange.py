@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from binance.client import Client
+from binance.exceptions import BinanceAPIException
+from ringobot.config import with_api_url
+from ringobot.serviceData import binance
+from ringobot.serviceData.binance import BinanceAPI
+from ringobot.serviceData.fakeExchange import FakeExchange, FakeExchangeServer
+from ringobot.serviceData.klineCache import KlineCache
+from ringobot.serviceData.rateLimiter import RequestWeightLimiter
+
+
+FIVE_MINUTES = 300_000
+
+
+class ExchangeAPI:
+    # BinanceAPI.get_latest_kline_data answered by a FakeExchange in the same process
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    def get_latest_kline_data(self, symbol, interval, limit=500, start_time=None):
+        return self.exchange.klines(symbol, interval, limit=limit, startTime=start_time)
+
+
+def test_kline_cache_follows_advanced_replay():
+    start = 1_700_000_000_000 // FIVE_MINUTES * FIVE_MINUTES
+    n = 3000
+    candles = pd.DataFrame({"timestamp": start + np.arange(n) * FIVE_MINUTES, "close": np.linspace(1, 2, n), "volume": np.ones(n)})
+    exchange = FakeExchange({"BTCUSDT": candles})
+    cache = KlineCache(ExchangeAPI(exchange))
+    newest = cache.get_symbol_data("BTCUSDT", "5m", 2).index[-1]
+    # Like benchmark_trading_loop, a day of five minute steps, far ahead of the wall clock
+    for _ in range(24 * 12):
+        exchange.advance(5 * 60)
+        candle = cache.get_symbol_data("BTCUSDT", "5m", 2).index[-1]
+        assert candle == newest + pd.Timedelta(minutes=5)
+        newest = candle
+        hourly = cache.get_symbol_data("BTCUSDT", "1h", 50)
+        assert len(hourly) == 50 and hourly.index[-1] > newest - pd.Timedelta(hours=1)
+
+
+def test_binance_api_over_http(monkeypatch):
+    start = 1_700_000_000_000 // FIVE_MINUTES * FIVE_MINUTES
+    n = 3000
+    candles = pd.DataFrame({"timestamp": start + np.arange(n) * FIVE_MINUTES, "close": np.linspace(1, 2, n), "volume": np.ones(n)})
+    exchange = FakeExchange({"BTCUSDT": candles})
+    server = FakeExchangeServer(exchange).start()
+    limiter = RequestWeightLimiter(1200)
+    monkeypatch.setattr(binance, "request_weight_limiter", limiter)
+    try:
+        api = BinanceAPI(with_api_url(Client, server.url)("key", "secret"))
+        klines = api.get_latest_kline_data("BTCUSDT", "5m", limit=10)
+        assert len(klines) == 10
+        assert all(b[0] - a[0] == FIVE_MINUTES for a, b in zip(klines, klines[1:]))
+        price = api.get_symbol_ticker("BTCUSDT")
+        assert price == float(klines[-1][4])
+        assert api.get_all_prices() == {"BTCUSDT": price}
+
+        order = api.place_market_buy_order("BTCUSDT", 100)
+        assert order["status"] == "FILLED"
+        assert api.get_order("BTCUSDT", order["orderId"])["executedQty"] == "100.00000000"
+        balances = api.get_account_balance()
+        assert balances["BTC"] == 100
+        assert balances["USDT"] == pytest.approx(10000 - 100 * price)
+        # Every response reported its weight to the limiter
+        assert limiter.metrics()["server_used_weight"] == exchange.weight[1]
+
+        # The replay clock moves on from another process through /fake/advance
+        response = requests.post(server.url + "/fake/advance", data={"seconds": 3600})
+        assert response.status_code == 200
+        assert api.get_latest_kline_data("BTCUSDT", "5m", limit=1)[0][0] == klines[-1][0] + 12 * FIVE_MINUTES
+        assert requests.get(server.url + "/fake/state").json()["orders"] == 1
+
+        exchange.fail_next(503)
+        with pytest.raises(BinanceAPIException) as error:
+            api.get_symbol_ticker("BTCUSDT")
+        assert error.value.status_code == 503
+        exchange.fail_next(429, retry_after=30)
+        with pytest.raises(BinanceAPIException) as error:
+            api.get_all_prices()
+        assert error.value.status_code == 429
+        # The limiter backs off for the Retry-After of the 429
+        assert limiter.metrics()["rate_limit_responses"] == 1
+        assert limiter.metrics()["blocked_for"] > 25
+    finally:
+        server.stop()
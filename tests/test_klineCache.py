@@ -0,0 +1,67 @@
+import time
+import numpy as np
+from ringobot.serviceData.klineCache import KlineCache, KlineRingBuffer, INTERVAL_MS
+
+
+HOUR = INTERVAL_MS["1h"]
+
+
+class FakeKlineAPI:
+    # Hourly klines up to the exchange's own clock, offset from ours by skew ms
+    def __init__(self, skew=0):
+        self.skew = skew
+        self.calls = []
+
+    def get_latest_kline_data(self, symbol, interval, limit=500, start_time=None):
+        self.calls.append((limit, start_time))
+        now = int(time.time() * 1000) + self.skew
+        last = now // HOUR * HOUR
+        first = start_time // HOUR * HOUR if start_time is not None else last - (limit - 1) * HOUR
+        times = range(first, min(last, first + (limit - 1) * HOUR) + 1, HOUR)
+        return [[t, "0", "0", "0", str(t // HOUR), "1", t + HOUR - 1] for t in times]
+
+
+def newest_open(cache, limit=10):
+    open_time = cache.refresh("BTCUSDT", "1h", limit)[0]
+    assert (np.diff(open_time) == HOUR).all()
+    return int(open_time[-1])
+
+
+def test_delta_fetch_after_cold_start():
+    api = FakeKlineAPI()
+    cache = KlineCache(api)
+    last = newest_open(cache)
+    assert api.calls == [(10, None)]
+    assert newest_open(cache) == last
+    # Only the cached in-progress candle and the one after it are asked for
+    assert api.calls[-1] == (3, last)
+
+
+def test_exchange_clock_ahead_refetches():
+    # Like the fake exchange after /fake/advance, the exchange is hours ahead of the local clock
+    api = FakeKlineAPI()
+    cache = KlineCache(api)
+    newest_open(cache)
+    for hours in range(1, 6):
+        api.skew = hours * HOUR
+        expected = (int(time.time() * 1000) + api.skew) // HOUR * HOUR
+        assert newest_open(cache) == expected
+
+
+def test_exchange_clock_behind():
+    api = FakeKlineAPI(skew=-3 * HOUR)
+    cache = KlineCache(api)
+    last = newest_open(cache)
+    assert newest_open(cache) == last
+    assert api.calls[-1][0] >= 3
+
+
+def test_ring_buffer_rejects_gaps():
+    buffer = KlineRingBuffer(5, HOUR)
+    assert buffer.extend(np.array([0, HOUR]), np.array([HOUR - 1, 2 * HOUR - 1]), np.ones(2), np.ones(2))
+    assert not buffer.extend(np.array([3 * HOUR]), np.array([4 * HOUR - 1]), np.ones(1), np.ones(1))
+    assert buffer.last_open_time() == HOUR
+    # The cached in-progress candle is replaced
+    assert buffer.extend(np.array([HOUR, 2 * HOUR]), np.array([2 * HOUR - 1, 3 * HOUR - 1]), np.full(2, 2.0), np.ones(2))
+    assert list(buffer.tail(5)[0]) == [0, HOUR, 2 * HOUR]
+    assert list(buffer.tail(5)[2]) == [1.0, 2.0, 2.0]
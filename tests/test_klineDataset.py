@@ -0,0 +1,141 @@
+import io
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from ringobot.serviceData.klineConverter import SCHEMA, convert_archives_to_parquet
+from ringobot.serviceData import klineDataset
+from ringobot.serviceData.klineDataset import append_archives, append_klines, dataset_fingerprint, ensure_dataset, read_klines
+
+
+FIVE_MINUTES = 300_000
+
+
+def klines(start, n):
+    timestamp = pd.Timestamp(start).value // 10 ** 6 + np.arange(n, dtype=np.int64) * FIVE_MINUTES
+    close = np.arange(n, dtype=np.float64) + 1
+    return pd.DataFrame({
+        "timestamp": timestamp, "open": close, "high": close, "low": close, "close": close, "volume": close,
+        "close_time": timestamp + FIVE_MINUTES - 1, "quote_asset_volume": close, "number_of_trades": np.ones(n, dtype=np.int32),
+        "taker_buy_base_asset_volume": close, "taker_buy_quote_asset_volume": close,
+    })
+
+
+def write_archive(path, symbol, year, month, df):
+    folder = os.path.join(path, symbol, "5m")
+    os.makedirs(folder, exist_ok=True)
+    name = f"{symbol}-5m-{year}-{month:02}"
+    csv = io.StringIO()
+    df.assign(ignore=0).to_csv(csv, header=False, index=False)
+    with zipfile.ZipFile(os.path.join(folder, name + ".zip"), "w") as archive:
+        archive.writestr(name + ".csv", csv.getvalue())
+
+
+def test_append_and_read(tmp_path):
+    path = str(tmp_path)
+    df = klines("2024-01-31 12:00", 400)
+    append_klines(df, "AAAUSDT", "5m", path)
+    assert sorted(os.listdir(f"{path}/klines-5m/symbol=AAAUSDT/year=2024")) == ["month=1", "month=2"]
+    pd.testing.assert_frame_equal(read_klines("AAAUSDT", "5m", path=path), df, check_dtype=False)
+    # Appending overlapping rows replaces them
+    update = df.iloc[-10:].assign(close=-1.0)
+    append_klines(update, "AAAUSDT", "5m", path)
+    result = read_klines("AAAUSDT", "5m", columns=["close"], start="2024-02-01", path=path)
+    assert result.columns.tolist() == ["timestamp", "close"]
+    assert result["timestamp"].iloc[0] == pd.Timestamp("2024-02-01").value // 10 ** 6
+    assert len(read_klines("AAAUSDT", "5m", path=path)) == len(df)
+    assert (result["close"].iloc[-10:] == -1).all()
+
+
+def test_append_archives_skips_converted_months(tmp_path):
+    path = str(tmp_path)
+    write_archive(path, "AAAUSDT", 2024, 1, klines("2024-01-01", 100))
+    write_archive(path, "AAAUSDT", 2024, 2, klines("2024-02-01", 100))
+    assert append_archives("AAAUSDT", "5m", path) == 200
+    assert append_archives("AAAUSDT", "5m", path) == 0
+    assert len(read_klines("AAAUSDT", "5m", path=path)) == 200
+
+
+def test_convert_archives_to_one_file(tmp_path):
+    path = str(tmp_path)
+    january = klines("2024-01-31", 200)
+    write_archive(path, "AAAUSDT", 2024, 1, january.iloc[::-1])
+    # The February archive repeats the last January rows
+    write_archive(path, "AAAUSDT", 2024, 2, klines("2024-02-01", 100).pipe(lambda df: pd.concat([january.iloc[-5:], df])))
+    out_file = f"{path}/AAAUSDT.parquet"
+    assert convert_archives_to_parquet("AAAUSDT", "5m", path, out_file) == 300
+    parquet_file = pq.ParquetFile(out_file)
+    assert parquet_file.metadata.num_row_groups == 2
+    timestamps = parquet_file.read(columns=["timestamp"])["timestamp"].to_numpy()
+    assert (np.diff(timestamps) > 0).all()
+    assert convert_archives_to_parquet("BBBUSDT", "5m", path) == 0
+
+
+def write_legacy(path, df):
+    os.makedirs(f"{path}/AAAUSDT")
+    pq.write_table(pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False), f"{path}/AAAUSDT/AAAUSDT-5m.parquet")
+
+
+def test_legacy_parquet_is_imported(tmp_path):
+    path = str(tmp_path)
+    df = klines("2023-12-31 00:00", 1000)
+    write_legacy(path, df)
+    # Fingerprinting only reads, the legacy file stands in until the import
+    legacy = dataset_fingerprint("AAAUSDT", "5m", path)
+    assert legacy is not None
+    assert not os.path.exists(f"{path}/klines-5m")
+    assert ensure_dataset("AAAUSDT", "5m", path)
+    assert os.path.isdir(f"{path}/klines-5m/symbol=AAAUSDT")
+    assert dataset_fingerprint("AAAUSDT", "5m", path) not in (None, legacy)
+    assert not any(name.startswith(".import") for name in os.listdir(path))
+    pd.testing.assert_frame_equal(read_klines("AAAUSDT", "5m", path=path), df, check_dtype=False)
+
+
+def test_concurrent_legacy_imports(tmp_path, monkeypatch):
+    path = str(tmp_path)
+    write_legacy(path, klines("2023-12-31 00:00", 1000))
+    # Temporary folder of an import of the same symbol running in another process
+    os.makedirs(f"{path}/.import-AAAUSDT-5m/klines-5m/symbol=AAAUSDT")
+    calls = []
+
+    def racing_append(*args):
+        if not calls:
+            calls.append(args)
+            # Another import of the same file finishes while this one is running
+            klineDataset.import_parquet("AAAUSDT", "5m", path)
+        return append_klines(*args)
+
+    monkeypatch.setattr(klineDataset, "append_klines", racing_append)
+    assert klineDataset.import_parquet("AAAUSDT", "5m", path) == 1000
+    monkeypatch.undo()
+    assert len(read_klines("AAAUSDT", "5m", path=path)) == 1000
+    assert sorted(name for name in os.listdir(path) if name.startswith(".import")) == [".import-AAAUSDT-5m"]
+    assert os.path.isdir(f"{path}/.import-AAAUSDT-5m/klines-5m/symbol=AAAUSDT")
+
+
+def test_interrupted_legacy_import_leaves_no_dataset(tmp_path, monkeypatch):
+    path = str(tmp_path)
+    write_legacy(path, klines("2023-12-31", 1000))
+    calls = []
+
+    def failing_append(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return append_klines(*args)
+
+    monkeypatch.setattr(klineDataset, "append_klines", failing_append)
+    with pytest.raises(OSError):
+        klineDataset.import_parquet("AAAUSDT", "5m", path, batch_size=100)
+    assert not os.path.exists(f"{path}/klines-5m/symbol=AAAUSDT")
+    monkeypatch.undo()
+    assert len(read_klines("AAAUSDT", "5m", path=path)) == 1000
+
+
+def test_missing_symbol(tmp_path):
+    assert dataset_fingerprint("AAAUSDT", "5m", str(tmp_path)) is None
+    with pytest.raises(FileNotFoundError):
+        read_klines("AAAUSDT", "5m", path=str(tmp_path))
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from ringobot.serviceData import klineDownloader
+from ringobot.serviceData.klineDownloader import DOWNLOADED, SKIPPED, MISSING, FAILED, download_file, download_klines
+
+
+class ArchiveServer:
+    """
+    data.binance.vision stand-in serving files from memory. Every path can be given a list of
+    failures answered before the file: an HTTP status, "corrupt" for wrong content or "cut" for
+    a connection closed in the middle of the body.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.failures = {}
+        self.hits = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.hits[self.path] = server.hits.get(self.path, 0) + 1
+                failures = server.failures.get(self.path, [])
+                failure = failures.pop(0) if failures else None
+                body = server.files.get(self.path)
+                if isinstance(failure, int) or body is None:
+                    self.send_response(failure if isinstance(failure, int) else 404)
+                    if failure == 429:
+                        self.send_header("Retry-After", formatdate(time.time(), usegmt=True))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if failure == "cut":
+                    self.send_response(200)
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    self.wfile.write(f"{len(body):x}\r\n".encode() + body[:len(body) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                if failure == "corrupt":
+                    body = bytes(len(body))
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def add(self, path, data):
+        self.files[path] = data
+        self.files[path + ".CHECKSUM"] = f"{hashlib.sha256(data).hexdigest()}  {os.path.basename(path)}\n".encode()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def server():
+    server = ArchiveServer()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def session():
+    with klineDownloader.make_session(4) as session:
+        yield session
+
+
+def download(server, session, tmp_path, path="/a.zip", retries=3):
+    return download_file(session, server.url + path, str(tmp_path / path.lstrip("/")), timeout=5, retries=retries, backoff=0.01)
+
+
+def test_downloads_and_skips(server, session, tmp_path):
+    data = os.urandom(100_000)
+    server.add("/a.zip", data)
+    assert download(server, session, tmp_path) == DOWNLOADED
+    assert (tmp_path / "a.zip").read_bytes() == data
+    assert not (tmp_path / "a.zip.part").exists()
+    assert download(server, session, tmp_path) == SKIPPED
+    assert server.hits["/a.zip"] == 1
+
+
+def test_missing_archive(server, session, tmp_path):
+    assert download(server, session, tmp_path) == MISSING
+    assert not (tmp_path / "a.zip").exists()
+
+
+def test_checksum_mismatch_is_retried(server, session, tmp_path):
+    data = os.urandom(100_000)
+    server.add("/a.zip", data)
+    server.failures["/a.zip"] = ["corrupt"]
+    assert download(server, session, tmp_path) == DOWNLOADED
+    assert (tmp_path / "a.zip").read_bytes() == data
+
+
+def test_persistent_checksum_mismatch_fails(server, session, tmp_path):
+    server.add("/a.zip", os.urandom(1000))
+    server.failures["/a.zip"] = ["corrupt"] * 3
+    with pytest.raises(IOError):
+        download(server, session, tmp_path, retries=2)
+    assert not (tmp_path / "a.zip").exists()
+    assert not (tmp_path / "a.zip.part").exists()
+
+
+def test_server_errors_are_retried(server, session, tmp_path):
+    data = os.urandom(1000)
+    server.add("/a.zip", data)
+    server.failures["/a.zip.CHECKSUM"] = [503]
+    server.failures["/a.zip"] = [500, 429]
+    assert download(server, session, tmp_path) == DOWNLOADED
+    assert server.hits["/a.zip"] == 3
+
+
+def test_interrupted_body_is_retried(server, session, tmp_path):
+    data = os.urandom(100_000)
+    server.add("/a.zip", data)
+    server.failures["/a.zip"] = ["cut"]
+    assert download(server, session, tmp_path) == DOWNLOADED
+    assert (tmp_path / "a.zip").read_bytes() == data
+
+
+def test_download_klines_reports_failures(server, tmp_path):
+    good = "/" + klineDownloader.monthly_kline_path("AAAUSDT", "5m", 2024, 1)
+    bad = "/" + klineDownloader.monthly_kline_path("AAAUSDT", "5m", 2024, 2)
+    server.add(good, os.urandom(1000))
+    server.add(bad, os.urandom(1000))
+    server.failures[bad] = [503] * 3
+    counts, failures = download_klines(["AAAUSDT"], ["5m"], (2023, 12), (2024, 2), str(tmp_path), server.url,
+                                       workers=2, retries=2, backoff=0.01)
+    assert counts == {DOWNLOADED: 1, SKIPPED: 0, MISSING: 1, FAILED: 1}
+    assert list(failures) == [os.path.join(str(tmp_path), "AAAUSDT", "5m", os.path.basename(bad))]
+    counts, _ = download_klines(["AAAUSDT"], ["5m"], (2023, 12), (2024, 2), str(tmp_path), server.url,
+                                workers=2, retries=2, backoff=0.01)
+    assert counts == {DOWNLOADED: 1, SKIPPED: 1, MISSING: 1, FAILED: 0}
+
+
+def retry_after(value):
+    response = requests.Response()
+    if value is not None:
+        response.headers["Retry-After"] = value
+    return klineDownloader._retry_after(response, 5.0)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 5.0),
+    ("3", 3.0),
+    ("-1", 0.0),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+    ("soon", 5.0),
+])
+def test_retry_after(value, expected):
+    assert retry_after(value) == expected
+
+
+def test_retry_after_http_date():
+    assert retry_after(formatdate(time.time() + 60, usegmt=True)) == pytest.approx(60, abs=2)
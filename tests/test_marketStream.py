@@ -0,0 +1,180 @@
+import time
+import numpy as np
+import pytest
+from ringobot.serviceData.klineCache import INTERVAL_MS
+from ringobot.serviceData.marketStream import MarketDataService, FakeStreamServer, LocalStreamTransport, StreamTransport
+
+
+HOUR = INTERVAL_MS["1h"]
+
+
+class FakeKlineAPI:
+    # Hourly klines up to last_open, fetches are recorded and can run a hook first
+    def __init__(self, last_open):
+        self.last_open = last_open
+        self.calls = []
+        self.limits = []
+        self.on_fetch = None
+
+    def get_latest_kline_data(self, symbol, interval, limit=500, start_time=None):
+        self.calls.append(start_time)
+        self.limits.append(limit)
+        if self.on_fetch is not None:
+            self.on_fetch()
+        first = start_time if start_time is not None else self.last_open - (limit - 1) * HOUR
+        last = min(self.last_open, first + (limit - 1) * HOUR)
+        return [[t, "0", "0", "0", str(t // HOUR % 100), "1", t + HOUR - 1] for t in range(first, last + 1, HOUR)]
+
+
+def kline_message(open_time, closed, close="1", volume="1"):
+    kline = {"i": "1h", "t": open_time, "T": open_time + HOUR - 1, "c": close, "v": volume, "x": closed}
+    return {"stream": "btcusdt@kline_1h", "data": {"e": "kline", "E": int(time.time() * 1000), "s": "BTCUSDT", "k": kline}}
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def current_hour():
+    return int(time.time() * 1000) // HOUR * HOUR
+
+
+@pytest.fixture
+def server():
+    server = FakeStreamServer().start()
+    yield server
+    server.stop()
+
+
+def start_service(server, api):
+    service = MarketDataService(transport=LocalStreamTransport(*server.address), api=api, lookback={"1h": 10})
+    service.start(["BTCUSDT"])
+    assert server.wait_for_clients()
+    return service
+
+
+def closed_open_times(service):
+    buffer = service.closed[("BTCUSDT", "1h")]
+    return buffer.tail(len(buffer))[0]
+
+
+def test_stream_transport_is_abstract():
+    with pytest.raises(TypeError):
+        StreamTransport()
+
+
+def test_start_backfills_lookback(server):
+    api = FakeKlineAPI(current_hour() - 20 * HOUR)
+    service = start_service(server, api)
+    try:
+        open_times = closed_open_times(service)
+        assert len(open_times) == 11
+        assert open_times[-1] == api.last_open
+        assert (np.diff(open_times) == HOUR).all()
+    finally:
+        service.stop()
+
+
+def test_reconnect_backfills_missed_candles(server):
+    api = FakeKlineAPI(current_hour() - 20 * HOUR)
+    service = start_service(server, api)
+    try:
+        last_open = api.last_open
+        api.last_open += 3 * HOUR
+        server.disconnect_all()
+        assert wait_until(lambda: service.reconnects == 1)
+        assert server.wait_for_clients()
+        assert api.calls[-1] == last_open + HOUR
+        # Sized to the candles missed since the last closed one, not a full 1000 candle request
+        assert api.limits[-1] == (int(time.time() * 1000) - last_open) // HOUR + 2
+        open_times = closed_open_times(service)
+        assert open_times[-1] == api.last_open
+        assert (np.diff(open_times) == HOUR).all()
+    finally:
+        service.stop()
+
+
+def test_klines_streamed_during_backfill_are_applied_after_it(server):
+    api = FakeKlineAPI(current_hour() - 20 * HOUR)
+    service = start_service(server, api)
+    try:
+        api.last_open += 3 * HOUR
+        streamed = api.last_open + HOUR
+
+        def publish_newer_candle():
+            # The new connection is up before the backfill, a candle closes while the REST call runs
+            api.on_fetch = None
+            assert server.wait_for_clients()
+            server.publish(kline_message(streamed, closed=True))
+            time.sleep(0.2)
+
+        api.on_fetch = publish_newer_candle
+        calls = len(api.calls)
+        server.disconnect_all()
+        assert wait_until(lambda: service.reconnects == 1 and closed_open_times(service)[-1] == streamed)
+        open_times = closed_open_times(service)
+        assert (np.diff(open_times) == HOUR).all()
+        # Held back instead of being rejected as a gap and fetched again
+        assert len(api.calls) == calls + 1
+    finally:
+        service.stop()
+
+
+def test_candle_gap_is_backfilled(server):
+    api = FakeKlineAPI(current_hour() - 20 * HOUR)
+    service = start_service(server, api)
+    try:
+        last_open = api.last_open
+        api.last_open += 2 * HOUR
+        server.publish(kline_message(api.last_open, closed=True))
+        assert wait_until(lambda: closed_open_times(service)[-1] == api.last_open)
+        assert api.calls[-1] == last_open + HOUR
+        assert (np.diff(closed_open_times(service)) == HOUR).all()
+    finally:
+        service.stop()
+
+
+def test_get_symbol_data_adds_in_progress_candle(server):
+    api = FakeKlineAPI(current_hour() - HOUR)
+    service = start_service(server, api)
+    try:
+        df = service.get_symbol_data("BTCUSDT", "1h", 5)
+        assert len(df) == 5
+        # No update of the current candle yet, it is synthesized from the last close
+        assert df.index[-1].value // 10 ** 6 == current_hour()
+        assert df["volume"].iloc[-1] == 0
+        assert df["close"].iloc[-1] == df["close"].iloc[-2]
+        server.publish(kline_message(current_hour(), closed=False, close="42", volume="2"))
+        assert wait_until(lambda: service.get_symbol_data("BTCUSDT", "1h", 5)["volume"].iloc[-1] == 2)
+        df = service.get_symbol_data("BTCUSDT", "1h", 5)
+        assert len(df) == 5
+        assert df["close"].iloc[-1] == 42
+        assert service.get_symbol_data("BTCUSDT", "1h", 20) is None
+    finally:
+        service.stop()
+
+
+def test_get_symbol_data_is_none_when_behind(server):
+    api = FakeKlineAPI(current_hour() - 5 * HOUR)
+    service = start_service(server, api)
+    try:
+        assert service.get_symbol_data("BTCUSDT", "1h", 5) is None
+    finally:
+        service.stop()
+
+
+def test_is_live_follows_messages(server):
+    api = FakeKlineAPI(current_hour() - HOUR)
+    service = start_service(server, api)
+    try:
+        assert service.is_live()
+        service.last_message = time.time() - service.stale_after - 1
+        assert not service.is_live()
+    finally:
+        service.stop()
+    assert not service.is_live()
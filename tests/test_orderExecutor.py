@@ -0,0 +1,57 @@
+import threading
+import time
+from ringobot.serviceData.orderExecutor import OrderExecutor, Order, UserStreamFills, BUY
+
+
+class FakeOrderAPI:
+    # Orders are accepted as NEW and reported FILLED by get_order after fill_delay seconds
+    def __init__(self, fill_delay):
+        self.fill_delay = fill_delay
+        self.placed = None
+        self.polls = 0
+
+    def place_market_buy_order(self, symbol, quantity):
+        self.placed = time.time()
+        return {"orderId": 1, "status": "NEW", "executedQty": "0", "cummulativeQuoteQty": "0"}
+
+    def get_order(self, symbol, order_id):
+        self.polls += 1
+        if time.time() - self.placed < self.fill_delay:
+            return {"orderId": order_id, "status": "NEW", "executedQty": "0", "cummulativeQuoteQty": "0"}
+        return {"orderId": order_id, "status": "FILLED", "executedQty": "2", "cummulativeQuoteQty": "20"}
+
+
+def running_fills():
+    fills = UserStreamFills()
+    fills.running = True
+    return fills
+
+
+def test_lost_stream_report_falls_back_to_polling():
+    api = FakeOrderAPI(fill_delay=0.3)
+    executor = OrderExecutor(api, fills=running_fills(), fill_timeout=60)
+    start = time.perf_counter()
+    fills, _ = executor.execute([Order("BTCUSDT", BUY, 2, 10.0)])
+    # The stream never reports the fill, get_order finds it well before fill_timeout
+    assert time.perf_counter() - start < 3
+    assert fills[0].status == "FILLED" and fills[0].executed_qty == 2 and fills[0].avg_price == 10
+    assert api.polls >= 2
+
+
+def test_stream_report_ends_the_wait():
+    api = FakeOrderAPI(fill_delay=60)
+    stream = running_fills()
+    executor = OrderExecutor(api, fills=stream, fill_timeout=60)
+    report = {"e": "executionReport", "i": 1, "X": "FILLED", "z": "2", "Z": "22"}
+    threading.Timer(0.1, stream.handle_message, [report]).start()
+    start = time.perf_counter()
+    fills, _ = executor.execute([Order("BTCUSDT", BUY, 2, 10.0)])
+    assert time.perf_counter() - start < 1
+    assert fills[0].status == "FILLED" and fills[0].avg_price == 11
+
+
+def test_polls_without_the_stream():
+    api = FakeOrderAPI(fill_delay=0.3)
+    executor = OrderExecutor(api, fills=UserStreamFills(), fill_timeout=60)
+    fills, _ = executor.execute([Order("BTCUSDT", BUY, 2, 10.0)])
+    assert fills[0].status == "FILLED"
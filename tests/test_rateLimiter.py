@@ -0,0 +1,53 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from binance.client import Client
+from ringobot.config import with_api_url
+from ringobot.serviceData import binance
+from ringobot.serviceData.binance import BinanceAPI
+from ringobot.serviceData.fakeExchange import FakeExchange, FakeExchangeServer
+from ringobot.serviceData.rateLimiter import RequestWeightLimiter, MARKET_DATA, ORDER
+
+
+def test_oversized_weight_is_admitted():
+    limiter = RequestWeightLimiter(100)
+    # More than the 80 market data may use, it takes the whole share instead of waiting forever
+    assert limiter.try_acquire(500, MARKET_DATA) == 0
+    assert limiter.used_weight() == 80
+    assert limiter.try_acquire(1, MARKET_DATA) > 0
+    assert limiter.try_acquire(20, ORDER) == 0
+
+
+def test_each_thread_records_its_own_response(monkeypatch):
+    n = 500
+    start = 1_700_000_000_000
+    candles = pd.DataFrame({"timestamp": start + np.arange(n) * 300_000, "close": np.ones(n), "volume": np.ones(n)})
+    server = FakeExchangeServer(FakeExchange({"BTCUSDT": candles})).start()
+    recorded = []
+    monkeypatch.setattr(binance.request_weight_limiter, "record_response",
+                        lambda response: recorded.append((threading.current_thread().name, response.url)))
+    try:
+        # Slow to parse, so the other thread's request lands in between
+        client_class = type("SlowClient", (with_api_url(Client, server.url),), {
+            "_handle_response": staticmethod(lambda response: time.sleep(0.005) or Client._handle_response(response))})
+        api = BinanceAPI(client_class("key", "secret"))
+
+        def klines():
+            for _ in range(20):
+                api.get_latest_kline_data("BTCUSDT", "5m", limit=5)
+
+        def tickers():
+            for _ in range(20):
+                api.get_all_prices()
+
+        threads = [threading.Thread(target=klines, name="klines"), threading.Thread(target=tickers, name="tickers")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.stop()
+    assert len(recorded) == 40
+    for name, url in recorded:
+        assert ("/klines" in url) == (name == "klines")
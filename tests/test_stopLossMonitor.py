@@ -0,0 +1,79 @@
+import pandas as pd
+from ringobot.serviceData.stopLossMonitor import PositionMonitor, SAFETY
+
+
+class Position:
+    def __init__(self, session_id, symbol, buy_price, buy_timestamp):
+        self.id, self.name, self.buy_price, self.buy_timestamp = session_id, symbol, buy_price, buy_timestamp
+
+
+START = 1_700_000_040  # A minute boundary, in seconds
+
+
+def make_monitor(history=None):
+    fired = []
+    monitor = PositionMonitor(lambda *trigger: fired.append(trigger), tolerance=0.05, hold_time=10 ** 6, history=history)
+    monitor.sync([Position(1, "BTCUSDT", 100.0, START)])
+    return monitor, fired
+
+
+def test_first_tick_does_not_trigger_the_stop_loss():
+    monitor, fired = make_monitor()
+    assert monitor.on_price("BTCUSDT", 90.0, START) == []
+    # Four minutes are not enough for a five minute mean
+    for minute in range(1, 4):
+        assert monitor.on_price("BTCUSDT", 90.0, START + minute * 60) == []
+    assert monitor.on_price("BTCUSDT", 90.0, START + 4 * 60) == [(1, "BTCUSDT", SAFETY, 90.0)]
+    assert fired == [(1, "BTCUSDT", SAFETY, 90.0)]
+
+
+def test_skipped_minutes_count_as_known():
+    monitor, _ = make_monitor()
+    monitor.on_price("BTCUSDT", 90.0, START)
+    # The minutes in between repeat the last close
+    assert monitor.on_price("BTCUSDT", 90.0, START + 10 * 60) == [(1, "BTCUSDT", SAFETY, 90.0)]
+
+
+def test_history_seeds_the_rolling_mean():
+    def history(symbol, minutes):
+        index = pd.to_datetime([(START + (i - minutes + 1) * 60) * 1000 for i in range(minutes)], unit="ms")
+        return pd.DataFrame({"close": [100.0] * (minutes - 1) + [90.0]}, index=index)
+
+    monitor, _ = make_monitor(history)
+    # The mean of 4 x 100 and one 90 is above the stop, one 90 tick does not sell
+    assert monitor.on_price("BTCUSDT", 90.0, START) == []
+    monitor, _ = make_monitor(history)
+    assert monitor.on_price("BTCUSDT", 10.0, START) == [(1, "BTCUSDT", SAFETY, 10.0)]
+
+
+def test_seeded_history_without_enough_minutes_waits():
+    def history(symbol, minutes):
+        return pd.DataFrame({"close": [80.0, 80.0]}, index=pd.to_datetime([(START - 60) * 1000, START * 1000], unit="ms"))
+
+    monitor, _ = make_monitor(history)
+    assert monitor.on_price("BTCUSDT", 80.0, START) == []
+    for minute in range(1, 3):
+        assert monitor.on_price("BTCUSDT", 80.0, START + minute * 60) == []
+    assert monitor.on_price("BTCUSDT", 80.0, START + 3 * 60) == [(1, "BTCUSDT", SAFETY, 80.0)]
+
+
+def test_late_tick_does_not_rewind_the_window():
+    monitor, _ = make_monitor()
+    for minute in range(6):
+        monitor.on_price("BTCUSDT", 100.0, START + minute * 60)
+    # A tick stamped minute 3 arriving after minute 5 neither replaces the newest close nor sells
+    assert monitor.on_price("BTCUSDT", 50.0, START + 3 * 60) == []
+    assert list(monitor.minute_close[0]) == [100.0] * 5
+    assert monitor.current_minute[0] == (START + 5 * 60) // 60
+    assert monitor.filled[0] == 5
+    assert monitor.on_price("BTCUSDT", 100.0, START + 5 * 60 + 30) == []
+
+
+def test_late_tick_still_expires_positions():
+    fired = []
+    monitor = PositionMonitor(lambda *trigger: fired.append(trigger), tolerance=0.05, hold_time=120)
+    for minute in range(6):
+        monitor.on_price("BTCUSDT", 100.0, START + minute * 60)
+    monitor.sync([Position(1, "BTCUSDT", 100.0, START)])
+    # Too old for the window, not for the hold time, and the 50 does not count as a stop-loss
+    assert monitor.on_price("BTCUSDT", 50.0, START + 3 * 60) == [(1, "BTCUSDT", "expire", 50.0)]
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ringobot.serviceData.featureEngineering import (FEATURE_COLUMNS, calculate_macd, calculate_rsi, calculate_bollinger_bands,
+                                                     calculate_rolling_mean_std, calculate_vwma)
+from ringobot.serviceData.streamingFeatures import IndicatorState, check_parity
+
+
+def candles(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    volume = rng.lognormal(3, 1, n)
+    return pd.DataFrame({"close": close, "volume": volume})
+
+
+def streamed(df):
+    state = IndicatorState()
+    rows = np.array([state.update(close, volume) for close, volume in zip(df["close"], df["volume"])])
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+@pytest.mark.parametrize("calculate, columns", [
+    (calculate_macd, ["macd", "macd_signal", "macd_hist"]),
+    (calculate_rsi, ["rsi"]),
+    (calculate_bollinger_bands, ["bollinger_upper", "bollinger_lower", "bollinger_width", "bollinger_pct_b"]),
+    (calculate_rolling_mean_std, ["rolling_mean_12h", "rolling_std_12h", "rolling_mean_36h", "rolling_std_36h",
+                                  "rolling_mean_96h", "rolling_std_96h"]),
+    (calculate_vwma, ["vwma_4h", "vwma_24h", "vwma_96h"]),
+])
+def test_matches_batch_function(calculate, columns):
+    df = candles()
+    expected = calculate(df.copy())
+    actual = streamed(df)
+    for column in columns:
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-6, atol=1e-8, equal_nan=True, err_msg=column)
+
+
+def test_warm_up_rows_are_nan():
+    actual = streamed(candles())
+    # First row with a value: the window or min_periods of each indicator is complete
+    first_valid = {"bollinger_upper": 19, "macd": 25, "macd_signal": 33, "rsi": 14,
+                   "rolling_mean_12h": 11, "rolling_std_96h": 95, "vwma_4h": 3, "vwma_96h": 95}
+    for column, row in first_valid.items():
+        assert actual[column].iloc[:row].isna().all(), column
+        assert not np.isnan(actual[column].iloc[row]), column
+
+
+def test_shorter_than_warm_up():
+    diffs = check_parity(candles(10))
+    assert set(diffs) == set(FEATURE_COLUMNS)
+    actual = streamed(candles(10))
+    assert actual.drop(columns=["close", "volume", "vwma_4h"]).isna().all().all()
+
+
+def test_flat_prices_and_zero_volume():
+    df = candles(200)
+    # No losses make the RSI undefined, no spread makes %b undefined, no volume makes the VWMA undefined
+    df.loc[100:150, "close"] = 100.0
+    df.loc[100:150, "volume"] = 0.0
+    check_parity(df)
+    actual = streamed(df)
+    assert actual["vwma_4h"].iloc[110:150].isna().all()
+
+
+def test_nan_candles():
+    df = candles(300)
+    df.loc[[50, 120, 121], "close"] = np.nan
+    df.loc[200, "volume"] = np.nan
+    check_parity(df)
+    actual = streamed(df)
+    # Rolling values are NaN while the NaN is in their window and come back afterwards
+    assert actual["rolling_mean_12h"].iloc[50:62].isna().all()
+    assert not np.isnan(actual["rolling_mean_12h"].iloc[62])
+    assert np.isnan(actual["rsi"].iloc[121]) and not np.isnan(actual["rsi"].iloc[123])
+
+
+def test_long_series_does_not_drift():
+    diffs = check_parity(candles(5000, seed=1))
+    assert max(diffs.values()) < 1e-6
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ringobot.serviceData.backtest import MarketGrid
+from ringobot.serviceData.sweep import run_sweep
+
+
+def make_grid(periods=200):
+    timestamps = pd.date_range("2024-01-01", periods=periods, freq="1h")
+    random = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(random.normal(0, 0.01, (2, periods)), axis=1))
+    signals = random.choice([-1, 0, 1], size=(2, periods), p=[0.05, 0.9, 0.05]).astype(np.int8)
+    return MarketGrid(timestamps, ["AAAUSDT", "BBBUSDT"], close, signals)
+
+
+def sweep(grid, out_dir, **kwargs):
+    return run_sweep(grid, str(out_dir), tolerance=[0.02, 0.05], hold_time=[6], budget=[100], max_trade=[2],
+                     workers=1, **kwargs)
+
+
+def test_resume_skips_done_combinations(tmp_path):
+    grid = make_grid()
+    results = sweep(grid, tmp_path)
+    assert len(results) == 2
+    parts = sorted(path.name for path in tmp_path.glob("part-*.parquet"))
+    assert len(sweep(grid, tmp_path)) == 2
+    assert sorted(path.name for path in tmp_path.glob("part-*.parquet")) == parts
+
+
+@pytest.mark.parametrize("kwargs", [{"fee": 0.001}, {"cash": 5000.0}, {"allow_sell": 0}])
+def test_resume_with_other_settings_is_refused(tmp_path, kwargs):
+    grid = make_grid()
+    sweep(grid, tmp_path)
+    with pytest.raises(ValueError):
+        sweep(grid, tmp_path, **kwargs)
+
+
+def test_resume_on_another_grid_is_refused(tmp_path):
+    sweep(make_grid(), tmp_path)
+    with pytest.raises(ValueError):
+        sweep(make_grid(100), tmp_path)
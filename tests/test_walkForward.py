@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from ringobot.serviceData.train import walkForward
+from ringobot.serviceData.train.preprocess import compute_labels
+from ringobot.serviceData.train.walkForward import walk_forward_folds, symbol_windows, prepare_fold, run_walk_forward
+
+
+def hourly_candles(periods, seed=0):
+    random = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01", periods=periods, freq="1h")
+    close = 100 * np.exp(np.cumsum(random.normal(0, 0.01, periods)))
+    return pd.DataFrame({"close": close, "volume": random.uniform(1, 2, periods)}, index=index)
+
+
+def load(fold_dir, name):
+    return np.load(os.path.join(fold_dir, f"{name}.npy"))
+
+
+def test_folds_roll_by_the_test_period():
+    folds = walk_forward_folds("2024-01-01", "2024-12-31", train_period="180D", test_period="60D")
+    assert len(folds) == 3
+    for train_start, train_end, test_end in folds:
+        assert train_end - train_start == pd.Timedelta("180D")
+        assert test_end - train_end == pd.Timedelta("60D")
+    assert folds[1][0] - folds[0][0] == pd.Timedelta("60D")
+
+
+def test_training_labels_do_not_reach_the_test_window(tmp_path):
+    times = pd.date_range("2024-01-01", periods=2000, freq="1h")
+    hours = np.arange(len(times))
+    windows = np.stack([np.repeat(hours[:, None], 4, axis=1), np.ones((len(times), 4))], axis=2).astype(np.float32)
+    # Every label is the hour of its row, so the stored labels say which rows went where
+    fold = (times[0], times[1000], times[1500])
+    gap = pd.Timedelta(hours=3)
+    assert prepare_fold({"AAAUSDT": (windows, hours, times)}, fold, str(tmp_path / "fold"), gap) == (997, 500)
+    y_train, y_test = load(tmp_path / "fold", "y_train"), load(tmp_path / "fold", "y_test")
+    # A label looks gap ahead, the last training label's future ends before the test window starts
+    assert times[y_train.max()] + gap < fold[1]
+    assert y_test.min() == 1000 and y_test.max() == 1499
+    assert not os.path.exists(tmp_path / "fold.tmp")
+
+
+def test_symbol_windows_label_the_row_after_each_window():
+    df = hourly_candles(500)
+    windows, labels, times = symbol_windows(df, window_size=24, future_period=3)
+    expected, _ = compute_labels(df["close"].values, future_period=3)
+    rows = df.index.get_indexer(times)
+    np.testing.assert_array_equal(labels, expected[rows])
+    # The last label needs the close future_period hours after it
+    assert times[-1] == df.index[-1 - 3]
+    # Each window ends on the candle before its label
+    np.testing.assert_allclose(windows[:, -1, 0], df["close"].to_numpy()[rows - 1], rtol=1e-6)
+
+
+def test_scaler_is_fit_on_the_training_window(tmp_path):
+    times = pd.date_range("2024-01-01", periods=1000, freq="1h")
+    random = np.random.default_rng(0)
+    windows = random.normal(0, 1, (len(times), 4, 2)).astype(np.float32)
+    # The test window lives at another level, scaling with its own statistics would hide that
+    windows[600:] += 10
+    fold = (times[0], times[500], times[800])
+    prepare_fold({"AAAUSDT": (windows, np.zeros(len(times), dtype=np.int64), times)}, fold, str(tmp_path / "fold"),
+                 pd.Timedelta(hours=3))
+    X_train, X_test = load(tmp_path / "fold", "X_train"), load(tmp_path / "fold", "X_test")
+    np.testing.assert_allclose(X_train.mean(axis=0), 0, atol=1e-5)
+    np.testing.assert_allclose(X_train.std(axis=0), 1, atol=1e-4)
+    raw_train = windows[:497].reshape(497, -1).astype(np.float64)
+    raw_test = windows[500:800].reshape(300, -1)
+    np.testing.assert_allclose(X_test, (raw_test - raw_train.mean(axis=0)) / raw_train.std(axis=0), rtol=1e-4, atol=1e-4)
+    assert X_test[-100:].mean() > 5
+
+
+def test_cached_folds_are_reused(tmp_path, monkeypatch):
+    for seed, symbol in enumerate(["AAAUSDT", "BBBUSDT"]):
+        os.makedirs(tmp_path / symbol)
+        hourly_candles(24 * 51, seed).to_parquet(tmp_path / symbol / f"{symbol}-1h.parquet")
+    prepared = []
+
+    def counting_prepare_fold(windows, fold, fold_dir, gap):
+        prepared.append(fold)
+        return prepare_fold(windows, fold, fold_dir, gap)
+
+    monkeypatch.setattr(walkForward, "prepare_fold", counting_prepare_fold)
+
+    def run():
+        return run_walk_forward(["AAAUSDT", "BBBUSDT"], out_dir=str(tmp_path / "out"), path=str(tmp_path),
+                                train_period="30D", test_period="10D", models=["random_forest"], window_size=6, balance=None,
+                                workers=1, threads=1)
+
+    results, comparison = run()
+    assert len(prepared) == 2
+    assert len(results) == 2 and list(comparison.index) == ["random_forest"]
+    again, _ = run()
+    assert len(prepared) == 2
+    pd.testing.assert_frame_equal(again.drop(columns="fit_seconds"), results.drop(columns="fit_seconds"))
+    # Other candles are another cache entry
+    hourly_candles(24 * 51, seed=5).to_parquet(tmp_path / "AAAUSDT" / "AAAUSDT-1h.parquet")
+    run()
+    assert len(prepared) == 4
@@ -85,7 +85,7 @@ def history():
 def get_active_sessions():
     with session_scope() as db_session:
         sessions = Session.get_active_sessions(db_session)
-        serialized_sessions = [session.__dict__ for session in sessions]
+        serialized_sessions = [session.to_dict() for session in sessions]
         return jsonify(serialized_sessions), 200
 
 
@@ -94,7 +94,7 @@ def get_active_sessions():
 def get_completed_sessions():
     with session_scope() as db_session:
         sessions = Session.get_completed_sessions(db_session)
-        serialized_sessions = [session.__dict__ for session in sessions]
+        serialized_sessions = [session.to_dict() for session in sessions]
         return jsonify(serialized_sessions), 200
 
 
@@ -112,7 +112,7 @@ def transactions(session_id):
 def get_sessions_by_coin_id(coin_id):
     with session_scope() as db_session:
         sessions = Session.get_session_by_coin_id(db_session, coin_id)
-        serialized_sessions = [session.__dict__ for session in sessions]
+        serialized_sessions = [session.to_dict() for session in sessions]
         return jsonify(serialized_sessions), 200
 
 